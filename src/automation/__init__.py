@@ -1,51 +1,172 @@
-"""AFK Journey Automation package."""
-
-from .screenshot import screenshot_monitor
-from .image_matching import findMatchings
-from .click_simulation import (
-    click,
-    simulateClickOnImage,
-    clickOnScreenShoot,
-    set_language,
-    get_language,
-    get_asset_path,
-    get_game_monitor,
-    get_game_window,
-    set_debug_mode,
-    is_debug_mode,
-)
-from .game_automation import (
-    autoFight,
-    autoPFightFriends,
-    autoFightFriends,
-    autoPFight,
-    FactionChallenge,
-    set_stop_flag,
-    stop_automation,
-)
-
-__all__ = [
+"""AFK Journey Automation package.
+
+Names are imported from their submodules on first access (PEP 562), so
+importing the package, or a light submodule such as :mod:`automation.log`,
+does not load OpenCV, numpy, mss or pywinauto. The GUI can come up while
+:mod:`automation.warmup` loads them in the background.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any, Dict, List
+
+# Public name -> submodule defining it
+_EXPORTS: Dict[str, str] = {
     # Screenshot
-    "screenshot_monitor",
+    "screenshot_monitor": "screenshot",
     # Image matching
-    "findMatchings",
+    "findMatchings": "image_matching",
+    "ImageFeatures": "image_matching",
+    "LocationCache": "image_matching",
+    "Estimators": "verification",
+    "set_verification_estimator": "verification",
+    "get_verification_estimator": "verification",
+    "DescriptorModes": "descriptors",
+    "set_descriptor_mode": "descriptors",
+    "get_descriptor_mode": "descriptors",
+    "LayoutModel": "layout",
+    "get_layout_model": "layout",
+    "set_layout_enabled": "layout",
+    "IncrementalExtractor": "incremental",
+    "set_incremental_enabled": "incremental",
+    "KeypointBudget": "keypoint_budget",
+    "set_budget_enabled": "keypoint_budget",
+    "get_template_registry": "templates",
+    # Scene classification
+    "SceneClassifier": "scene",
+    "SceneResult": "scene",
+    "Scenes": "scene",
+    # Sessions
+    "AutomationSession": "session",
+    "current_session": "session",
+    "find_game_windows": "session",
+    "SessionScheduler": "scheduler",
+    "MatcherService": "matcher_service",
+    "set_matcher_service": "matcher_service",
     # Click simulation
-    "click",
-    "simulateClickOnImage",
-    "clickOnScreenShoot",
-    "set_language",
-    "get_language",
-    "get_asset_path",
-    "get_game_monitor",
-    "get_game_window",
-    "set_debug_mode",
-    "is_debug_mode",
+    "click": "click_simulation",
+    "simulateClickOnImage": "click_simulation",
+    "clickOnScreenShoot": "click_simulation",
+    "set_language": "click_simulation",
+    "get_language": "click_simulation",
+    "get_asset_path": "click_simulation",
+    "get_game_monitor": "click_simulation",
+    "get_game_window": "click_simulation",
+    "get_location_cache": "click_simulation",
+    "set_debug_mode": "click_simulation",
+    "is_debug_mode": "click_simulation",
+    # Logging
+    "configure_logging": "log",
+    "get_logger": "log",
+    "get_recent_records": "log",
+    "shutdown_logging": "log",
+    "flush_logging": "log",
+    # Metrics
+    "get_registry": "metrics",
+    "set_metrics_enabled": "metrics",
+    "start_metrics": "metrics",
+    # Flight recorder
+    "enable_flight_recorder": "flight_recorder",
+    "disable_flight_recorder": "flight_recorder",
+    "get_flight_recorder": "flight_recorder",
+    "MemoryGuard": "memory",
+    "start_memory_guard": "memory",
+    "get_memory_guard": "memory",
+    # Run statistics
+    "enable_run_stats": "stats",
+    "disable_run_stats": "stats",
+    "get_run_stats": "stats",
     # Game automation
-    "autoFight",
-    "autoPFightFriends",
-    "autoFightFriends",
-    "autoPFight",
-    "FactionChallenge",
-    "set_stop_flag",
-    "stop_automation",
-]
\ No newline at end of file
+    "autoFight": "game_automation",
+    "autoPFightFriends": "game_automation",
+    "autoFightFriends": "game_automation",
+    "autoPFight": "game_automation",
+    "FactionChallenge": "game_automation",
+    "set_stop_flag": "game_automation",
+    "stop_automation": "game_automation",
+    # Battle flows
+    "EndReasons": "flows",
+    "Flow": "flows",
+    "FlowEngine": "flows",
+    "FlowResult": "flows",
+    "Flows": "flows",
+    "Step": "flows",
+    "get_flow": "flows",
+    "run_flow": "flows",
+    "AsyncFlowEngine": "async_flows",
+    "run_flow_async": "async_flows",
+    "run_sessions_async": "async_flows",
+    "TeamRotation": "rotation",
+    "AutomationExecutor": "executor",
+    # Startup
+    "start_warmup": "warmup",
+    "get_warmup": "warmup",
+    # Game simulator
+    "GameSimulator": "simulator",
+    "run_simulated": "simulator",
+    "set_game_backend": "click_simulation",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # Cache on the package so the next access is a plain attribute lookup
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .screenshot import screenshot_monitor
+    from .image_matching import findMatchings, ImageFeatures, LocationCache
+    from .verification import Estimators, set_verification_estimator, get_verification_estimator
+    from .descriptors import DescriptorModes, set_descriptor_mode, get_descriptor_mode
+    from .layout import LayoutModel, get_layout_model, set_layout_enabled
+    from .incremental import IncrementalExtractor, set_incremental_enabled
+    from .keypoint_budget import KeypointBudget, set_budget_enabled
+    from .templates import get_template_registry
+    from .scene import SceneClassifier, SceneResult, Scenes
+    from .session import AutomationSession, current_session, find_game_windows
+    from .click_simulation import (
+        click,
+        simulateClickOnImage,
+        clickOnScreenShoot,
+        set_language,
+        get_language,
+        get_asset_path,
+        get_game_monitor,
+        get_game_window,
+        get_location_cache,
+        set_debug_mode,
+        is_debug_mode,
+    )
+    from .log import configure_logging, flush_logging, get_logger, get_recent_records, shutdown_logging
+    from .metrics import get_registry, set_metrics_enabled, start_metrics
+    from .memory import MemoryGuard, start_memory_guard, get_memory_guard
+    from .flight_recorder import enable_flight_recorder, disable_flight_recorder, get_flight_recorder
+    from .stats import enable_run_stats, disable_run_stats, get_run_stats
+    from .game_automation import (
+        autoFight,
+        autoPFightFriends,
+        autoFightFriends,
+        autoPFight,
+        FactionChallenge,
+        set_stop_flag,
+        stop_automation,
+    )
+    from .rotation import TeamRotation
+    from .executor import AutomationExecutor
+    from .flows import EndReasons, Flow, FlowEngine, FlowResult, Flows, Step, get_flow, run_flow
+    from .scheduler import SessionScheduler
+    from .matcher_service import MatcherService, set_matcher_service
+    from .simulator import GameSimulator, run_simulated
+    from .click_simulation import set_game_backend
+    from .async_flows import AsyncFlowEngine, run_flow_async, run_sessions_async
+    from .warmup import start_warmup, get_warmup
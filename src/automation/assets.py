@@ -0,0 +1,33 @@
+"""Locating bundled template assets."""
+
+import os
+import sys
+
+SUPPORTED_LANGUAGES = ("EN", "CN")
+
+
+def _get_base_path() -> str:
+    """Get the base path for assets, works both in dev and when packaged with PyInstaller."""
+    if getattr(sys, 'frozen', False):
+        # Running as compiled exe
+        return sys._MEIPASS
+    else:
+        # Running in development
+        return os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+ASSETS_DIR = os.path.join(_get_base_path(), "assets")
+
+
+def get_template_path(language: str, filename: str) -> str:
+    """
+    Get the full path to a language-specific template image.
+    
+    Args:
+        language: Asset language (EN or CN).
+        filename: Template file name, e.g. ``fight.png``.
+        
+    Returns:
+        Absolute path of the template file.
+    """
+    return os.path.join(ASSETS_DIR, language, filename)
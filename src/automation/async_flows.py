@@ -0,0 +1,340 @@
+"""Asyncio flavour of the flow engine.
+
+:class:`AsyncFlowEngine` plays the same declarative flows as
+:class:`~automation.flows.FlowEngine`, but as a coroutine. Captures, matching
+and clicks run in an executor with the session activated, while the coroutine
+only awaits them. Every await races the session's stop signal: stopping a
+session resolves that signal from whatever thread called ``stop()``, so
+sleeps and in-flight lookups are abandoned within milliseconds instead of
+at the next step boundary. Many sessions can share one event loop.
+"""
+
+import asyncio
+import functools
+import time
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple, TypeVar
+
+from .click_simulation import clickOnFramePoint, get_language
+from .flows import Actions, Flow, FlowEngine, FlowResult, Step, get_flow
+from .game_automation import (
+    Delays,
+    PollPlan,
+    _battle_classifier,
+    _battle_result_filter,
+    _classify_game_screen,
+    _is_battle_result,
+    wait_for_click_effect,
+)
+from .image_matching import LocationCache
+from .keypoint_budget import KeypointBudget, is_budget_enabled
+from .log import get_logger
+from .scene import SceneClassifier, SceneResult, Scenes
+from .session import AutomationSession
+from .timing import BattleSchedule, get_timing_model
+
+_log = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class _Stopped(Exception):
+    """Raised inside the engine when its session is stopped."""
+
+
+def _in_session(session: AutomationSession, func: Callable[..., T], *args) -> T:
+    """Run a blocking call on an executor thread with the session activated."""
+    with session.activate():
+        return func(*args)
+
+
+class AsyncFlowEngine(FlowEngine):
+    """Plays a flow for one session as a coroutine."""
+
+    def __init__(self, flow: Flow, session: AutomationSession, executor: Optional[Executor] = None):
+        """
+        Args:
+            flow: The flow to play.
+            session: The client to drive.
+            executor: Executor for captures, matching and clicks; None uses the loop's default.
+        """
+        self.session = session
+        super().__init__(flow)
+        self.executor = executor
+        self._stop_signal: Optional[asyncio.Future] = None
+
+    def _should_stop(self) -> bool:
+        return self.session.should_stop()
+
+    def _language(self) -> str:
+        return self.session.language
+
+    def _profile(self) -> Optional[str]:
+        return self.session.name
+
+    def _location_cache(self) -> LocationCache:
+        return self.session.locations
+
+    def _keypoint_budget(self) -> Optional[KeypointBudget]:
+        return self.session.budget if is_budget_enabled() else None
+
+    async def run(self, max_rounds: Optional[int] = None, max_runtime: Optional[float] = None) -> FlowResult:
+        """
+        Play rounds until a limit is reached or the session is stopped.
+
+        Args:
+            max_rounds: Round limit; defaults to the flow's ``max_rounds``.
+            max_runtime: Seconds after which no new round is started.
+
+        Returns:
+            The run's outcome and throughput.
+        """
+        loop = asyncio.get_running_loop()
+        self._stop_signal = loop.create_future()
+
+        def signal_stop() -> None:
+            if not self._stop_signal.done():
+                self._stop_signal.set_result(None)
+
+        # stop() may be called from any thread (GUI, signal handler, scheduler)
+        on_stop = lambda: loop.call_soon_threadsafe(signal_stop)
+        self.session.add_stop_callback(on_stop)
+
+        max_rounds = self._begin_run(max_rounds)
+        try:
+            while True:
+                reason = self._end_reason(max_rounds, max_runtime)
+                if reason is not None:
+                    break
+                try:
+                    won = await self.play_round()
+                except _Stopped:
+                    won = None
+                if won is None or self._should_stop():
+                    reason = self._stopped()
+                    break
+                self._finish_round(won)
+        finally:
+            self.session.remove_stop_callback(on_stop)
+            self._end_run()
+        return self._result(reason)
+
+    async def play_round(self) -> bool:
+        """
+        Play one round from its entry step, timing each phase into ``phase_times``.
+
+        Returns:
+            True if the battle was won.
+
+        Raises:
+            _Stopped: If the session is stopped during the round.
+        """
+        step = self._enter_round()
+        won = False
+
+        while step is not None:
+            self._prefetch_successors(step)
+            step_start = time.monotonic()
+
+            if step.action == Actions.BATTLE_RESULT:
+                won = await self._battle_result(step)
+                next_step = step.next_on_win if won else step.next
+            else:
+                if step.action == Actions.SELECT_TEAM:
+                    await self._select_team(step)
+                else:
+                    await self._click(step)
+                next_step = step.next
+
+            self._book(step, step_start)
+            step = self.flow.step(next_step)
+
+        return won
+
+    # -------------------------------------------------------------------------
+    # Interruptible primitives
+    # -------------------------------------------------------------------------
+
+    async def _guard(self, awaitable: Awaitable[T]) -> T:
+        """Await something, abandoning it the moment the session is stopped."""
+        task = asyncio.ensure_future(awaitable)
+        done, _ = await asyncio.wait({task, self._stop_signal}, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+        task.cancel()
+        raise _Stopped()
+
+    async def _sleep(self, seconds: float) -> None:
+        await self._guard(asyncio.sleep(seconds))
+
+    async def _call(self, func: Callable[..., T], *args) -> T:
+        """Run a blocking call in the executor with the session activated."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(_in_session, self.session, func, *args)
+        return await self._guard(loop.run_in_executor(self.executor, call))
+
+    async def _wait(
+        self,
+        check: Callable[[], Awaitable[Optional[T]]],
+        timeout: float,
+        poll_interval: float,
+        transition: Optional[str] = None,
+        shrink_timeout: bool = True,
+        schedule: Optional[BattleSchedule] = None,
+        learn_if: Optional[Callable[[T], bool]] = None
+    ) -> Optional[T]:
+        """Coroutine counterpart of ``game_automation.wait_for``; returns None on timeout."""
+        plan = PollPlan(timeout, poll_interval, transition, shrink_timeout, schedule, self._keypoint_budget(),
+                        learn_if)
+        delay = plan.first_delay()
+        if delay > 0:
+            await self._sleep(delay)
+
+        while True:
+            poll_start = time.monotonic()
+            result = await check()
+            if result:
+                plan.on_hit(poll_start, result)
+                return result
+
+            delay = plan.next_delay(poll_start)
+            if delay is None:
+                break
+            await self._sleep(delay)
+
+        plan.on_timeout()
+        _log.debug("[%s] wait gave up after %.1fs", self.session.name, plan.timeout)
+        return None
+
+    async def _wait_for_templates(
+        self,
+        templates: Sequence[str],
+        timeout: float,
+        poll_interval: float,
+        transition: Optional[str] = None
+    ) -> Optional[SceneResult]:
+        """Wait until any of the templates shows, one capture per poll."""
+        classifier = SceneClassifier([(template, (template,)) for template in templates])
+
+        async def check() -> Optional[SceneResult]:
+            result = await self._call(_classify_game_screen, classifier)
+            return result if result.template is not None else None
+
+        return await self._wait(check, timeout, poll_interval, transition)
+
+    async def _click_result(self, result: SceneResult, focus: bool = False) -> None:
+        await self._call(clickOnFramePoint, result.location, result.template, result.monitor, focus, result.frame)
+
+    # -------------------------------------------------------------------------
+    # Step actions
+    # -------------------------------------------------------------------------
+
+    async def _click(self, step: Step) -> Optional[str]:
+        """Click the first of the step's templates to appear, then wait for the click to take effect."""
+        result = await self._wait_for_templates(step.templates, step.timeout, step.poll_interval, step.transition)
+        if result is None:
+            return None
+        await self._click_result(result, step.focus)
+        # Otherwise the next step could match a frame still showing this screen
+        await self._call(wait_for_click_effect)
+        return result.template
+
+    async def _select_team(self, step: Step) -> None:
+        """Page to the record chosen by the team rotation and adopt it."""
+        next_image, adopt_image = step.templates
+        next_clicks = self.team_index
+
+        if next_clicks > 0:
+            next_button = await self._wait_for_templates((next_image,), step.timeout, step.poll_interval,
+                                                         step.transition)
+            if next_button is not None:
+                for _ in range(next_clicks):
+                    await self._click_result(next_button)
+                    # Paging has no distinct end screen, so keep a short settle delay
+                    await self._sleep(Delays.NEXT)
+            else:
+                _log.warning("NEXT button not found, skipping navigation")
+
+        # After paging the list is already showing, so only time the direct case
+        transition = step.transition if next_clicks == 0 else None
+        adopt = await self._wait_for_templates((adopt_image,), step.timeout, step.poll_interval, transition)
+        if adopt is not None:
+            await self._click_result(adopt)
+            await self._call(wait_for_click_effect)
+
+    async def _battle_result(self, step: Step) -> bool:
+        """Wait for the battle to end; the step's last template is the win screen."""
+        classifier = _battle_classifier(step.templates[-1])
+        accept = _battle_result_filter()
+
+        async def check() -> Optional[SceneResult]:
+            return accept(await self._call(_classify_game_screen, classifier))
+
+        schedule = BattleSchedule(get_timing_model(), step.transition, self.flow.name, self.team_index,
+                                  step.timeout, step.poll_interval)
+        result = await self._wait(check, step.timeout, step.poll_interval, schedule=schedule,
+                                  learn_if=_is_battle_result)
+        if result is None:
+            return False
+        if result.scene not in (Scenes.WON, Scenes.LOST):
+            _log.warning("Battle result missed, game is back at %s", result.scene)
+            return False
+
+        await self._click_result(result)
+        won = result.scene == Scenes.WON
+        _log.info("battle %s", "won" if won else "lost", extra={"result": "won" if won else "lost"})
+        return won
+
+
+# =============================================================================
+# Entry Points
+# =============================================================================
+
+async def run_flow_async(
+    flow: Flow,
+    session: Optional[AutomationSession] = None,
+    max_rounds: Optional[int] = None,
+    max_runtime: Optional[float] = None,
+    executor: Optional[Executor] = None
+) -> FlowResult:
+    """
+    Play a flow as a coroutine.
+
+    Args:
+        flow: The flow to play.
+        session: The client to drive; by default a session for the standard game window.
+        max_rounds: Round limit; defaults to the flow's configuration.
+        max_runtime: Seconds after which no new round is started.
+        executor: Executor for blocking work; None uses the loop's default.
+
+    Returns:
+        The run's outcome and throughput.
+    """
+    if session is None:
+        session = AutomationSession("default", language=get_language())
+    return await AsyncFlowEngine(flow, session, executor).run(max_rounds, max_runtime)
+
+
+async def run_sessions_async(
+    runs: Sequence[Tuple[AutomationSession, str]],
+    max_rounds: Optional[int] = None,
+    max_runtime: Optional[float] = None,
+    executor: Optional[Executor] = None
+) -> Dict[str, FlowResult]:
+    """
+    Play several sessions concurrently on the running event loop.
+
+    Args:
+        runs: ``(session, mode name)`` pairs.
+        max_rounds: Round limit per session.
+        max_runtime: Seconds after which no session starts a new round.
+        executor: Executor shared by all sessions for blocking work.
+
+    Returns:
+        Each session's result by name.
+    """
+    results = await asyncio.gather(*(
+        run_flow_async(get_flow(mode), session, max_rounds, max_runtime, executor)
+        for session, mode in runs
+    ))
+    return {session.name: result for (session, _), result in zip(runs, results)}
@@ -1,72 +1,146 @@
 """Click simulation utilities for automated game interaction."""
 
-import os
-import sys
+import functools
+import logging
 import random
-from typing import Optional, Tuple
+import threading
+import time
+from typing import Any, List, Optional, Sequence, Tuple
 
-import cv2
 import numpy as np
-from pywinauto import mouse, Application
-from pywinauto.controls.hwndwrapper import HwndWrapper
 from screeninfo import get_monitors
 
-from .screenshot import screenshot_monitor
-from .image_matching import findMatchings
+try:
+    from pywinauto import Application, mouse
+    from pywinauto.controls.hwndwrapper import HwndWrapper
+except ImportError:
+    # Not on Windows: only a game backend such as the simulator can be driven
+    Application = mouse = None
+    HwndWrapper = Any
+
+from .assets import SUPPORTED_LANGUAGES, get_template_path
+from .screenshot import CaptureRegion, CaptureSource, screenshot_monitor, screenshot_region
+from .session import GAME_WINDOW_CLASS, GAME_WINDOW_TITLE, current_session
+from .image_matching import ImageFeatures, ImageLike, LocationCache, ScaleCalibration, get_last_match_info
+from .incremental import IncrementalExtractor, default_extractor, is_incremental_enabled
+from .keypoint_budget import KeypointBudget, default_budget, is_budget_enabled
+from .layout import get_layout_model, observe_match
+from .templates import get_template_registry
+from .log import get_logger, set_log_level, is_debug_enabled
+from .metrics import Stages, timed, lookup
+from . import flight_recorder
 
 # Constants
 CLICK_DEVIATION_RANGE = 5  # Random pixel deviation for more human-like clicks
 DEFAULT_MONITOR = 1
+WINDOW_RECT_TTL = 2.0  # Seconds a looked-up game window rectangle is reused for keypoint masks
+CLICK_PATCH = 16  # Half the side of the patch around a clicked point compared to see the click took effect
+CLICK_CHANGE = 12.0  # Mean gray-level change of that patch that shows the game reacted
 
 # Global variables
 _current_language = "EN"
-_debug_mode = False  # Toggle for debug output
+_locations = LocationCache()
+_calibration = ScaleCalibration()
+_window_rect: Tuple[float, Optional[Tuple[int, int, int, int]]] = (float("-inf"), None)
+_backend: Optional[Any] = None
+# (capture source, point, patch around it) of the last click made from a frame
+_last_click: Optional[Tuple[CaptureSource, Tuple[int, int], np.ndarray]] = None
 
+# There is one mouse, so clicks from concurrent sessions must not interleave
+_input_lock = threading.Lock()
 
-def _get_base_path() -> str:
-    """Get the base path for assets, works both in dev and when packaged with PyInstaller."""
-    if getattr(sys, 'frozen', False):
-        # Running as compiled exe
-        return sys._MEIPASS
-    else:
-        # Running in development
-        return os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-
-
-_assets_base_path = os.path.join(_get_base_path(), "assets")
+_log = get_logger(__name__)
 
 
 def set_language(lang: str) -> None:
-    """Set the current language for asset loading (EN or CN)."""
+    """Set the current language for asset loading (EN or CN), for the active session if any."""
     global _current_language
-    if lang in ["EN", "CN"]:
-        _current_language = lang
-    else:
+    if lang not in SUPPORTED_LANGUAGES:
         raise ValueError(f"Invalid language: {lang}. Must be 'EN' or 'CN'")
+    session = current_session()
+    if session is not None:
+        session.language = lang
+    else:
+        _current_language = lang
 
 
 def get_language() -> str:
-    """Get the current language setting."""
-    return _current_language
+    """Get the current language setting (the active session's, if any)."""
+    session = current_session()
+    return session.language if session is not None else _current_language
+
+
+def get_location_cache() -> LocationCache:
+    """Get the known template locations of the active session, or of the standard game window."""
+    session = current_session()
+    return session.locations if session is not None else _locations
+
+
+def get_scale_calibration() -> ScaleCalibration:
+    """Get the UI scale calibration of the active session, or of the standard game window."""
+    session = current_session()
+    return session.calibration if session is not None else _calibration
+
+
+def get_incremental_extractor() -> Optional[IncrementalExtractor]:
+    """Get the incremental extractor of the active session, or of the standard game window; None when disabled."""
+    if not is_incremental_enabled():
+        return None
+    session = current_session()
+    return session.extractor if session is not None else default_extractor()
+
+
+def get_keypoint_budget() -> Optional[KeypointBudget]:
+    """Get the keypoint budget of the active session, or of the standard game window; None when disabled."""
+    if not is_budget_enabled():
+        return None
+    session = current_session()
+    return session.budget if session is not None else default_budget()
+
+
+def set_game_backend(backend: Optional[Any]) -> None:
+    """
+    Capture from and click into a stand-in for the game instead of the real window.
+    
+    Args:
+        backend: An object with a ``region`` (its CaptureRegion on the virtual
+            screen), ``capture(source)`` returning a grayscale frame and
+            ``click(x, y)`` taking screen coordinates, such as a
+            :class:`~automation.simulator.GameSimulator`; None drives the real game.
+    """
+    global _backend
+    _backend = backend
+
+
+def get_game_backend() -> Optional[Any]:
+    """Get the stand-in for the game, or None when the real game is driven."""
+    return _backend
 
 
 def get_asset_path(filename: str) -> str:
     """Get the full path to an asset file based on current language."""
-    return os.path.join(_assets_base_path, _current_language, filename)
+    return get_template_path(get_language(), filename)
 
 
 def get_game_window() -> Optional[HwndWrapper]:
     """
-    Get the game window object.
+    Get the game window object (the active session's, if any).
     
     Returns:
-        The game window object, or None if not found.
+        The game window object, or None if not found (or the game is simulated).
     """
+    if _backend is not None:
+        return None
+    
+    session = current_session()
+    if session is not None:
+        return session.get_window()
+    
     try:
-        app = Application().connect(class_name="UnityWndClass", title="AFK Journey")
-        return app.window(title="AFK Journey")
+        app = Application().connect(class_name=GAME_WINDOW_CLASS, title=GAME_WINDOW_TITLE)
+        return app.window(title=GAME_WINDOW_TITLE)
     except Exception as e:
-        print(f"Could not find game window: {e}")
+        _log.warning("Could not find game window: %s", e)
         return None
 
 
@@ -83,21 +157,48 @@ def get_game_monitor() -> int:
     
     try:
         rect = window.rectangle()
-        window_center_x = (rect.left + rect.right) // 2
-        window_center_y = (rect.top + rect.bottom) // 2
-        
-        monitors = get_monitors()
-        for i, monitor in enumerate(monitors):
-            if (monitor.x <= window_center_x < monitor.x + monitor.width and
-                monitor.y <= window_center_y < monitor.y + monitor.height):
-                return i + 1  # mss uses 1-indexed monitors
-        
-        return DEFAULT_MONITOR
+        return _monitor_at((rect.left + rect.right) // 2, (rect.top + rect.bottom) // 2)
     except Exception as e:
-        print(f"Error detecting monitor: {e}")
+        _log.warning("Error detecting monitor: %s", e)
         return DEFAULT_MONITOR
 
 
+def _monitor_at(x: int, y: int) -> int:
+    """Number (1-indexed for mss) of the monitor containing a screen point; DEFAULT_MONITOR if none does."""
+    monitors = get_monitors()
+    for i, monitor in enumerate(monitors):
+        if (monitor.x <= x < monitor.x + monitor.width and
+            monitor.y <= y < monitor.y + monitor.height):
+            return i + 1  # mss uses 1-indexed monitors
+    
+    return DEFAULT_MONITOR
+
+
+@functools.lru_cache(maxsize=16)
+def _region_monitor(region: CaptureRegion) -> int:
+    """The monitor a capture region is (mostly) on; cached, as sessions capture the same region every poll."""
+    return _monitor_at(region.left + region.width // 2, region.top + region.height // 2)
+
+
+def get_capture_source() -> CaptureSource:
+    """
+    What to capture to see the game.
+    
+    Returns:
+        The active session's window region, or else the number of the
+        monitor the game window is on.
+    """
+    if _backend is not None:
+        return _backend.region
+    
+    session = current_session()
+    if session is not None:
+        region = session.capture_region()
+        if region is not None:
+            return region
+    return get_game_monitor()
+
+
 def get_game_window_offset() -> Tuple[int, int]:
     """
     Get the game window's position offset for accurate clicking.
@@ -105,6 +206,9 @@ def get_game_window_offset() -> Tuple[int, int]:
     Returns:
         Tuple of (x, y) coordinates for the window's top-left corner.
     """
+    if _backend is not None:
+        return _backend.region.left, _backend.region.top
+    
     window = get_game_window()
     if window is None:
         monitors = get_monitors()
@@ -114,7 +218,7 @@ def get_game_window_offset() -> Tuple[int, int]:
         rect = window.rectangle()
         return rect.left, rect.top
     except Exception as e:
-        print(f"Error getting window offset: {e}")
+        _log.warning("Error getting window offset: %s", e)
         monitors = get_monitors()
         return monitors[0].x, monitors[0].y
 
@@ -128,117 +232,351 @@ def click(x: int, y: int, focus: bool = True) -> None:
         y: The y coordinate to click.
         focus: Whether to focus the game window before clicking.
     """
-    if focus:
-        window = get_game_window()
+    window = get_game_window() if focus else None
+    
+    with _input_lock:
         if window:
             window.set_focus()
-
-    mouse.move(coords=(x, y))
-    mouse.click(button='left', coords=(x, y))
+        
+        with timed(Stages.CLICK):
+            if _backend is not None:
+                _backend.click(x, y)
+            else:
+                mouse.move(coords=(x, y))
+                mouse.click(button='left', coords=(x, y))
+    
+    recorder = flight_recorder.get_flight_recorder()
+    if recorder is not None:
+        recorder.record_click(x, y)
 
 
 def simulateClickOnImage(
-    main_image: np.ndarray,
+    main_image: ImageLike,
     targetImage: str,
     min_x: int = -9999,
     min_y: int = -9999,
     focus: bool = True,
-    monitor_number: int = None
+    monitor_number: Optional[CaptureSource] = None
 ) -> bool:
     """
     Find a target image within a screenshot and click on it.
     
     Args:
-        main_image: The screenshot to search in (grayscale numpy array).
+        main_image: The screenshot to search in (grayscale numpy array), or its
+            ImageFeatures to share keypoint extraction between lookups.
         targetImage: The filename of the template image to find.
         min_x: Minimum x coordinate for valid matches.
         min_y: Minimum y coordinate for valid matches.
         focus: Whether to focus the game window before clicking.
-        monitor_number: The monitor number the screenshot was taken from (for offset calculation)
+        monitor_number: The monitor number or region the screenshot was taken from (for offset calculation)
         
     Returns:
         True if the image was found and clicked, False otherwise.
     """
+    with lookup(targetImage):
+        return _click_on_image(main_image, targetImage, min_x, min_y, focus, monitor_number)
+
+
+def _click_on_image(
+    main_image: ImageLike,
+    targetImage: str,
+    min_x: int,
+    min_y: int,
+    focus: bool,
+    monitor_number: Optional[CaptureSource]
+) -> bool:
+    """Body of simulateClickOnImage, run inside the template's metrics label."""
     asset_path = get_asset_path(targetImage)
     
-    _debug_print(f"Looking for template: {targetImage}")
-    _debug_print(f"Template path: {asset_path}")
+    # Checked once so the hot path builds no log arguments when debug is off
+    debug = _log.isEnabledFor(logging.DEBUG)
+    
+    if debug:
+        _log.debug("Looking for template: %s", targetImage)
+        _log.debug("Template path: %s", asset_path)
     
-    template = cv2.imread(asset_path, 0)
+    template = _load_template(targetImage)
     if template is None:
-        print(f"Warning: Could not load template image: {asset_path}")
+        _log.warning("Could not load template image: %s", asset_path)
         return False
     
-    _debug_print(f"Template size: {template.shape}")
-    _debug_print(f"Screenshot size: {main_image.shape}")
+    if debug:
+        _log.debug("Template size: %s", template.shape)
+        _log.debug("Screenshot size: %s", main_image.shape)
     
-    loc = findMatchings(main_image, template)
+    loc = _find_and_record(main_image, template, targetImage)
     
     if not loc:
-        _debug_print(f"No matches found for {targetImage}")
+        if debug:
+            _log.debug("No matches found for %s", targetImage)
         return False
     
-    _debug_print(f"Found {len(loc)} match(es) for {targetImage}")
+    if debug:
+        _log.debug("Found %d match(es) for %s", len(loc), targetImage)
     
     # Find first match that meets minimum coordinate requirements
     # Note: findMatchings returns center coordinates directly
     for i, pt in enumerate(loc):
-        _debug_print(f"Match {i+1} at relative position: ({pt[0]}, {pt[1]})")
+        if debug:
+            _log.debug("Match %d at relative position: (%d, %d)", i + 1, pt[0], pt[1])
         
         if pt[0] >= min_x and pt[1] >= min_y:
-            # Add random deviation for more human-like clicking
-            deviation_x = random.randint(-CLICK_DEVIATION_RANGE, CLICK_DEVIATION_RANGE)
-            deviation_y = random.randint(-CLICK_DEVIATION_RANGE, CLICK_DEVIATION_RANGE)
-            match_x = pt[0] + deviation_x
-            match_y = pt[1] + deviation_y
-            
-            _debug_print(f"Applied deviation: ({deviation_x}, {deviation_y})")
-            _debug_print(f"Adjusted match position: ({match_x}, {match_y})")
-
-            # Convert to screen coordinates
-            # Use monitor offset if provided, otherwise use game window offset
-            if monitor_number is not None:
-                offset_x, offset_y = get_monitor_offset(monitor_number)
-            else:
-                offset_x, offset_y = get_game_window_offset()
-            
-            screen_x = offset_x + match_x
-            screen_y = offset_y + match_y
-            
-            _debug_print(f"Monitor/Window offset: ({offset_x}, {offset_y})")
-            _debug_print(f"Final screen coordinates: ({screen_x}, {screen_y})")
-            print(f"✓ '{targetImage}' matched at ({pt[0]}, {pt[1]}) -> clicking at screen ({screen_x}, {screen_y})")
-            
-            click(screen_x, screen_y, focus=focus)
+            clickOnFramePoint(pt, targetImage, monitor_number, focus=focus, frame=main_image)
             return True
     
-    _debug_print(f"No valid matches found (all below min_x={min_x}, min_y={min_y})")
+    if debug:
+        _log.debug("No valid matches found (all below min_x=%d, min_y=%d)", min_x, min_y)
     return False
 
 
-def findImageLocation(targetImage: str) -> Optional[Tuple[int, int]]:
+def clickOnFramePoint(
+    pt: Tuple[int, int],
+    targetImage: str,
+    monitor_number: Optional[CaptureSource] = None,
+    focus: bool = True,
+    frame: Optional[ImageLike] = None
+) -> None:
+    """
+    Click a point found in a screenshot, converting it to screen coordinates.
+    
+    Args:
+        pt: Match center relative to the screenshot.
+        targetImage: The template the point belongs to (for logging).
+        monitor_number: The monitor or region the screenshot was taken from (for offset calculation).
+        focus: Whether to focus the game window before clicking.
+        frame: The screenshot the point was found in; remembered so click_took_effect
+            can tell when the game has redrawn the clicked spot.
+    """
+    debug = _log.isEnabledFor(logging.DEBUG)
+    
+    # Add random deviation for more human-like clicking
+    deviation_x = random.randint(-CLICK_DEVIATION_RANGE, CLICK_DEVIATION_RANGE)
+    deviation_y = random.randint(-CLICK_DEVIATION_RANGE, CLICK_DEVIATION_RANGE)
+    match_x = pt[0] + deviation_x
+    match_y = pt[1] + deviation_y
+    
+    if debug:
+        _log.debug("Applied deviation: (%d, %d)", deviation_x, deviation_y)
+        _log.debug("Adjusted match position: (%d, %d)", match_x, match_y)
+    
+    # Convert to screen coordinates
+    # Use monitor offset if provided, otherwise use game window offset
+    if monitor_number is not None:
+        offset_x, offset_y = get_monitor_offset(monitor_number)
+    else:
+        offset_x, offset_y = get_game_window_offset()
+    
+    screen_x = offset_x + match_x
+    screen_y = offset_y + match_y
+    
+    if debug:
+        _log.debug("Monitor/Window offset: (%d, %d)", offset_x, offset_y)
+        _log.debug("Final screen coordinates: (%d, %d)", screen_x, screen_y)
+    _log.info(
+        "✓ '%s' matched at (%d, %d) -> clicking at screen (%d, %d)",
+        targetImage, pt[0], pt[1], screen_x, screen_y,
+        extra={"template": targetImage, "screen_x": screen_x, "screen_y": screen_y},
+    )
+    
+    if frame is not None:
+        source = monitor_number if monitor_number is not None else get_capture_source()
+        _remember_click(source, pt, getattr(frame, "image", frame))
+    click(screen_x, screen_y, focus=focus)
+
+
+def _click_patch(image: np.ndarray, pt: Tuple[int, int]) -> np.ndarray:
+    x, y = int(pt[0]), int(pt[1])
+    return image[max(0, y - CLICK_PATCH):y + CLICK_PATCH, max(0, x - CLICK_PATCH):x + CLICK_PATCH]
+
+
+def _remember_click(source: CaptureSource, pt: Tuple[int, int], image: np.ndarray) -> None:
+    """Keep the patch around a clicked point, for the active session or the standard game window."""
+    global _last_click
+    mark = (source, pt, _click_patch(image, pt).copy())
+    session = current_session()
+    if session is not None:
+        session.last_click = mark
+    else:
+        _last_click = mark
+
+
+def click_took_effect() -> bool:
+    """
+    Check whether the game has redrawn the spot of the last click made from a frame.
+    
+    A capture taken right after a click can still show the screen as it was
+    before, so the next step must not poll until the clicked button changed
+    (it went away, or a dialog covered or dimmed it).
+    
+    Returns:
+        True once a new capture differs around the clicked point, or if no click
+        is remembered; False while it still looks the same.
+    """
+    session = current_session()
+    mark = session.last_click if session is not None else _last_click
+    if mark is None:
+        return True
+    source, pt, before = mark
+    screenshot = _capture(source)
+    if screenshot is None:
+        return False
+    after = _click_patch(screenshot, pt)
+    if after.shape != before.shape:
+        return True
+    return float(np.mean(np.abs(after.astype(np.int16) - before))) > CLICK_CHANGE
+
+
+def _load_template(targetImage: str) -> Optional[ImageFeatures]:
+    """Get a template for the current language from the shared registry."""
+    return get_template_registry().get(get_language(), targetImage)
+
+
+def _capture(source: CaptureSource) -> np.ndarray:
+    """Take a screenshot of a monitor or region (or the game backend) and hand it to the flight recorder, if enabled."""
+    if _backend is not None:
+        with timed(Stages.CAPTURE):
+            screenshot = _backend.capture(source)
+    elif isinstance(source, CaptureRegion):
+        screenshot = screenshot_region(source)
+    else:
+        screenshot = screenshot_monitor(source)
+    recorder = flight_recorder.get_flight_recorder()
+    if recorder is not None and screenshot is not None:
+        recorder.record_frame(screenshot, source)
+    return screenshot
+
+
+def _game_window_box(source: CaptureSource, frame_shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    """The game window's (left, top, right, bottom) in a frame captured from source."""
+    global _window_rect
+    height, width = frame_shape[:2]
+    if isinstance(source, CaptureRegion):
+        # A session captures exactly its window
+        return 0, 0, width, height
+    
+    checked, rect = _window_rect
+    if time.monotonic() - checked > WINDOW_RECT_TTL:
+        window = get_game_window()
+        try:
+            r = window.rectangle() if window is not None else None
+            rect = (r.left, r.top, r.right, r.bottom) if r is not None else None
+        except Exception:
+            rect = None
+        _window_rect = (time.monotonic(), rect)
+    if rect is None:
+        return 0, 0, width, height
+    
+    offset_x, offset_y = get_monitor_offset(source)
+    return rect[0] - offset_x, rect[1] - offset_y, rect[2] - offset_x, rect[3] - offset_y
+
+
+def frame_features(screenshot: Optional[np.ndarray], source: CaptureSource, templates: Sequence[str]) -> Optional[ImageFeatures]:
+    """
+    Wrap a capture for lookups of the given templates, so keypoints are only
+    extracted inside the game window, where those templates can appear,
+    only where the frame changed since the window's previous one and within
+    the window's keypoint budget, and lookups use the window's calibrated UI
+    scale.
+    
+    Args:
+        screenshot: The capture (grayscale), or None if it failed.
+        source: The monitor or region it was captured from.
+        templates: File names of the templates the frame will be searched for.
+    
+    Returns:
+        The capture's ImageFeatures, or None if the capture failed.
+    """
+    if screenshot is None:
+        return None
+    
+    window = _game_window_box(source, screenshot.shape)
+    
+    # The UI scale only changes when the window is resized or moves to a monitor with another DPI
+    calibration = get_scale_calibration()
+    if _backend is not None:
+        monitor = 0  # a simulated window is on no real monitor
+    else:
+        monitor = _region_monitor(source) if isinstance(source, CaptureRegion) else source
+    calibration.check((monitor, window[2] - window[0], window[3] - window[1]))
+    
+    layout = get_layout_model()
+    mask = None
+    if layout is not None:
+        language = get_language()
+        mask = layout.mask(screenshot.shape, window, [f"{language}/{name}" for name in templates])
+    return ImageFeatures(screenshot, mask=mask, window=window, calibration=calibration,
+                         extractor=get_incremental_extractor(), budget=get_keypoint_budget())
+
+
+def _find_and_record(main_image: ImageLike, template: ImageLike, targetImage: str) -> List[Tuple[int, int]]:
+    """Run a lookup (known location first) and log the decision to the flight recorder, if enabled."""
+    locations = get_location_cache()
+    key = f"{get_language()}/{targetImage}"
+    recorder = flight_recorder.get_flight_recorder()
+    start = time.perf_counter()
+    loc = locations.find(main_image, template, key)
+    if loc:
+        # Teach the layout model where this template shows, for future keypoint masks
+        observe_match(main_image, key, template.shape, loc[0], get_last_match_info().get("scale"))
+    if recorder is None:
+        return loc
+    
+    recorder.record_lookup(
+        targetImage,
+        get_language(),
+        found=bool(loc),
+        duration=time.perf_counter() - start,
+        match_info=get_last_match_info(),
+        frame=main_image.image if isinstance(main_image, ImageFeatures) else main_image,
+    )
+    return loc
+
+
+def capture_game_screen() -> Tuple[np.ndarray, CaptureSource]:
+    """
+    Take a screenshot of the game: the active session's window, or the monitor the game window is on.
+    
+    Returns:
+        Tuple of (grayscale screenshot, monitor number or capture region).
+    """
+    source = get_capture_source()
+    _log.debug("Taking screenshot from %s", source)
+    return _capture(source), source
+
+
+def findImageLocation(
+    targetImage: str,
+    screenshot: Optional[ImageLike] = None,
+    monitor_number: Optional[CaptureSource] = None
+) -> Optional[Tuple[int, int]]:
     """
     Find a target image in the game window without clicking.
     
     Args:
         targetImage: The filename of the template image to find.
+        screenshot: Optional screenshot to search instead of capturing a new one.
+        monitor_number: The monitor or region the screenshot was taken from (required with screenshot).
         
     Returns:
         Tuple of (screen_x, screen_y) coordinates if found, None otherwise.
     """
-    monitor = get_game_monitor()
-    screenshot = screenshot_monitor(monitor)
-    
     if screenshot is None:
-        return None
-    
-    asset_path = get_asset_path(targetImage)
-    template = cv2.imread(asset_path, 0)
+        monitor = get_capture_source()
+        with lookup(targetImage):
+            screenshot = frame_features(_capture(monitor), monitor, (targetImage,))
+    else:
+        monitor = monitor_number if monitor_number is not None else get_capture_source()
     
-    if template is None:
+    if screenshot is None:
         return None
     
-    loc = findMatchings(screenshot, template)
+    with lookup(targetImage):
+        template = _load_template(targetImage)
+        
+        if template is None:
+            return None
+        
+        loc = _find_and_record(screenshot, template, targetImage)
     
     if not loc:
         return None
@@ -251,13 +589,13 @@ def findImageLocation(targetImage: str) -> Optional[Tuple[int, int]]:
     screen_x = offset_x + pt[0]
     screen_y = offset_y + pt[1]
     
-    _debug_print(f"Found '{targetImage}' at screen coordinates ({screen_x}, {screen_y})")
+    _log.debug("Found '%s' at screen coordinates (%d, %d)", targetImage, screen_x, screen_y)
     return (screen_x, screen_y)
 
 
 def clickOnScreenShoot(targetImage: str, focus: bool = True) -> bool:
     """
-    Take a screenshot of the game window's monitor and click on the target image if found.
+    Take a screenshot of the game and click on the target image if found.
     
     Args:
         targetImage: The filename of the template image to find and click.
@@ -266,44 +604,41 @@ def clickOnScreenShoot(targetImage: str, focus: bool = True) -> bool:
     Returns:
         True if the image was found and clicked, False otherwise.
     """
-    monitor = get_game_monitor()
-    _debug_print(f"Taking screenshot from monitor {monitor}")
-    screenshot = screenshot_monitor(monitor)
+    monitor = get_capture_source()
+    _log.debug("Taking screenshot from %s", monitor)
+    with lookup(targetImage):
+        screenshot = frame_features(_capture(monitor), monitor, (targetImage,))
     return simulateClickOnImage(screenshot, targetImage, focus=focus, monitor_number=monitor)
 
 
 def set_debug_mode(enabled: bool) -> None:
     """Enable or disable debug output."""
-    global _debug_mode
-    _debug_mode = enabled
+    set_log_level(enabled)
 
 
 def is_debug_mode() -> bool:
     """Check if debug mode is enabled."""
-    return _debug_mode
-
+    return is_debug_enabled()
 
-def _debug_print(message: str) -> None:
-    """Print debug message if debug mode is enabled."""
-    if _debug_mode:
-        print(f"[DEBUG] {message}")
 
-
-def get_monitor_offset(monitor_number: int) -> Tuple[int, int]:
+def get_monitor_offset(monitor_number: CaptureSource) -> Tuple[int, int]:
     """
     Get the monitor's position offset in absolute screen coordinates.
     
     Args:
-        monitor_number: Monitor number (1-indexed)
+        monitor_number: Monitor number (1-indexed), or a capture region
         
     Returns:
-        Tuple of (x, y) coordinates for the monitor's top-left corner.
+        Tuple of (x, y) coordinates for the monitor's (or region's) top-left corner.
     """
+    if isinstance(monitor_number, CaptureRegion):
+        return monitor_number.left, monitor_number.top
+    
     monitors = get_monitors()
     if monitor_number < 1 or monitor_number > len(monitors):
-        _debug_print(f"Invalid monitor number {monitor_number}, using monitor 1")
+        _log.debug("Invalid monitor number %d, using monitor 1", monitor_number)
         monitor_number = 1
     
     monitor = monitors[monitor_number - 1]
-    _debug_print(f"Monitor {monitor_number} offset: ({monitor.x}, {monitor.y})")
+    _log.debug("Monitor %d offset: (%d, %d)", monitor_number, monitor.x, monitor.y)
     return monitor.x, monitor.y
\ No newline at end of file
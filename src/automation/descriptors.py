@@ -0,0 +1,202 @@
+"""Compact SIFT descriptor representations.
+
+SIFT descriptors are 128 float32 values per keypoint. Every cached template
+keeps them for the whole session, and every 4K frame has tens of thousands
+of them to index. The descriptor mode trades a little precision for memory
+and search time:
+
+- ``full``: raw float32 descriptors (the original behaviour).
+- ``rootsift``: RootSIFT (L1-normalise, then square root). Euclidean
+  distance between RootSIFT vectors is the Hellinger kernel on the originals,
+  which usually separates correct from wrong matches better.
+- ``compact``: RootSIFT, with cached template descriptors stored as float16.
+- ``pca``: ``compact`` reduced to :data:`PCA_DIMS` dimensions by a PCA basis
+  fitted on the templates' descriptors, which halves the KD-tree's work.
+
+Frames and templates are always encoded the same way so they can be
+matched; only templates use float16 storage, since a frame's descriptors
+are dropped after a few lookups anyway.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .log import get_logger
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+class DescriptorModes:
+    """Names of the available SIFT descriptor representations."""
+    FULL = "full"
+    ROOTSIFT = "rootsift"
+    COMPACT = "compact"
+    PCA = "pca"
+    ALL = (FULL, ROOTSIFT, COMPACT, PCA)
+
+
+PCA_DIMS = 64                 # dimensions kept by the PCA mode
+PCA_MAX_SAMPLES = 20000       # descriptors the PCA basis is fitted on at most
+
+FLANN_INDEX_KDTREE = 1
+
+
+def flann_params(dims: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    FLANN KD-tree parameters for descriptors of the given dimensionality.
+
+    Args:
+        dims: Descriptor length.
+
+    Returns:
+        ``(index_params, search_params)`` for ``cv2.FlannBasedMatcher``.
+    """
+    if dims >= 128:
+        return dict(algorithm=FLANN_INDEX_KDTREE, trees=5), dict(checks=50)
+    # Fewer dimensions spread the points better, so fewer trees and leaf checks suffice
+    return dict(algorithm=FLANN_INDEX_KDTREE, trees=4), dict(checks=32)
+
+
+# =============================================================================
+# Encoding
+# =============================================================================
+
+def rootsift(descriptors: np.ndarray) -> np.ndarray:
+    """L1-normalise SIFT descriptors and take the element-wise square root."""
+    descriptors = descriptors.astype(np.float32)
+    norms = np.abs(descriptors).sum(axis=1, keepdims=True)
+    return np.sqrt(descriptors / np.maximum(norms, 1e-7))
+
+
+class PcaBasis:
+    """A mean and the leading principal components of a descriptor sample."""
+
+    __slots__ = ("mean", "components")
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+
+    @property
+    def dims(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, descriptors: np.ndarray, dims: int = PCA_DIMS) -> "PcaBasis":
+        """
+        Fit a basis on RootSIFT descriptors.
+
+        Args:
+            descriptors: Sample of encoded (not yet reduced) descriptors, one per row.
+            dims: Number of components kept.
+
+        Returns:
+            The fitted basis.
+        """
+        descriptors = np.asarray(descriptors, dtype=np.float32)
+        if len(descriptors) > PCA_MAX_SAMPLES:
+            rng = np.random.default_rng(0)
+            descriptors = descriptors[rng.choice(len(descriptors), PCA_MAX_SAMPLES, replace=False)]
+        mean = descriptors.mean(axis=0)
+        _, _, vt = np.linalg.svd(descriptors - mean, full_matrices=False)
+        return cls(mean, vt[:dims])
+
+    def project(self, descriptors: np.ndarray) -> np.ndarray:
+        return (descriptors - self.mean) @ self.components.T
+
+
+def encode_sift(descriptors: Optional[np.ndarray], compact: bool = False) -> Optional[np.ndarray]:
+    """
+    Convert raw SIFT descriptors to the current descriptor mode.
+
+    Args:
+        descriptors: Output of ``detectAndCompute``, or None.
+        compact: Whether the result is kept for long (templates) and may be stored as float16.
+
+    Returns:
+        The encoded descriptors (float16 or float32), or None.
+    """
+    mode, basis = _mode, _basis
+    if descriptors is None or mode == DescriptorModes.FULL:
+        return descriptors
+    encoded = rootsift(descriptors)
+    if mode == DescriptorModes.PCA and basis is not None:
+        encoded = basis.project(encoded)
+    if compact and mode in (DescriptorModes.COMPACT, DescriptorModes.PCA):
+        return encoded.astype(np.float16)
+    return encoded
+
+
+def as_float32(descriptors: np.ndarray) -> np.ndarray:
+    """Descriptors as FLANN needs them; a no-op for float32."""
+    return np.asarray(descriptors, dtype=np.float32)
+
+
+def encoding_token() -> Tuple[str, int]:
+    """Identifies the current encoding; descriptors encoded under another token must be recomputed."""
+    return _mode, id(_basis) if _mode == DescriptorModes.PCA else 0
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+_mode = DescriptorModes.FULL
+_basis: Optional[PcaBasis] = None
+_lock = threading.Lock()
+
+
+def set_descriptor_mode(mode: str) -> None:
+    """Select the SIFT descriptor representation (one of :class:`DescriptorModes`)."""
+    global _mode
+    if mode not in DescriptorModes.ALL:
+        raise ValueError(f"Unknown descriptor mode: {mode}. Must be one of {', '.join(DescriptorModes.ALL)}")
+    _mode = mode
+
+
+def get_descriptor_mode() -> str:
+    """Get the SIFT descriptor representation."""
+    return _mode
+
+
+def fit_pca_basis(descriptor_sets: Iterable[Optional[np.ndarray]], dims: int = PCA_DIMS) -> Optional[PcaBasis]:
+    """
+    Fit and install the PCA basis from raw SIFT descriptors, unless one is installed.
+
+    Until a basis exists the ``pca`` mode matches like ``compact``.
+
+    Args:
+        descriptor_sets: Raw descriptors, e.g. one array per template.
+        dims: Number of components kept.
+
+    Returns:
+        The installed basis, or None if there were too few descriptors.
+    """
+    global _basis
+    with _lock:
+        if _basis is not None:
+            return _basis
+        sets = [rootsift(d) for d in descriptor_sets if d is not None and len(d)]
+        if not sets or sum(len(d) for d in sets) < dims * 4:
+            return None
+        _basis = PcaBasis.fit(np.vstack(sets), dims)
+        _log.debug("Fitted a %d-dimensional PCA basis on %d descriptors", dims, sum(len(d) for d in sets))
+        return _basis
+
+
+def get_pca_basis() -> Optional[PcaBasis]:
+    """Get the installed PCA basis, if any."""
+    return _basis
+
+
+def reset_pca_basis() -> None:
+    """Drop the PCA basis; descriptors encoded with it are recomputed on next use."""
+    global _basis
+    with _lock:
+        _basis = None
@@ -0,0 +1,173 @@
+"""Supervised executor that runs one automation job at a time.
+
+The GUI used to start a new thread on every button press, so pressing two
+buttons ran two automation loops that fought over the mouse and both
+captured the screen. :class:`AutomationExecutor` owns a single worker
+thread instead. Submitting a job stops the running one (and drops any job
+still waiting), and the new job starts only once the old one has returned,
+so exactly one mode runs at a time. Its state can be polled from any
+thread, e.g. by the GUI through ``root.after``.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+from .log import get_logger
+
+_log = get_logger(__name__)
+
+
+class JobStates:
+    """Lifecycle of the executor's current job."""
+    IDLE = "idle"
+    RUNNING = "running"
+    STOPPING = "stopping"    # stop requested, waiting for the job to return
+
+
+class ExecutorStatus(NamedTuple):
+    """Snapshot of an executor, safe to read from another thread."""
+    state: str
+    job: Optional[str]
+    started: Optional[float]       # time.monotonic() when the current job started
+    last_job: Optional[str]
+    last_result: Any
+    last_error: Optional[BaseException]
+
+    @property
+    def running_for(self) -> float:
+        """Seconds the current job has been running."""
+        return time.monotonic() - self.started if self.started is not None else 0.0
+
+
+class _Job(NamedTuple):
+    name: str
+    func: Callable[[], Any]
+    generation: int        # the executor's cancel generation when the job was submitted
+
+
+_SHUTDOWN = _Job("shutdown", lambda: None, -1)
+
+
+class AutomationExecutor:
+    """One worker thread, a job queue, and cooperative cancellation."""
+
+    def __init__(self, stop_flag: threading.Event, stop: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            stop_flag: Event the jobs poll to know they should stop; cleared before each job starts.
+            stop: Called to stop the running job; by default only ``stop_flag`` is set.
+        """
+        self.stop_flag = stop_flag
+        self._stop = stop
+        self._jobs: "queue.Queue[_Job]" = queue.Queue()
+        self._lock = threading.Lock()
+        # Bumped by every submit and cancel, so a job the worker dequeued just before is not started
+        self._generation = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self._status = ExecutorStatus(JobStates.IDLE, None, None, None, None, None)
+        self._thread = threading.Thread(target=self._work, name="automation", daemon=True)
+        self._thread.start()
+
+    def submit(self, name: str, func: Callable[[], Any]) -> None:
+        """
+        Run a job, replacing whatever is running or waiting.
+
+        Args:
+            name: Job name shown in the status, e.g. the mode name.
+            func: The job; it should return soon after ``stop_flag`` is set.
+        """
+        with self._lock:
+            self._drop_pending()
+            self._idle.clear()
+            self._generation += 1
+            self._jobs.put(_Job(name, func, self._generation))
+            self._request_stop()
+        _log.info("Queued %s", name)
+
+    def cancel(self) -> None:
+        """Stop the running job and drop any waiting one."""
+        with self._lock:
+            self._drop_pending()
+            self._generation += 1
+            self._request_stop()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until no job is running or waiting.
+
+        Args:
+            timeout: Maximum seconds to wait.
+
+        Returns:
+            True if the executor is idle.
+        """
+        return self._idle.wait(timeout)
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """Cancel everything and stop the worker; returns whether it finished within ``timeout``."""
+        self.cancel()
+        self._jobs.put(_SHUTDOWN)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def status(self) -> ExecutorStatus:
+        """The current state, job and the outcome of the last finished job."""
+        with self._lock:
+            return self._status
+
+    def _drop_pending(self) -> None:
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is _SHUTDOWN:
+                # Never lose a shutdown request
+                self._jobs.put(job)
+                break
+            _log.debug("Dropped queued job %s", job.name)
+
+    def _request_stop(self) -> None:
+        if self._status.state != JobStates.RUNNING:
+            return
+        self._status = self._status._replace(state=JobStates.STOPPING)
+        if self._stop is not None:
+            self._stop()
+        else:
+            self.stop_flag.set()
+
+    def _work(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is _SHUTDOWN:
+                self._idle.set()
+                return
+
+            with self._lock:
+                if job.generation != self._generation:
+                    # Submitted or cancelled after this job was dequeued, before it could be marked running
+                    _log.debug("Dropped queued job %s", job.name)
+                    if self._jobs.empty():
+                        self._idle.set()
+                    continue
+                # The previous job has returned, so clearing the flag cannot revive it
+                self.stop_flag.clear()
+                self._status = self._status._replace(state=JobStates.RUNNING, job=job.name,
+                                                     started=time.monotonic())
+            _log.info("Started %s", job.name)
+
+            result, error = None, None
+            try:
+                result = job.func()
+            except Exception as e:
+                error = e
+                _log.exception("%s failed", job.name)
+
+            with self._lock:
+                self._status = ExecutorStatus(JobStates.IDLE, None, None, job.name, result, error)
+                if self._jobs.empty():
+                    self._idle.set()
+            _log.info("Finished %s", job.name)
@@ -0,0 +1,289 @@
+"""Session flight recorder for post-mortem analysis of slow or failed rounds.
+
+The recorder keeps the last few captured frames and every lookup decision and
+click in fixed-size in-memory rings. Nothing touches the disk during normal
+operation; a dump is written only when a round exceeds its latency budget,
+the fail limit is reached, or the user stops the automation. Dumps can be fed
+back through ``findMatchings`` with :mod:`automation.replay`.
+
+Dump layout::
+
+    flight_20240101_120000_latency_budget/
+    ├── events.json       # metadata, lookups, clicks and round markers
+    └── frame_000042.npz  # one compressed grayscale frame per retained capture
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .log import get_logger
+
+# numpy is only needed to write dumps; importing the recorder stays cheap at startup
+if TYPE_CHECKING:
+    import numpy as np
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+DEFAULT_FRAME_CAPACITY = 10
+DEFAULT_EVENT_CAPACITY = 2000
+DEFAULT_DUMP_DIR = "flight_dumps"
+EVENTS_FILE = "events.json"
+
+
+class FlushReasons:
+    """Why a dump was written."""
+    LATENCY_BUDGET = "latency_budget"
+    MAX_FAILS = "max_fails"
+    STOP = "stop"
+    MANUAL = "manual"
+
+
+def frame_file_name(frame_id: int) -> str:
+    """File name of a frame inside a dump directory."""
+    return f"frame_{frame_id:06d}.npz"
+
+
+# =============================================================================
+# Recorder
+# =============================================================================
+
+class FlightRecorder:
+    """Fixed-size ring of recent frames and lookup events."""
+
+    def __init__(
+        self,
+        dump_dir: str = DEFAULT_DUMP_DIR,
+        frame_capacity: int = DEFAULT_FRAME_CAPACITY,
+        event_capacity: int = DEFAULT_EVENT_CAPACITY,
+        latency_budget: Optional[float] = None,
+    ):
+        """
+        Args:
+            dump_dir: Directory dumps are written to.
+            frame_capacity: Number of most recent frames kept in memory.
+            event_capacity: Number of most recent events kept in memory.
+            latency_budget: Round duration in seconds above which a dump is written.
+        """
+        self.dump_dir = dump_dir
+        self.latency_budget = latency_budget
+        self._frames = deque(maxlen=frame_capacity)
+        self._events = deque(maxlen=event_capacity)
+        self._lock = threading.Lock()
+        self._next_frame_id = 0
+        self._round_start: Optional[float] = None
+        self._round_info: Dict[str, Any] = {}
+
+    # -------------------------------------------------------------------------
+    # Recording
+    # -------------------------------------------------------------------------
+
+    def record_frame(self, frame: "np.ndarray", monitor: Optional[int] = None) -> int:
+        """
+        Keep a reference to a captured frame.
+
+        Args:
+            frame: The grayscale screenshot (not copied; frames are never mutated).
+            monitor: The monitor the frame was captured from.
+
+        Returns:
+            The id assigned to the frame, referenced by later lookup events.
+        """
+        with self._lock:
+            frame_id = self._next_frame_id
+            self._next_frame_id += 1
+            self._frames.append((frame_id, time.time(), frame))
+        self._append_event("frame", frame_id=frame_id, monitor=monitor, shape=list(frame.shape))
+        return frame_id
+
+    def record_lookup(
+        self,
+        template: str,
+        language: str,
+        found: bool,
+        duration: float,
+        match_info: Dict[str, Any],
+        frame: Optional["np.ndarray"] = None,
+    ) -> None:
+        """Record a lookup decision with its strategy, score and inlier ratio."""
+        frame_id = self._find_frame_id(frame) if frame is not None else None
+        self._append_event(
+            "lookup",
+            template=template,
+            language=language,
+            found=found,
+            duration=duration,
+            frame_id=frame_id,
+            **match_info,
+        )
+
+    def record_click(self, x: int, y: int) -> None:
+        """Record a click at absolute screen coordinates."""
+        self._append_event("click", x=int(x), y=int(y))
+
+    def begin_round(self, mode: str, round_index: int) -> None:
+        """Mark the start of a round."""
+        self._round_start = time.perf_counter()
+        self._round_info = {"mode": mode, "round": round_index}
+        self._append_event("round_start", **self._round_info)
+
+    def end_round(self, won: bool, fail_count: int, max_fails: int) -> Optional[str]:
+        """
+        Mark the end of a round and dump if it was slow or hit the fail limit.
+
+        Args:
+            won: Whether the round was won.
+            fail_count: Consecutive failures after this round.
+            max_fails: Fail limit of the current mode.
+
+        Returns:
+            Path of the dump written, if any.
+        """
+        duration = time.perf_counter() - self._round_start if self._round_start else 0.0
+        self._append_event("round_end", won=won, fail_count=fail_count,
+                           duration=duration, **self._round_info)
+        self._round_start = None
+
+        if fail_count >= max_fails:
+            return self.flush(FlushReasons.MAX_FAILS)
+        if self.latency_budget is not None and duration > self.latency_budget:
+            return self.flush(FlushReasons.LATENCY_BUDGET)
+        return None
+
+    def _find_frame_id(self, frame: "np.ndarray") -> Optional[int]:
+        with self._lock:
+            for frame_id, _, kept in reversed(self._frames):
+                if kept is frame:
+                    return frame_id
+        return None
+
+    def _append_event(self, kind: str, **fields: Any) -> None:
+        fields["kind"] = kind
+        fields["time"] = time.time()
+        self._events.append(fields)
+
+    # -------------------------------------------------------------------------
+    # Dumping
+    # -------------------------------------------------------------------------
+
+    def flush(self, reason: str = FlushReasons.MANUAL) -> Optional[str]:
+        """
+        Write the current rings to a new dump directory in a background thread.
+
+        Args:
+            reason: Why the dump is written (see :class:`FlushReasons`).
+
+        Returns:
+            Path of the dump directory, or None if there was nothing to dump.
+        """
+        with self._lock:
+            frames = list(self._frames)
+            events = list(self._events)
+        if not events:
+            return None
+
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.dump_dir, f"flight_{stamp}_{reason}")
+        path = base
+        suffix = 1
+        try:
+            while True:
+                try:
+                    os.makedirs(path)
+                    break
+                except FileExistsError:
+                    suffix += 1
+                    path = f"{base}_{suffix}"
+        except OSError as e:
+            _log.warning("Could not create flight recorder dump %s: %s", path, e)
+            return None
+
+        # Disk I/O and compression stay off the automation thread. Dumps are often
+        # triggered right before the process exits, so the writer is not a daemon:
+        # interpreter shutdown waits for it instead of killing it mid-file
+        threading.Thread(
+            target=self._write_dump, args=(path, reason, frames, events), name="flight-dump", daemon=False
+        ).start()
+        _log.info("Flight recorder dump (%s) -> %s", reason, path)
+        return path
+
+    @staticmethod
+    def _write_dump(path: str, reason: str, frames: List[tuple], events: List[Dict[str, Any]]) -> None:
+        import numpy as np
+
+        try:
+            # Events first, so a dump cut short still loads (frames it lacks are skipped)
+            metadata = {
+                "reason": reason,
+                "created": time.time(),
+                "frames": [{"frame_id": fid, "time": ts} for fid, ts, _ in frames],
+                "events": events,
+            }
+            events_path = os.path.join(path, EVENTS_FILE)
+            with open(f"{events_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(metadata, f, indent=1, default=str)
+            os.replace(f"{events_path}.tmp", events_path)
+
+            for frame_id, _, frame in frames:
+                # Like the events, written under a temporary name so a file is either complete or absent
+                frame_path = os.path.join(path, frame_file_name(frame_id))
+                with open(f"{frame_path}.tmp", "wb") as f:
+                    np.savez_compressed(f, frame=frame)
+                os.replace(f"{frame_path}.tmp", frame_path)
+        except OSError as e:
+            _log.warning("Could not write flight recorder dump %s: %s", path, e)
+
+
+# =============================================================================
+# Global Recorder
+# =============================================================================
+
+_recorder: Optional[FlightRecorder] = None
+
+
+def enable_flight_recorder(
+    dump_dir: str = DEFAULT_DUMP_DIR,
+    frame_capacity: int = DEFAULT_FRAME_CAPACITY,
+    latency_budget: Optional[float] = None,
+) -> FlightRecorder:
+    """Create and install the process-wide flight recorder."""
+    global _recorder
+    _recorder = FlightRecorder(dump_dir, frame_capacity, latency_budget=latency_budget)
+    return _recorder
+
+
+def disable_flight_recorder() -> None:
+    """Remove the process-wide flight recorder."""
+    global _recorder
+    _recorder = None
+
+
+def get_flight_recorder() -> Optional[FlightRecorder]:
+    """Get the installed flight recorder, or None if recording is off."""
+    return _recorder
+
+
+def begin_round(mode: str, round_index: int) -> None:
+    """Mark the start of a round on the installed recorder, if any."""
+    if _recorder is not None:
+        _recorder.begin_round(mode, round_index)
+
+
+def end_round(won: bool, fail_count: int, max_fails: int) -> None:
+    """Mark the end of a round on the installed recorder, if any."""
+    if _recorder is not None:
+        _recorder.end_round(won, fail_count, max_fails)
+
+
+def flush_on_stop() -> None:
+    """Dump the installed recorder because the user stopped the automation."""
+    if _recorder is not None:
+        _recorder.flush(FlushReasons.STOP)
@@ -0,0 +1,537 @@
+"""Declarative battle flows and the engine that runs them.
+
+Every automation mode is the same round played over a different set of
+screens: optionally adopt a team from the records, confirm it, start the
+battle and read the result. A :class:`Flow` describes one mode as data -- its
+``BattleConfig``, its team selection policy and the steps of a round, each
+naming the templates expected on screen and the step that follows. The
+:class:`FlowEngine` plays any flow.
+
+Because every step names the screens that can come next, the engine warms
+those templates' features in the background while the current step is still
+waiting, and each poll only probes the templates the step expects.
+"""
+
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from .click_simulation import click, get_keypoint_budget, get_language, get_location_cache
+from .game_automation import (
+    BattleConfig,
+    Delays,
+    Images,
+    Timeouts,
+    Transitions,
+    _wait_for_battle_result,
+    should_stop,
+    sleep,
+    wait_for,
+    wait_for_any,
+    wait_for_click_effect,
+)
+from .image_matching import LocationCache
+from .keypoint_budget import KeypointBudget, format_budget
+from .log import get_logger
+from .rotation import TeamRotation
+from .session import current_session
+from .stats import Phases, get_run_stats
+from .templates import get_template_registry
+from . import flight_recorder
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Flow Definitions
+# =============================================================================
+
+class Actions:
+    """What a step does once its expected screen shows."""
+    CLICK = "click"                  # click the first expected template that appears
+    SELECT_TEAM = "select_team"      # page through the record list and adopt a team
+    BATTLE_RESULT = "battle_result"  # wait for the battle to end and read the result
+
+
+class TeamSelection:
+    """When a round starts by adopting a team from the records."""
+    EVERY_ROUND = "every_round"
+    ON_THRESHOLD = "on_threshold"    # first round and whenever the team rotation picks another record
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    One state of a round.
+
+    Attributes:
+        name: Unique step name within its flow.
+        action: One of :class:`Actions`.
+        phase: The :class:`Phases` value the step's time is booked under.
+        templates: Templates expected on screen during this step, in priority order.
+        timeout: Default upper bound on the wait, in seconds.
+        transition: Timing model transition measured by the wait.
+        next: Step that follows (after a loss, for battle results); None ends the round.
+        next_on_win: Step that follows a won battle; None ends the round.
+        focus: Whether to focus the game window before clicking.
+        poll_interval: Delay between polls in seconds.
+    """
+    name: str
+    action: str
+    phase: str
+    templates: Tuple[str, ...] = ()
+    timeout: float = Timeouts.FIGHT
+    transition: Optional[str] = None
+    next: Optional[str] = None
+    next_on_win: Optional[str] = None
+    focus: bool = False
+    poll_interval: float = Delays.POLL
+
+
+@dataclass(frozen=True)
+class Flow:
+    """
+    A complete automation mode.
+
+    Attributes:
+        name: Mode name used in logs and flight recorder dumps.
+        label: Human-readable name.
+        config: The mode's ``BattleConfig`` entry.
+        team_selection: One of :class:`TeamSelection`.
+        steps: The steps of a round.
+        select_entry: First step of a round that selects a team.
+        direct_entry: First step of a round that keeps the current team.
+    """
+    name: str
+    label: str
+    config: Dict[str, int]
+    team_selection: str
+    steps: Tuple[Step, ...]
+    select_entry: str = "record"
+    direct_entry: str = "round_check_mark"
+
+    def step(self, name: Optional[str]) -> Optional[Step]:
+        """Look up a step by name; None for None."""
+        if name is None:
+            return None
+        for step in self.steps:
+            if step.name == name:
+                return step
+        raise KeyError(f"Flow {self.name} has no step {name!r}")
+
+
+def battle_steps(
+    win_image: str,
+    battle_checks: int,
+    check_delay: float,
+    double_confirm: bool = False,
+    win_followup: Optional[str] = None
+) -> Tuple[Step, ...]:
+    """
+    The steps of a standard battle round.
+
+    Args:
+        win_image: Template that shows when the battle is won.
+        battle_checks: Maximum number of result checks.
+        check_delay: Delay between result checks.
+        double_confirm: Whether the battle needs a second check mark and fight click.
+        win_followup: Template to click after a win to reach the next battle, if any.
+
+    Returns:
+        The round's steps.
+    """
+    after_fight = "confirm_check_mark" if double_confirm else "battle"
+    steps = [
+        # The record button is the first thing of the round, so allow for the
+        # previous round's result screen to clear
+        Step("record", Actions.CLICK, Phases.TEAM_SELECT, (Images.RECORD,), Timeouts.ROUND_START,
+             Transitions.RESULT_TO_RECORD, next="record_list", focus=True),
+        Step("record_list", Actions.SELECT_TEAM, Phases.TEAM_SELECT,
+             (Images.NEXT, Images.ADOPT_TEAM), Timeouts.RECORD_LIST,
+             Transitions.RECORD_TO_LIST, next="check_mark"),
+        Step("check_mark", Actions.CLICK, Phases.START, (Images.CHECK_MARK,), Timeouts.TEAM_ADOPTED,
+             Transitions.ADOPT_TO_CHECK_MARK, next="fight"),
+        Step("round_check_mark", Actions.CLICK, Phases.START, (Images.CHECK_MARK,), Timeouts.ROUND_START,
+             Transitions.RESULT_TO_CHECK_MARK, next="fight"),
+        Step("fight", Actions.CLICK, Phases.START, (Images.FIGHT,), Timeouts.FIGHT,
+             Transitions.CHECK_MARK_TO_FIGHT, next=after_fight),
+    ]
+    if double_confirm:
+        steps += [
+            Step("confirm_check_mark", Actions.CLICK, Phases.START, (Images.CHECK_MARK,), Timeouts.CONFIRM,
+                 Transitions.FIGHT_TO_CONFIRM, next="confirm_fight"),
+            Step("confirm_fight", Actions.CLICK, Phases.START, (Images.FIGHT,), Timeouts.FIGHT,
+                 Transitions.CHECK_MARK_TO_FIGHT, next="battle"),
+        ]
+    steps.append(
+        Step("battle", Actions.BATTLE_RESULT, Phases.BATTLE, (Images.FIGHT_AGAIN, win_image),
+             battle_checks * check_delay, Transitions.FIGHT_TO_RESULT,
+             next_on_win="win_followup" if win_followup else None, poll_interval=check_delay)
+    )
+    if win_followup:
+        steps.append(
+            Step("win_followup", Actions.CLICK, Phases.RESULT, (win_followup,), Timeouts.WIN_TRANSITION,
+                 Transitions.WIN_TO_CHALLENGE)
+        )
+    return tuple(steps)
+
+
+class Flows:
+    """The built-in automation modes."""
+    AUTO_FIGHT = Flow(
+        "autoFight", "Auto Fight", BattleConfig.AUTO_FIGHT, TeamSelection.ON_THRESHOLD,
+        battle_steps(Images.CHALLENGE, BattleConfig.AUTO_FIGHT["battle_checks"], Delays.BATTLE_CHECK),
+    )
+    AUTO_P_FIGHT = Flow(
+        "autoPFight", "Auto P Fight", BattleConfig.AUTO_P_FIGHT, TeamSelection.ON_THRESHOLD,
+        battle_steps(Images.CHALLENGE3, BattleConfig.AUTO_P_FIGHT["battle_checks"], Delays.BATTLE_CHECK + 1,
+                     double_confirm=True),
+    )
+    AUTO_FIGHT_FRIENDS = Flow(
+        "autoFightFriends", "Auto Fight Friends", BattleConfig.FRIENDS, TeamSelection.EVERY_ROUND,
+        battle_steps(Images.NEXT_LEVEL, BattleConfig.FRIENDS["battle_checks"], Delays.BATTLE_CHECK + 1,
+                     win_followup=Images.CHALLENGE),
+    )
+    AUTO_P_FIGHT_FRIENDS = Flow(
+        "autoPFightFriends", "Auto P Fight Friends", BattleConfig.FRIENDS, TeamSelection.EVERY_ROUND,
+        battle_steps(Images.NEXT_LEVEL, BattleConfig.FRIENDS["battle_checks"], Delays.BATTLE_CHECK + 1,
+                     win_followup=Images.CHALLENGE3),
+    )
+    FACTION_CHALLENGE = Flow(
+        "FactionChallenge", "Faction Challenge", BattleConfig.FACTION, TeamSelection.EVERY_ROUND,
+        battle_steps(Images.NEXT_LEVEL, BattleConfig.FACTION["battle_checks"], Delays.BATTLE_CHECK + 1,
+                     double_confirm=True),
+    )
+
+    ALL = (AUTO_FIGHT, AUTO_P_FIGHT, AUTO_FIGHT_FRIENDS, AUTO_P_FIGHT_FRIENDS, FACTION_CHALLENGE)
+
+
+def get_flow(name: str) -> Flow:
+    """Look up a built-in flow by its mode name (e.g. ``autoFight``)."""
+    for flow in Flows.ALL:
+        if flow.name == name:
+            return flow
+    raise KeyError(f"Unknown mode {name!r}")
+
+
+# =============================================================================
+# Prefetching
+# =============================================================================
+
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _prefetch(language: str, templates: Set[str]) -> None:
+    """Warm template features in the background so the next step's first poll does not pay for them."""
+    global _prefetch_executor
+    if not templates:
+        return
+    if _prefetch_executor is None:
+        _prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+    _prefetch_executor.submit(get_template_registry().warm, language, sorted(templates))
+
+
+# =============================================================================
+# Engine
+# =============================================================================
+
+class EndReasons:
+    """Why a run ended."""
+    ROUND_LIMIT = "round_limit"
+    MAX_FAILS = "max_fails"
+    MAX_RUNTIME = "max_runtime"
+    STOPPED = "stopped"
+
+
+class FlowResult:
+    """Outcome and throughput of one run of a flow."""
+
+    __slots__ = ("mode", "rounds", "wins", "elapsed", "reason")
+
+    def __init__(self, mode: str, rounds: int, wins: int, elapsed: float, reason: str):
+        self.mode = mode
+        self.rounds = rounds
+        self.wins = wins
+        self.elapsed = elapsed
+        self.reason = reason
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.rounds if self.rounds else 0.0
+
+    @property
+    def battles_per_hour(self) -> float:
+        return self.rounds * 3600 / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        """One-line throughput summary."""
+        return (f"{self.mode}: {self.rounds} rounds, {self.wins} won ({self.win_rate:.1%}) "
+                f"in {self.elapsed / 60:.1f} min, {self.battles_per_hour:.1f} battles/h, ended by {self.reason}")
+
+
+class FlowEngine:
+    """Plays the rounds of a :class:`Flow` until its round or failure limit."""
+
+    def __init__(self, flow: Flow, rotation: Optional[TeamRotation] = None):
+        """
+        Args:
+            flow: The flow to play.
+            rotation: Team rotation memory; by default the persisted one of the mode (and session).
+        """
+        self.flow = flow
+        self.fail = 0
+        self.rounds_played = 0
+        self.wins = 0
+        self.team_index = 0
+        self.phase_times: Dict[str, float] = {}
+        self.rotation = rotation if rotation is not None else TeamRotation.for_mode(flow.name, self._profile())
+        self._team_adopted = False
+
+    def run(self, max_rounds: Optional[int] = None, max_runtime: Optional[float] = None) -> FlowResult:
+        """
+        Play rounds until a limit is reached or a stop is requested.
+
+        Args:
+            max_rounds: Round limit; defaults to the flow's ``max_rounds``.
+            max_runtime: Seconds after which no new round is started.
+
+        Returns:
+            The run's outcome and throughput.
+        """
+        max_rounds = self._begin_run(max_rounds)
+        try:
+            while True:
+                reason = self._end_reason(max_rounds, max_runtime)
+                if reason is not None:
+                    break
+                won = self.play_round()
+                # A round cut short by a stop request would skew the statistics
+                if self._should_stop():
+                    reason = self._stopped()
+                    break
+                self._finish_round(won)
+        finally:
+            self._end_run()
+        return self._result(reason)
+
+    def play_round(self) -> bool:
+        """
+        Play one round from its entry step, timing each phase into ``phase_times``.
+
+        Returns:
+            True if the battle was won.
+        """
+        step = self._enter_round()
+        won = False
+
+        while step is not None:
+            if self._should_stop():
+                return False
+            self._prefetch_successors(step)
+            step_start = time.monotonic()
+
+            if step.action == Actions.BATTLE_RESULT:
+                won = self._battle_result(step)
+                next_step = step.next_on_win if won else step.next
+            else:
+                if step.action == Actions.SELECT_TEAM:
+                    self._select_team(step)
+                else:
+                    self._click(step)
+                next_step = step.next
+
+            self._book(step, step_start)
+            step = self.flow.step(next_step)
+
+        return won
+
+    # -------------------------------------------------------------------------
+    # Round bookkeeping
+    # -------------------------------------------------------------------------
+
+    def _should_stop(self) -> bool:
+        return should_stop()
+
+    def _language(self) -> str:
+        return get_language()
+
+    def _location_cache(self) -> LocationCache:
+        return get_location_cache()
+
+    def _keypoint_budget(self) -> Optional[KeypointBudget]:
+        return get_keypoint_budget()
+
+    def _profile(self) -> Optional[str]:
+        """Name the team rotation memory is kept under besides the mode, if any."""
+        session = current_session()
+        return session.name if session is not None else None
+
+    def _record_count(self) -> int:
+        """How many records the rotation may choose from: as many as max_fails losses could page through."""
+        config = self.flow.config
+        return -(-config["max_fails"] // config["fail_threshold"])
+
+    def _begin_run(self, max_rounds: Optional[int]) -> int:
+        """Open the run's statistics and warm the entry screens; returns the effective round limit."""
+        flow = self.flow
+        self._run_start = time.monotonic()
+        self._stats = get_run_stats()
+        self._run_id = self._stats_call(self._stats.begin_run, flow.name, self._language()) if self._stats else None
+        # Warm both possible entry screens before the first round needs them
+        _prefetch(self._language(), set(flow.step(flow.select_entry).templates)
+                  | set(flow.step(flow.direct_entry).templates))
+        return flow.config["max_rounds"] if max_rounds is None else max_rounds
+
+    def _end_reason(self, max_rounds: int, max_runtime: Optional[float]) -> Optional[str]:
+        """Why no further round should be played, or None to play one."""
+        if self.rounds_played >= max_rounds:
+            return EndReasons.ROUND_LIMIT
+        if self.fail >= self.flow.config["max_fails"]:
+            return EndReasons.MAX_FAILS
+        if max_runtime is not None and time.monotonic() - self._run_start >= max_runtime:
+            _log.info("%s reached its maximum runtime", self.flow.label)
+            return EndReasons.MAX_RUNTIME
+        if self._should_stop():
+            return self._stopped()
+        return None
+
+    def _stopped(self) -> str:
+        _log.info("%s stopped by user", self.flow.label)
+        return EndReasons.STOPPED
+
+    def _enter_round(self) -> Step:
+        """Start a round: pick the team and return the entry step."""
+        flow = self.flow
+        team = self.rotation.choose(self.fail, flow.config["fail_threshold"], self._record_count())
+        # Open the records only when a different team must be adopted
+        select = (flow.team_selection == TeamSelection.EVERY_ROUND
+                  or not self._team_adopted or team != self.team_index)
+        if team != self.team_index or not self._team_adopted:
+            _log.info("Adopting record %d", team + 1, extra={"team_index": team})
+        self.team_index = team
+        self._team_adopted = True
+        self.phase_times = {}
+        self._round_started_at = time.time()
+        self._round_start = time.monotonic()
+        flight_recorder.begin_round(flow.name, self.rounds_played)
+        return flow.step(flow.select_entry if select else flow.direct_entry)
+
+    def _book(self, step: Step, step_start: float) -> None:
+        """Add a finished step's time to its phase."""
+        self.phase_times[step.phase] = self.phase_times.get(step.phase, 0.0) + time.monotonic() - step_start
+
+    def _finish_round(self, won: bool) -> None:
+        """Record a completed round and update the fail count."""
+        if self._run_id is not None:
+            self._stats_call(self._stats.record_round, self._run_id, self.rounds_played, self.flow.name,
+                             self._language(), self.team_index, won, self._round_started_at,
+                             time.monotonic() - self._round_start, self.phase_times)
+
+        self.rotation.record(self.team_index, won)
+        self.rotation.save()
+
+        self.fail = 0 if won else self.fail + 1
+        self.wins += won
+        _log.info("fail count: %d", self.fail, extra={"fail_count": self.fail})
+        flight_recorder.end_round(won, self.fail, self.flow.config["max_fails"])
+
+        self.rounds_played += 1
+
+    def _end_run(self) -> None:
+        if self._run_id is not None:
+            self._stats_call(self._stats.end_run, self._run_id)
+        lookups = self._location_cache().stats()
+        if lookups["total"]:
+            _log.info("Known-location checks have answered %.0f%% of %d lookups (%d present, %d absent)",
+                      lookups["hit_rate"] * 100, lookups["total"], lookups["present"], lookups["absent"])
+        budget = self._keypoint_budget()
+        if budget is not None:
+            snapshot = budget.snapshot()
+            if snapshot:
+                _log.info("%s", format_budget(snapshot))
+
+    def _result(self, reason: str) -> FlowResult:
+        return FlowResult(self.flow.name, self.rounds_played, self.wins,
+                          time.monotonic() - self._run_start, reason)
+
+    @staticmethod
+    def _stats_call(method, *args):
+        """Call a statistics store method; a database problem must not stop the automation."""
+        try:
+            return method(*args)
+        except sqlite3.Error as e:
+            _log.warning("Could not write run statistics: %s", e)
+            return None
+
+    def _prefetch_successors(self, step: Step) -> None:
+        successors = {step.next, step.next_on_win} - {None}
+        if step.next is None:
+            # The round may end here, so the next round's entry can follow
+            successors |= {self.flow.select_entry, self.flow.direct_entry}
+        templates = {t for name in successors for t in self.flow.step(name).templates}
+        _prefetch(self._language(), templates)
+
+    # -------------------------------------------------------------------------
+    # Step actions
+    # -------------------------------------------------------------------------
+
+    def _click(self, step: Step) -> Optional[str]:
+        """Click the first of the step's templates to appear, then wait for the click to take effect."""
+        if len(step.templates) == 1:
+            found = wait_for(step.templates[0], step.timeout, step.poll_interval, click=True,
+                             focus=step.focus, transition=step.transition)
+            clicked = step.templates[0] if found else None
+        else:
+            clicked = wait_for_any(step.templates, step.timeout, step.poll_interval, click=True,
+                                   transition=step.transition)
+        if clicked is not None:
+            # Otherwise the next step could match a frame still showing this screen
+            wait_for_click_effect()
+        return clicked
+
+    def _select_team(self, step: Step) -> None:
+        """Page to the record chosen by the team rotation and adopt it."""
+        next_image, adopt_image = step.templates
+        next_clicks = self.team_index
+
+        if next_clicks > 0:
+            # Wait for the record list, finding the NEXT button location once
+            next_location = wait_for(next_image, step.timeout, step.poll_interval,
+                                     transition=step.transition)
+
+            if next_location:
+                # Click the same location multiple times
+                for _ in range(next_clicks):
+                    if should_stop():
+                        _log.info("Team selection interrupted by stop request")
+                        return
+                    click(next_location[0], next_location[1], focus=False)
+                    # Paging has no distinct end screen, so keep a short settle delay
+                    sleep(Delays.NEXT)
+            else:
+                _log.warning("NEXT button not found, skipping navigation")
+
+        if should_stop():
+            return
+
+        # After paging the list is already showing, so only time the direct case
+        transition = step.transition if next_clicks == 0 else None
+        if wait_for(adopt_image, step.timeout, step.poll_interval, click=True, transition=transition):
+            wait_for_click_effect()
+
+    def _battle_result(self, step: Step) -> bool:
+        """Wait for the battle to end; the step's last template is the win screen."""
+        return _wait_for_battle_result(
+            win_image=step.templates[-1],
+            max_checks=max(1, round(step.timeout / step.poll_interval)),
+            check_delay=step.poll_interval,
+            mode=self.flow.name,
+            team=self.team_index,
+        )
+
+
+def run_flow(flow: Flow, max_rounds: Optional[int] = None, max_runtime: Optional[float] = None) -> FlowResult:
+    """Play a flow until its limits or a stop request (see :meth:`FlowEngine.run`)."""
+    return FlowEngine(flow).run(max_rounds, max_runtime)
@@ -1,10 +1,31 @@
 """Game automation functions for AFK Journey."""
 
 import time
-from typing import Optional, Callable
+from typing import TYPE_CHECKING, Callable, Optional, Sequence, Union
 from threading import Event
 
-from .click_simulation import clickOnScreenShoot, findImageLocation, click
+from .click_simulation import (
+    capture_game_screen,
+    clickOnFramePoint,
+    clickOnScreenShoot,
+    click_took_effect,
+    findImageLocation,
+    frame_features,
+    get_keypoint_budget,
+    get_language,
+    get_location_cache,
+)
+from .scene import SceneClassifier, SceneResult, Scenes
+from .session import current_session, stop_all_sessions
+from .log import get_logger
+from .keypoint_budget import KeypointBudget
+from .timing import BattleSchedule, get_timing_model
+from . import flight_recorder
+
+if TYPE_CHECKING:
+    from .flows import FlowResult
+
+_log = get_logger(__name__)
 
 
 # =============================================================================
@@ -13,16 +34,38 @@ from .click_simulation import clickOnScreenShoot, findImageLocation, click
 
 # Timing constants (in seconds)
 class Delays:
-    """Delay constants for various actions."""
-    RECORD = 1.0
+    """Poll intervals and settle delays for transitions with no visible end state."""
+    POLL = 0.25
     NEXT = 0.5
-    ADOPT = 1.0
-    CHECK_MARK = 1.0
-    FIGHT = 1.0
-    BATTLE_WAIT = 5.0
     BATTLE_CHECK = 2.0
-    END_ROUND = 4.0
-    WIN_TRANSITION = 3.0
+    CLICK_EFFECT = 0.1
+
+
+class Timeouts:
+    """Upper bounds (in seconds) on how long to wait for the next expected screen."""
+    ROUND_START = 15.0
+    RECORD_LIST = 5.0
+    TEAM_ADOPTED = 5.0
+    FIGHT = 5.0
+    CONFIRM = 5.0
+    WIN_TRANSITION = 10.0
+    CLICK_EFFECT = 2.0
+
+
+class Transitions:
+    """Measured UI transitions (previous action -> expected screen) for the timing model."""
+    RESULT_TO_RECORD = "result->record"
+    RESULT_TO_CHECK_MARK = "result->check_mark"
+    RECORD_TO_LIST = "record->list"
+    ADOPT_TO_CHECK_MARK = "adopt->check_mark"
+    CHECK_MARK_TO_FIGHT = "check_mark->fight"
+    FIGHT_TO_CONFIRM = "fight->check_mark"
+    FIGHT_TO_RESULT = "fight->result"
+    WIN_TO_CHALLENGE = "win->challenge"
+
+
+# Consecutive team-select polls after which a battle result counts as missed
+RESULT_MISSED_POLLS = 3
 
 
 # Battle configuration
@@ -62,312 +105,484 @@ def set_stop_flag(flag: Event) -> None:
 
 
 def stop_automation() -> None:
-    """Signal all automation to stop."""
+    """Signal all automation to stop, including every session."""
     global _stop_flag
     if _stop_flag:
         _stop_flag.set()
+    stop_all_sessions()
+    flight_recorder.flush_on_stop()
+
+
+def _active_stop_flag() -> Optional[Event]:
+    """The stop event of the calling thread's session, or the global one."""
+    session = current_session()
+    return session.stop_event if session is not None else _stop_flag
 
 
 def should_stop() -> bool:
     """Check if automation should stop."""
-    global _stop_flag
-    return _stop_flag is not None and _stop_flag.is_set()
+    flag = _active_stop_flag()
+    return flag is not None and flag.is_set()
 
 
 # =============================================================================
-# Helper Functions
+# Wait Primitives
 # =============================================================================
 
-def _select_team(fail_count: int, fail_threshold: int) -> None:
-    """Select a team from the records based on fail count."""
-    if should_stop():
-        return
+def sleep(seconds: float) -> bool:
+    """
+    Sleep that wakes up as soon as a stop is requested.
     
-    clickOnScreenShoot(Images.RECORD)
-    time.sleep(Delays.RECORD)
+    Returns:
+        True if the full delay elapsed, False if interrupted by a stop request.
+    """
+    flag = _active_stop_flag()
+    if flag is None:
+        time.sleep(seconds)
+        return True
+    return not flag.wait(seconds)
+
+
+class PollPlan:
+    """
+    When to poll while waiting for a screen, and what to learn from the outcome.
+    
+    Shared by wait_for and the asyncio engine's wait, which differ only in how
+    they sleep and poll: with a transition, the timing model sets the timeout
+    and first poll delay and learns the latency; with a battle schedule, the
+    schedule does; a wait that times out also widens the keypoint budget.
+    """
     
-    if should_stop():
-        return
+    def __init__(
+        self,
+        timeout: float,
+        poll_interval: float,
+        transition: Optional[str] = None,
+        shrink_timeout: bool = True,
+        schedule: Optional[BattleSchedule] = None,
+        budget: Optional[KeypointBudget] = None,
+        learn_if: Optional[Callable[[object], bool]] = None
+    ):
+        """
+        Args:
+            timeout: Maximum time to wait in seconds, before the timing model adjusts it.
+            poll_interval: Delay between polls in seconds, unless a schedule sets it.
+            transition: Name of the transition being waited for, if it is timed.
+            shrink_timeout: Whether the learned timeout may be shorter than ``timeout``.
+            schedule: A battle's poll schedule, used instead of ``transition``.
+            budget: The keypoint budget of the window being polled, if any.
+            learn_if: Whether a poll result completed the transition; a result it
+                rejects ends the wait but is learned from as a timeout.
+        """
+        self.start = time.monotonic()
+        self.poll_interval = poll_interval
+        self.transition = transition
+        self.schedule = schedule
+        self.budget = budget
+        self.learn_if = learn_if
+        self.model = get_timing_model() if transition is not None and schedule is None else None
+        self._first_delay = 0.0
+        if schedule is not None:
+            timeout = schedule.timeout
+            self._first_delay = schedule.first_delay()
+        elif self.model is not None:
+            timeout = self.model.timeout_for(transition, timeout, shrink=shrink_timeout)
+            # Skip polls that would almost certainly come too early
+            self._first_delay = self.model.first_poll_delay(transition)
+        self.timeout = timeout
+        self.deadline = self.start + timeout
+        self._previous_poll: Optional[float] = None
     
-    # Calculate how many times to click next
-    next_clicks = fail_count // fail_threshold
+    def first_delay(self) -> float:
+        """Seconds to wait before the first poll."""
+        return min(self._first_delay, self.timeout)
     
-    if next_clicks > 0:
-        # Find NEXT button location once
-        next_location = findImageLocation(Images.NEXT)
+    def next_delay(self, poll_start: float) -> Optional[float]:
+        """
+        Seconds from a poll that found nothing to the next one.
+        
+        Args:
+            poll_start: ``time.monotonic()`` when the poll started.
         
-        if next_location:
-            # Click the same location multiple times
-            for i in range(next_clicks):
-                if should_stop():
-                    print("Team selection interrupted by stop request")
-                    return
-                click(next_location[0], next_location[1], focus=False)
-                time.sleep(Delays.NEXT)
+        Returns:
+            The delay, or None once the timeout has passed.
+        """
+        self._previous_poll = poll_start - self.start
+        now = time.monotonic()
+        remaining = self.deadline - now
+        if remaining <= 0:
+            return None
+        interval = self.poll_interval
+        if self.schedule is not None:
+            interval = self.schedule.next_delay(now - self.start)
+        return min(interval, remaining)
+    
+    def on_hit(self, poll_start: float, result: object) -> None:
+        """Learn from a poll, started at ``poll_start``, that found the screen."""
+        if self.learn_if is not None and not self.learn_if(result):
+            self.on_timeout()
+            return
+        if self.schedule is not None:
+            self.schedule.observe(poll_start - self.start, self._previous_poll)
+        elif self.model is not None:
+            self.model.observe(self.transition, poll_start - self.start)
+    
+    def on_timeout(self) -> None:
+        """Learn from a wait that timed out (not one interrupted by a stop)."""
+        if self.schedule is not None:
+            self.schedule.miss()
+        elif self.model is not None:
+            self.model.miss(self.transition)
+        # The budget may have dropped the keypoints the screen needed
+        if self.budget is not None:
+            self.budget.widen()
+
+
+def wait_for(
+    target: Union[str, Callable[[], object]],
+    timeout: float,
+    poll_interval: float = Delays.POLL,
+    click: bool = False,
+    focus: bool = False,
+    transition: Optional[str] = None,
+    shrink_timeout: bool = True,
+    schedule: Optional[BattleSchedule] = None,
+    learn_if: Optional[Callable[[object], bool]] = None
+) -> object:
+    """
+    Wait until a screen state appears, returning as soon as it does.
+    
+    Args:
+        target: A template file name to look for, or a predicate polled until truthy.
+        timeout: Maximum time to wait in seconds.
+        poll_interval: Delay between polls in seconds.
+        click: For templates, click the template once it appears.
+        focus: Whether to focus the game window before clicking.
+        transition: Name of the transition being waited for; when given, the
+            timing model schedules the first poll and timeout from the learned
+            latency, and learns from the outcome.
+        shrink_timeout: Whether the learned timeout may be shorter than ``timeout``.
+        schedule: A battle's poll schedule; when given, it sets the timeout and
+            the time between polls and learns from the outcome instead of
+            ``transition`` and ``poll_interval``.
+        learn_if: Whether a poll result completed the transition; a result it
+            rejects is returned but learned from as a timeout.
+    
+    Returns:
+        The truthy poll result (True after a click, or the template's screen
+        coordinates), or None on timeout or stop.
+    """
+    if isinstance(target, str):
+        if click:
+            check = lambda: clickOnScreenShoot(target, focus=focus)
         else:
-            # Fallback: use the old method if location not found
-            print("Warning: NEXT button not found, skipping navigation")
+            check = lambda: findImageLocation(target)
+    else:
+        check = target
     
-    if should_stop():
-        return
+    plan = PollPlan(timeout, poll_interval, transition, shrink_timeout, schedule, get_keypoint_budget(), learn_if)
+    delay = plan.first_delay()
+    if delay > 0 and not sleep(delay):
+        return None
     
-    clickOnScreenShoot(Images.ADOPT_TEAM, focus=False)
-    time.sleep(Delays.ADOPT)
+    while not should_stop():
+        poll_start = time.monotonic()
+        result = check()
+        if result:
+            plan.on_hit(poll_start, result)
+            return result
+        
+        delay = plan.next_delay(poll_start)
+        if delay is None or not sleep(delay):
+            break
+    
+    if not should_stop():
+        plan.on_timeout()
+    _log.debug("wait_for %s gave up after %.1fs", target, plan.timeout)
+    return None
 
 
-def _start_battle(double_confirm: bool = False) -> None:
-    """Start a battle with optional double confirmation."""
-    if should_stop():
-        return
+def wait_for_click_effect() -> bool:
+    """
+    Wait until the game has redrawn the spot of the last click (see click_took_effect).
     
-    clickOnScreenShoot(Images.CHECK_MARK, focus=False)
-    time.sleep(Delays.CHECK_MARK)
+    A frame captured right after a click may still show the screen before it,
+    where the next step's template can already show (e.g. the fight button
+    behind a confirmation dialog), so steps wait for this before polling.
     
-    if should_stop():
-        return
+    Returns:
+        True once the click took effect, False on timeout or stop.
+    """
+    deadline = time.monotonic() + Timeouts.CLICK_EFFECT
+    while not should_stop():
+        if click_took_effect():
+            return True
+        if time.monotonic() >= deadline:
+            _log.debug("Clicked spot unchanged after %.1fs, continuing", Timeouts.CLICK_EFFECT)
+            break
+        if not sleep(Delays.CLICK_EFFECT):
+            break
+    return False
+
+
+def _classify_game_screen(classifier: SceneClassifier) -> SceneResult:
+    """Capture the game screen once and classify it."""
+    screenshot, monitor = capture_game_screen()
+    # Keypoints are only extracted where the classifier's templates can appear
+    screenshot = frame_features(screenshot, monitor, classifier.templates)
+    result = classifier.classify(screenshot, get_language(), get_location_cache())
+    result.monitor = monitor
+    return result
+
+
+def wait_for_scene(
+    classifier: SceneClassifier,
+    accept: Sequence[str],
+    timeout: float,
+    poll_interval: float = Delays.POLL,
+    transition: Optional[str] = None,
+    shrink_timeout: bool = True
+) -> Optional[SceneResult]:
+    """
+    Wait until the classifier reports one of the accepted scenes.
     
-    clickOnScreenShoot(Images.FIGHT, focus=False)
+    Each poll costs one capture and one shared feature extraction, however
+    many templates the classifier knows.
     
-    if double_confirm:
-        time.sleep(Delays.FIGHT * 2)
-        
-        if should_stop():
-            return
-        
-        clickOnScreenShoot(Images.CHECK_MARK, focus=False)
-        time.sleep(Delays.CHECK_MARK)
-        
-        if should_stop():
-            return
-        
-        clickOnScreenShoot(Images.FIGHT, focus=False)
+    Args:
+        classifier: The scene classifier to poll.
+        accept: Scenes that end the wait.
+        timeout: Maximum time to wait in seconds.
+        poll_interval: Delay between polls in seconds.
+        transition: Name of the transition being waited for (see wait_for).
+        shrink_timeout: Whether the learned timeout may be shorter than ``timeout``.
+    
+    Returns:
+        The accepted classification, or None on timeout or stop.
+    """
+    def check() -> Optional[SceneResult]:
+        result = _classify_game_screen(classifier)
+        return result if result.scene in accept else None
+    
+    return wait_for(check, timeout, poll_interval,
+                    transition=transition, shrink_timeout=shrink_timeout)
+
+
+def wait_for_any(
+    templates: Sequence[str],
+    timeout: float,
+    poll_interval: float = Delays.POLL,
+    click: bool = False,
+    transition: Optional[str] = None,
+    shrink_timeout: bool = True
+) -> Optional[str]:
+    """
+    Wait until any of several templates appears, using one screenshot per poll.
+    
+    Args:
+        templates: Template file names, in priority order.
+        timeout: Maximum time to wait in seconds.
+        poll_interval: Delay between polls in seconds.
+        click: Click the template found.
+        transition: Name of the transition being waited for (see wait_for).
+        shrink_timeout: Whether the learned timeout may be shorter than ``timeout``.
+    
+    Returns:
+        The template that appeared, or None on timeout or stop.
+    """
+    classifier = SceneClassifier([(template, (template,)) for template in templates])
+    result = wait_for_scene(classifier, templates, timeout, poll_interval,
+                            transition=transition, shrink_timeout=shrink_timeout)
+    if result is None:
+        return None
+    if click:
+        clickOnFramePoint(result.location, result.template, result.monitor, focus=False, frame=result.frame)
+    return result.template
+
+
+# =============================================================================
+# Helper Functions
+# =============================================================================
+
+def _battle_classifier(win_image: str) -> SceneClassifier:
+    """Scenes that can show while waiting for a battle result."""
+    return SceneClassifier(
+        [
+            (Scenes.LOST, (Images.FIGHT_AGAIN,)),
+            (Scenes.WON, (win_image,)),
+            (Scenes.TEAM_SELECT, (Images.CHECK_MARK, Images.FIGHT)),
+            (Scenes.RECORD_LIST, (Images.ADOPT_TEAM,)),
+        ],
+        default_scene=Scenes.IN_BATTLE,
+    )
+
+
+def _battle_result_filter() -> Callable[[SceneResult], Optional[SceneResult]]:
+    """
+    Build a filter for battle result polls.
+    
+    The filter passes a result screen through, and also a screen showing the
+    result was missed (team selection seen on several consecutive polls).
+    Every other screen yields None.
+    """
+    off_result_polls = 0
+    
+    def accept(result: SceneResult) -> Optional[SceneResult]:
+        nonlocal off_result_polls
+        if result.scene in (Scenes.WON, Scenes.LOST):
+            return result
+        # Back at team selection without seeing a result: the result was missed
+        if result.scene in (Scenes.TEAM_SELECT, Scenes.RECORD_LIST):
+            off_result_polls += 1
+            if off_result_polls >= RESULT_MISSED_POLLS:
+                return result
+        else:
+            off_result_polls = 0
+        return None
+    
+    return accept
+
+
+def _is_battle_result(result: SceneResult) -> bool:
+    """Whether a battle poll saw the result; a missed result says nothing about the battle's length."""
+    return result.scene in (Scenes.WON, Scenes.LOST)
 
 
 def _wait_for_battle_result(
     win_image: str,
     max_checks: int,
     check_delay: float,
-    on_win: Optional[Callable[[], None]] = None
+    on_win: Optional[Callable[[], None]] = None,
+    mode: Optional[str] = None,
+    team: int = 0
 ) -> bool:
     """
     Wait for battle result and detect win/loss.
     
+    Each check classifies a single screenshot against every screen that can
+    follow a battle, so win and loss are decided from the same moment.
+    
     Args:
         win_image: Image to detect for a win condition.
         max_checks: Maximum number of result checks.
         check_delay: Delay between checks.
         on_win: Optional callback to execute on win.
-        
+        mode: Mode name the battle is fought in; when given, polls follow the
+            battle length learned for the mode and team (see BattleSchedule).
+        team: Index of the team fighting the battle.
+    
     Returns:
         True if battle was won, False if lost.
     """
-    for _ in range(max_checks):
-        # Check stop flag in the battle waiting loop
+    classifier = _battle_classifier(win_image)
+    accept = _battle_result_filter()
+    
+    def check() -> Optional[SceneResult]:
+        return accept(_classify_game_screen(classifier))
+    
+    timeout = max_checks * check_delay
+    schedule = None
+    if mode is not None:
+        schedule = BattleSchedule(get_timing_model(), Transitions.FIGHT_TO_RESULT, mode, team,
+                                  timeout, check_delay)
+    
+    result = wait_for(
+        check,
+        timeout=timeout,
+        poll_interval=check_delay,
+        transition=Transitions.FIGHT_TO_RESULT,
+        shrink_timeout=False,  # battle length depends on the team, never cut it short
+        schedule=schedule,
+        learn_if=_is_battle_result
+    )
+    
+    if result is None:
         if should_stop():
-            print("Battle result check interrupted by stop request")
-            return False
-        
-        if clickOnScreenShoot(Images.FIGHT_AGAIN, focus=False):
-            print("battle lost")
-            return False
-        
-        if clickOnScreenShoot(win_image, focus=False):
-            print("battle won")
-            if on_win:
-                on_win()
-            return True
-        
-        time.sleep(check_delay)
+            _log.info("Battle result check interrupted by stop request")
+        return False
     
-    return False
+    if result.scene not in (Scenes.WON, Scenes.LOST):
+        _log.warning("Battle result missed, game is back at %s", result.scene)
+        return False
+    
+    clickOnFramePoint(result.location, result.template, result.monitor, focus=False, frame=result.frame)
+    
+    if result.scene == Scenes.LOST:
+        _log.info("battle lost", extra={"result": "lost"})
+        return False
+    
+    _log.info("battle won", extra={"result": "won"})
+    if on_win:
+        on_win()
+    return True
 
 
 # =============================================================================
 # Main Automation Functions
 # =============================================================================
+# Each mode is a declarative flow (see flows.py) played by the flow engine.
+
+def _run_flow(name: str, max_rounds: Optional[int], max_runtime: Optional[float]) -> "FlowResult":
+    # flows builds on this module's primitives, so import it on first use
+    from .flows import Flows, run_flow
+    return run_flow(getattr(Flows, name), max_rounds, max_runtime)
 
-def autoFight() -> None:
+
+def autoFight(max_rounds: Optional[int] = None, max_runtime: Optional[float] = None) -> "FlowResult":
     """
     Automated AFK challenge battle loop.
     
     Continuously fights battles, selecting different teams after consecutive failures.
-    """
-    config = BattleConfig.AUTO_FIGHT
-    rounds = config["max_rounds"]
-    fail = 0
     
-    while rounds > 0 and fail < config["max_fails"]:
-        if should_stop():
-            print("Auto Fight stopped by user")
-            return
-        
-        # Select team on first attempt or after threshold failures
-        if fail % config["fail_threshold"] == 0:
-            _select_team(fail, config["fail_threshold"])
-        
-        _start_battle()
-        time.sleep(Delays.BATTLE_WAIT)
-        
-        # Wait for result
-        won = _wait_for_battle_result(
-            win_image=Images.CHALLENGE,
-            max_checks=config["battle_checks"],
-            check_delay=Delays.BATTLE_CHECK
-        )
-        
-        fail = 0 if won else fail + 1
-        print(f"fail count: {fail}")
-        
-        time.sleep(Delays.END_ROUND)
-        rounds -= 1
+    Args:
+        max_rounds: Round limit; defaults to the mode's BattleConfig.
+        max_runtime: Seconds after which no new round is started.
+    
+    Returns:
+        The run's outcome and throughput.
+    """
+    return _run_flow("AUTO_FIGHT", max_rounds, max_runtime)
 
 
-def autoPFight() -> None:
+def autoPFight(max_rounds: Optional[int] = None, max_runtime: Optional[float] = None) -> "FlowResult":
     """
     Automated Phatimal challenge battle loop.
     
     Similar to autoFight but with double confirmation and different win detection.
-    """
-    config = BattleConfig.AUTO_P_FIGHT
-    rounds = config["max_rounds"]
-    fail = 0
     
-    while rounds > 0 and fail < config["max_fails"]:
-        if should_stop():
-            print("Auto P Fight stopped by user")
-            return
-        
-        # Select team on first attempt or after threshold failures
-        if fail % config["fail_threshold"] == 0:
-            _select_team(fail, config["fail_threshold"])
-        
-        _start_battle(double_confirm=True)
-        
-        # Wait for result
-        won = _wait_for_battle_result(
-            win_image=Images.CHALLENGE3,
-            max_checks=config["battle_checks"],
-            check_delay=Delays.BATTLE_CHECK + 1
-        )
-        
-        fail = 0 if won else fail + 1
-        print(f"fail count: {fail}")
-        
-        time.sleep(Delays.END_ROUND + 1)
-        rounds -= 1
+    Takes the same limits and returns the same result as autoFight.
+    """
+    return _run_flow("AUTO_P_FIGHT", max_rounds, max_runtime)
 
 
-def autoFightFriends() -> None:
+def autoFightFriends(max_rounds: Optional[int] = None, max_runtime: Optional[float] = None) -> "FlowResult":
     """
     Automated friend challenge battle loop.
     
     Fights friend battles with level progression on wins.
-    """
-    config = BattleConfig.FRIENDS
-    rounds = config["max_rounds"]
-    fail = 0
     
-    def on_win():
-        if should_stop():
-            return
-        time.sleep(Delays.WIN_TRANSITION)
-        if should_stop():
-            return
-        clickOnScreenShoot(Images.CHALLENGE, focus=False)
-    
-    while rounds > 0 and fail < config["max_fails"]:
-        if should_stop():
-            print("Auto Fight Friends stopped by user")
-            return
-        
-        _select_team(fail, config["fail_threshold"])
-        _start_battle()
-        time.sleep(Delays.BATTLE_WAIT)
-        
-        # Wait for result
-        won = _wait_for_battle_result(
-            win_image=Images.NEXT_LEVEL,
-            max_checks=config["battle_checks"],
-            check_delay=Delays.BATTLE_CHECK + 1,
-            on_win=on_win
-        )
-        
-        fail = 0 if won else fail + 1
-        print(f"fail count: {fail}")
-        
-        time.sleep(Delays.END_ROUND)
-        rounds -= 1
+    Takes the same limits and returns the same result as autoFight.
+    """
+    return _run_flow("AUTO_FIGHT_FRIENDS", max_rounds, max_runtime)
 
 
-def autoPFightFriends() -> None:
+def autoPFightFriends(max_rounds: Optional[int] = None, max_runtime: Optional[float] = None) -> "FlowResult":
     """
     Automated friend Phatimal challenge battle loop.
     
     Similar to autoFightFriends but uses challenge3 image on win.
-    """
-    config = BattleConfig.FRIENDS
-    rounds = config["max_rounds"]
-    fail = 0
-    
-    def on_win():
-        if should_stop():
-            return
-        time.sleep(Delays.WIN_TRANSITION)
-        if should_stop():
-            return
-        clickOnScreenShoot(Images.CHALLENGE3, focus=False)
     
-    while rounds > 0 and fail < config["max_fails"]:
-        if should_stop():
-            print("Auto P Fight Friends stopped by user")
-            return
-        
-        _select_team(fail, config["fail_threshold"])
-        _start_battle()
-        time.sleep(Delays.BATTLE_WAIT)
-        
-        # Wait for result
-        won = _wait_for_battle_result(
-            win_image=Images.NEXT_LEVEL,
-            max_checks=config["battle_checks"],
-            check_delay=Delays.BATTLE_CHECK + 1,
-            on_win=on_win
-        )
-        
-        fail = 0 if won else fail + 1
-        print(f"fail count: {fail}")
-        
-        time.sleep(Delays.END_ROUND)
-        rounds -= 1
+    Takes the same limits and returns the same result as autoFight.
+    """
+    return _run_flow("AUTO_P_FIGHT_FRIENDS", max_rounds, max_runtime)
 
 
-def FactionChallenge() -> None:
+def FactionChallenge(max_rounds: Optional[int] = None, max_runtime: Optional[float] = None) -> "FlowResult":
     """
     Automated faction challenge battle loop.
     
     Fights faction battles with double confirmation and level progression.
-    """
-    config = BattleConfig.FACTION
-    rounds = config["max_rounds"]
-    fail = 0
     
-    while rounds > 0 and fail < config["max_fails"]:
-        if should_stop():
-            print("Faction Challenge stopped by user")
-            return
-        
-        _select_team(fail, config["fail_threshold"])
-        _start_battle(double_confirm=True)
-        
-        # Wait for result
-        won = _wait_for_battle_result(
-            win_image=Images.NEXT_LEVEL,
-            max_checks=config["battle_checks"],
-            check_delay=Delays.BATTLE_CHECK + 1
-        )
-        
-        fail = 0 if won else fail + 1
-        print(f"fail count: {fail}")
-        
-        time.sleep(Delays.END_ROUND - 2)
-        rounds -= 1
\ No newline at end of file
+    Takes the same limits and returns the same result as autoFight.
+    """
+    return _run_flow("FACTION_CHALLENGE", max_rounds, max_runtime)
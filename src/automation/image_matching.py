@@ -1,84 +1,270 @@
 """Image matching utilities with scale-invariant feature matching."""
 
+import threading
+import time
+from concurrent.futures import Executor
+
 import cv2
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional, Union
+
+from .descriptors import as_float32, encode_sift, encoding_token, flann_params
+from .log import get_logger
+from .metrics import Counters, Stages, count, timed
+from .verification import remember_transform, verify_matches
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Feature Extraction
+# =============================================================================
+
+# OpenCV detectors are not thread-safe, so each thread gets its own
+_detectors = threading.local()
+
+
+def _get_detector(kind: str, limits: Optional[tuple] = None):
+    """
+    Get this thread's SIFT or AKAZE detector, creating it on first use.
+    
+    Args:
+        kind: ``sift`` or ``akaze``.
+        limits: A KeypointLimits (see automation.keypoint_budget) the detector is
+            created with; None uses OpenCV's defaults.
+    """
+    detectors = getattr(_detectors, "by_limits", None)
+    if detectors is None:
+        detectors = _detectors.by_limits = {}
+    detector = detectors.get((kind, limits))
+    if detector is None:
+        if limits is None:
+            detector = cv2.SIFT_create() if kind == "sift" else cv2.AKAZE_create()
+        elif kind == "sift":
+            detector = cv2.SIFT_create(nfeatures=limits.nfeatures, contrastThreshold=limits.contrast)
+        else:
+            detector = cv2.AKAZE_create(threshold=limits.contrast)
+        detectors[(kind, limits)] = detector
+    return detector
+
+
+def detect_features(kind: str, image: np.ndarray, mask: Optional[np.ndarray] = None, compact: bool = False,
+                    limits: Optional[tuple] = None) -> tuple:
+    """
+    Detect keypoints and compute their descriptors with this thread's detector.
+    
+    Args:
+        kind: ``sift`` or ``akaze``.
+        image: The grayscale image.
+        mask: Keypoints are only detected where this uint8 mask is non-zero.
+        compact: Store SIFT descriptors compactly (see automation.descriptors).
+        limits: A KeypointLimits capping the keypoints (see automation.keypoint_budget).
+    
+    Returns:
+        ``(keypoints, descriptors)``; SIFT descriptors are encoded for the current descriptor mode.
+    """
+    keypoints, descriptors = _get_detector(kind, limits).detectAndCompute(image, mask)
+    if limits is not None and kind == "akaze" and len(keypoints) > limits.nfeatures:
+        # AKAZE has no keypoint cap of its own, so keep the strongest
+        keep = np.argsort([-kp.response for kp in keypoints], kind="stable")[:limits.nfeatures]
+        keypoints = tuple(keypoints[i] for i in keep)
+        descriptors = descriptors[keep]
+    if kind == "sift":
+        descriptors = encode_sift(descriptors, compact=compact)
+    return keypoints, descriptors
+
+
+class ImageFeatures:
+    """
+    A grayscale image with lazily computed, cached keypoints and descriptors.
+    
+    Wrapping a screenshot once lets several templates be matched against it
+    while SIFT/AKAZE extraction runs only once per frame. Wrapping a template
+    lets its features be reused across every lookup.
+    """
+    
+    def __init__(self, image: np.ndarray, compact: bool = False, mask: Optional[np.ndarray] = None,
+                 window: Optional[Tuple[int, int, int, int]] = None,
+                 calibration: Optional["ScaleCalibration"] = None,
+                 extractor: Optional[Any] = None, budget: Optional[Any] = None):
+        """
+        Args:
+            image: The grayscale image.
+            compact: Store SIFT descriptors compactly (see automation.descriptors);
+                meant for templates, whose features live for the whole session.
+            mask: Keypoints are only extracted where this uint8 mask is non-zero
+                (see automation.layout); None extracts from the whole image.
+            window: For a capture, the game window's (left, top, right, bottom) in the image.
+            calibration: For a capture, the UI scale calibration of its game window.
+            extractor: For a capture, the IncrementalExtractor of its game window, which
+                reuses the previous frame's features where the frame did not change
+                (see automation.incremental); None extracts from the whole frame.
+            budget: For a capture, the KeypointBudget of its game window, which caps
+                its keypoints to keep extraction within a latency target
+                (see automation.keypoint_budget); None keeps every keypoint.
+        """
+        self.image = image
+        self.compact = compact
+        self.mask = mask
+        self.window = window
+        self.calibration = calibration
+        self.extractor = extractor
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._features: Dict[str, tuple] = {}
+        self._sift_index: Optional[tuple] = None
+    
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.image.shape
+    
+    def sift(self) -> tuple:
+        """SIFT keypoints and descriptors of the image, encoded for the current descriptor mode."""
+        return self._extract("sift")
+    
+    def akaze(self) -> tuple:
+        """AKAZE keypoints and descriptors of the image."""
+        return self._extract("akaze")
+    
+    def sift_index(self) -> Tuple[Any, threading.Lock]:
+        """
+        A FLANN index over the image's SIFT descriptors, built once and shared
+        by every template matched against the image, with the lock to hold
+        while querying it.
+        """
+        keypoints, descriptors = self.sift()
+        with self._lock:
+            if self._sift_index is None or self._sift_index[0] is not descriptors:
+                matcher = cv2.FlannBasedMatcher(*flann_params(descriptors.shape[1]))
+                matcher.add([as_float32(descriptors)])
+                matcher.train()
+                self._sift_index = (descriptors, matcher, threading.Lock())
+            return self._sift_index[1], self._sift_index[2]
+    
+    def nbytes(self) -> int:
+        """Memory held by the cached descriptors."""
+        with self._lock:
+            return sum(features[1].nbytes for _, features in self._features.values()
+                       if features[1] is not None)
+    
+    def _extract(self, kind: str) -> tuple:
+        token = encoding_token() if kind == "sift" else None
+        with self._lock:
+            cached = self._features.get(kind)
+            if cached is None or cached[0] != token:
+                limits = self.budget.limits(kind, self.image, self.mask) if self.budget is not None else None
+                start = time.perf_counter()
+                with timed(Stages.KEYPOINTS, kind):
+                    if self.extractor is not None:
+                        features = self.extractor.extract(kind, self.image, self.mask, token, limits)
+                    else:
+                        features = detect_features(kind, self.image, self.mask, self.compact, limits)
+                if self.budget is not None:
+                    self.budget.observe(kind, len(features[0]), time.perf_counter() - start)
+                cached = self._features[kind] = (token, features)
+            return cached[1]
+
+
+ImageLike = Union[np.ndarray, ImageFeatures]
+
+
+def as_features(image: ImageLike) -> ImageFeatures:
+    """Wrap an image in ImageFeatures unless it already is one."""
+    return image if isinstance(image, ImageFeatures) else ImageFeatures(image)
+
+
+# =============================================================================
+# Matching
+# =============================================================================
+
+# Details of the most recent lookup on each thread (strategy, score, inliers)
+_match_info = threading.local()
+
+
+def _reset_match_info() -> None:
+    _match_info.fields = {}
+
+
+def _note_match(**fields: Any) -> None:
+    """Record details about the current lookup for diagnostics."""
+    if not hasattr(_match_info, "fields"):
+        _match_info.fields = {}
+    _match_info.fields.update(fields)
+
+
+def get_last_match_info() -> Dict[str, Any]:
+    """
+    Get details of the most recent findMatchings call on this thread.
+    
+    Returns:
+        Dict with the strategy tried last and, where available, the number of
+        good matches, inliers, inlier ratio and template-matching score.
+    """
+    return dict(getattr(_match_info, "fields", {}))
 
 
 def _compute_match_center(template, kp1, kp2, good_matches):
-    """Helper function to compute the center of matched region using homography."""
+    """Helper function to compute the center of matched region using the verified transform."""
     try:
+        if len(good_matches) < 3:
+            return None
+        
         src_pts = np.float32([kp1[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2)
         dst_pts = np.float32([kp2[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2)
         
-        # For very small match counts (< 8), use affine transform instead of homography
-        # Homography needs at least 4 points but is unreliable with < 8
-        if len(good_matches) < 8:
-            # Use affine transform (needs only 3 points)
-            if len(good_matches) >= 3:
-                M = cv2.estimateAffinePartial2D(src_pts, dst_pts, method=cv2.RANSAC, 
-                                                ransacReprojThreshold=5.0)
-                if M is None or M[0] is None:
-                    return None
-                M_transform = M[0]
-                inliers_mask = M[1].ravel()
-            else:
-                return None
-        else:
-            # Use full homography for more matches
-            M_transform, inliers_mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
-            if M_transform is None:
-                return None
-        
-        # Count inliers (matches that fit the transformation)
-        inliers = int(np.sum(inliers_mask))
-        inlier_ratio = inliers / len(good_matches) if len(good_matches) > 0 else 0
-        
         # Adaptive inlier ratio validation based on match count
         # Very small templates with few features need more relaxed validation
         if len(good_matches) < 8:
             # For very small templates: require at least 60% inliers
-            if inlier_ratio < 0.6:
-                return None
+            required_ratio = 0.6
         elif len(good_matches) < 15:
             # Require 70% inliers for 8-14 matches
-            if inlier_ratio < 0.7:
-                return None
+            required_ratio = 0.7
         elif len(good_matches) < 20:
             # Require 65% inliers for 15-19 matches
-            if inlier_ratio < 0.65:
-                return None
+            required_ratio = 0.65
         else:
             # Require 60% inliers for 20+ matches
-            if inlier_ratio < 0.6:
-                return None
+            required_ratio = 0.6
+        
+        # The previous frame's transform for this template is tried first, then
+        # the configured estimator (capped iterations, see automation.verification)
+        M_transform, inliers_mask, verifier = verify_matches(template, src_pts, dst_pts, required_ratio)
+        if M_transform is None:
+            return None
+        
+        # Count inliers (matches that fit the transformation)
+        inliers = int(np.sum(inliers_mask))
+        inlier_ratio = inliers / len(good_matches) if len(good_matches) > 0 else 0
+        _note_match(inliers=inliers, inlier_ratio=inlier_ratio, verifier=verifier)
+        
+        if inlier_ratio < required_ratio:
+            return None
+        remember_transform(template, M_transform)
         
         h, w = template.shape[:2]
         
         # Transform template corners to find matched region
-        if len(good_matches) < 8:
-            # For affine transform, need to add homogeneous coordinate
-            pts = np.float32([[0, 0], [0, h], [w, h], [w, 0]]).reshape(-1, 1, 2)
-            # Apply affine transform manually
-            dst = cv2.transform(pts, M_transform)
-        else:
-            # For homography, use perspective transform
-            pts = np.float32([[0, 0], [0, h], [w, h], [w, 0]]).reshape(-1, 1, 2)
-            dst = cv2.perspectiveTransform(pts, M_transform)
+        pts = np.float32([[0, 0], [0, h], [w, h], [w, 0]]).reshape(-1, 1, 2)
+        dst = cv2.perspectiveTransform(pts, M_transform)
         
         # Compute center of matched region
-        # Note: Uses affine transform for <8 matches, homography for >=8 matches.
-        # Scale and aspect ratio validation removed to support extreme DPI scaling.
+        # Note: Scale and aspect ratio validation removed to support extreme DPI scaling.
         # Inlier ratio validation: 60% for <8 or 20+ matches, 70% for 8-14, 65% for 15-19.
         center_x = int(np.mean(dst[:, 0, 0]))
         center_y = int(np.mean(dst[:, 0, 1]))
         
+        # Scale of the match, so later polls can verify it at the same size
+        matched_w = np.linalg.norm(dst[3, 0] - dst[0, 0])
+        matched_h = np.linalg.norm(dst[1, 0] - dst[0, 0])
+        _note_match(scale=float(np.sqrt(matched_w * matched_h / (w * h))))
+        
         return [(center_x, center_y)]
     except Exception:
         return None
 
 
-def findMatchings_sift(main_image: np.ndarray, template: np.ndarray, 
+def findMatchings_sift(main_image: ImageLike, template: ImageLike, 
                        threshold: float = 0.65, min_matches: int = 10) -> List[Tuple[int, int]]:
     """
     Find template using SIFT (Scale-Invariant Feature Transform).
@@ -94,12 +280,11 @@ def findMatchings_sift(main_image: np.ndarray, template: np.ndarray,
         List of (x, y) coordinates where matches were found (center of matched region)
     """
     try:
-        # Create SIFT detector
-        sift = cv2.SIFT_create()
-        
-        # Find keypoints and descriptors
-        kp1, des1 = sift.detectAndCompute(template, None)
-        kp2, des2 = sift.detectAndCompute(main_image, None)
+        # Find keypoints and descriptors (cached on the wrappers)
+        template = as_features(template)
+        main_image = as_features(main_image)
+        kp1, des1 = template.sift()
+        kp2, des2 = main_image.sift()
         
         if des1 is None or des2 is None or len(kp1) < 4 or len(kp2) < 4:
             return []
@@ -119,24 +304,25 @@ def findMatchings_sift(main_image: np.ndarray, template: np.ndarray,
             actual_threshold = threshold
             actual_min_matches = min_matches
         
-        # Use FLANN matcher for SIFT (better for float descriptors)
-        FLANN_INDEX_KDTREE = 1
-        index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-        search_params = dict(checks=50)
-        flann = cv2.FlannBasedMatcher(index_params, search_params)
-        
-        matches = flann.knnMatch(des1, des2, k=2)
-        
-        # Apply Lowe's ratio test
-        good_matches = []
-        for match_pair in matches:
-            if len(match_pair) == 2:
-                m, n = match_pair
-                if m.distance < actual_threshold * n.distance:
-                    good_matches.append(m)
+        with timed(Stages.MATCHING, "sift"):
+            # Use FLANN matcher for SIFT (better for float descriptors); the index over
+            # the frame's descriptors is built once and shared by every template
+            flann, flann_lock = main_image.sift_index()
+            with flann_lock:
+                matches = flann.knnMatch(as_float32(des1), k=2)
+            
+            # Apply Lowe's ratio test
+            good_matches = []
+            for match_pair in matches:
+                if len(match_pair) == 2:
+                    m, n = match_pair
+                    if m.distance < actual_threshold * n.distance:
+                        good_matches.append(m)
         
+        _note_match(matches=len(good_matches))
         if len(good_matches) >= actual_min_matches:
-            result = _compute_match_center(template, kp1, kp2, good_matches)
+            with timed(Stages.VERIFICATION, "sift"):
+                result = _compute_match_center(template, kp1, kp2, good_matches)
             if result:
                 return result
     except Exception:
@@ -145,7 +331,7 @@ def findMatchings_sift(main_image: np.ndarray, template: np.ndarray,
     return []
 
 
-def findMatchings_akaze(main_image: np.ndarray, template: np.ndarray,
+def findMatchings_akaze(main_image: ImageLike, template: ImageLike,
                         threshold: float = 0.65, min_matches: int = 10) -> List[Tuple[int, int]]:
     """
     Find template using AKAZE (Accelerated-KAZE).
@@ -161,12 +347,10 @@ def findMatchings_akaze(main_image: np.ndarray, template: np.ndarray,
         List of (x, y) coordinates where matches were found
     """
     try:
-        # Create AKAZE detector
-        akaze = cv2.AKAZE_create()
-        
-        # Find keypoints and descriptors
-        kp1, des1 = akaze.detectAndCompute(template, None)
-        kp2, des2 = akaze.detectAndCompute(main_image, None)
+        # Find keypoints and descriptors (cached on the wrappers)
+        template = as_features(template)
+        kp1, des1 = template.akaze()
+        kp2, des2 = as_features(main_image).akaze()
         
         if des1 is None or des2 is None or len(kp1) < 4 or len(kp2) < 4:
             return []
@@ -184,18 +368,21 @@ def findMatchings_akaze(main_image: np.ndarray, template: np.ndarray,
         
         # Use BFMatcher with Hamming distance for binary descriptors
         bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
-        matches = bf.knnMatch(des1, des2, k=2)
-        
-        # Apply ratio test
-        good_matches = []
-        for match_pair in matches:
-            if len(match_pair) == 2:
-                m, n = match_pair
-                if m.distance < actual_threshold * n.distance:
-                    good_matches.append(m)
+        with timed(Stages.MATCHING, "akaze"):
+            matches = bf.knnMatch(des1, des2, k=2)
+            
+            # Apply ratio test
+            good_matches = []
+            for match_pair in matches:
+                if len(match_pair) == 2:
+                    m, n = match_pair
+                    if m.distance < actual_threshold * n.distance:
+                        good_matches.append(m)
         
+        _note_match(matches=len(good_matches))
         if len(good_matches) >= actual_min_matches:
-            result = _compute_match_center(template, kp1, kp2, good_matches)
+            with timed(Stages.VERIFICATION, "akaze"):
+                result = _compute_match_center(template, kp1, kp2, good_matches)
             if result:
                 return result
     except Exception:
@@ -204,7 +391,7 @@ def findMatchings_akaze(main_image: np.ndarray, template: np.ndarray,
     return []
 
 
-def findMatchings_multiscale(main_image: np.ndarray, template: np.ndarray, 
+def findMatchings_multiscale(main_image: ImageLike, template: ImageLike, 
                             scales: List[float] = None, threshold: float = 0.7) -> List[Tuple[int, int]]:
     """
     Find template in main image using multi-scale template matching.
@@ -222,33 +409,43 @@ def findMatchings_multiscale(main_image: np.ndarray, template: np.ndarray,
     if scales is None:
         scales = [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6, 1.7, 1.8, 1.9, 2.0]
     
+    if isinstance(main_image, ImageFeatures):
+        main_image = main_image.image
+    if isinstance(template, ImageFeatures):
+        template = template.image
+    
     try:
         h, w = template.shape[:2]
         best_val = 0
         best_location = None
+        best_scale = None
         
-        for scale in scales:
-            # Resize template
-            new_w = int(w * scale)
-            new_h = int(h * scale)
+        with timed(Stages.MATCHING, "multiscale"):
+            for scale in scales:
+                # Resize template
+                new_w = int(w * scale)
+                new_h = int(h * scale)
             
-            # Skip invalid sizes
-            if new_w < 10 or new_h < 10 or new_w > main_image.shape[1] or new_h > main_image.shape[0]:
-                continue
+                # Skip invalid sizes
+                if new_w < 10 or new_h < 10 or new_w > main_image.shape[1] or new_h > main_image.shape[0]:
+                    continue
             
-            scaled_template = cv2.resize(template, (new_w, new_h))
+                scaled_template = cv2.resize(template, (new_w, new_h))
             
-            # Perform template matching
-            res = cv2.matchTemplate(main_image, scaled_template, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+                # Perform template matching
+                res = cv2.matchTemplate(main_image, scaled_template, cv2.TM_CCOEFF_NORMED)
+                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
             
-            # Track best match across all scales
-            if max_val > best_val:
-                best_val = max_val
-                # Return center point
-                center_x = max_loc[0] + new_w // 2
-                center_y = max_loc[1] + new_h // 2
-                best_location = (center_x, center_y)
+                # Track best match across all scales
+                if max_val > best_val:
+                    best_val = max_val
+                    # Return center point
+                    center_x = max_loc[0] + new_w // 2
+                    center_y = max_loc[1] + new_h // 2
+                    best_location = (center_x, center_y)
+                    best_scale = scale
+        
+        _note_match(score=float(best_val), scale=best_scale)
         
         # Return result if above threshold
         if best_val >= threshold and best_location is not None:
@@ -260,36 +457,364 @@ def findMatchings_multiscale(main_image: np.ndarray, template: np.ndarray,
     return []
 
 
-def findMatchings(main_image: np.ndarray, template: np.ndarray, threshold: float = 0.65) -> List[Tuple[int, int]]:
+def findMatchings(main_image: ImageLike, template: ImageLike, threshold: float = 0.65) -> List[Tuple[int, int]]:
     """
     Find template in main image using multiple feature-based algorithms.
     Tries SIFT first (best for scale), then AKAZE, then multi-scale matching.
     Uses stricter matching parameters to reduce false positives.
     
+    When the frame carries a calibrated UI scale (see ScaleCalibration), a
+    template match at that scale is tried before SIFT, and the multi-scale
+    fallback only searches around that scale.
+    
     Args:
-        main_image: The main image to search in (grayscale)
-        template: The template image to search for (grayscale)
+        main_image: The main image to search in (grayscale), or its ImageFeatures
+            to reuse keypoints already extracted from the same frame
+        template: The template image to search for (grayscale), or its ImageFeatures
         threshold: The matching threshold (0-1), lower = stricter
         
     Returns:
         List of (x, y) coordinates where matches were found (center points)
     """
+    # Wrap once so SIFT and AKAZE fallbacks share the extraction
+    main_image = as_features(main_image)
+    template = as_features(template)
+    calibration = main_image.calibration
+    band = calibration.scales() if calibration is not None else None
+    
+    _reset_match_info()
+    
+    # With a calibrated UI scale, a single template match is usually enough
+    if band:
+        _note_match(strategy="calibrated")
+        with timed(Stages.LOOKUP, "calibrated"):
+            band_result = findMatchings_multiscale(main_image, template, scales=band, threshold=0.7)
+        band_info = get_last_match_info()
+        if band_result and band_info.get("score", 0.0) >= CALIBRATED_THRESHOLD:
+            return band_result
+        _reset_match_info()
+    
     # Try SIFT first (best for large scale differences)
-    result = findMatchings_sift(main_image, template, threshold=threshold, min_matches=10)
+    _note_match(strategy="sift")
+    with timed(Stages.LOOKUP, "sift"):
+        result = findMatchings_sift(main_image, template, threshold=threshold, min_matches=10)
     if result:
+        if calibration is not None:
+            calibration.observe(get_last_match_info())
         return result
     
     # Try AKAZE as backup
-    result = findMatchings_akaze(main_image, template, threshold=threshold, min_matches=10)
+    _reset_match_info()
+    _note_match(strategy="akaze")
+    with timed(Stages.LOOKUP, "akaze"):
+        result = findMatchings_akaze(main_image, template, threshold=threshold, min_matches=10)
     if result:
         return result
     
     # For simple templates, try multi-scale matching as last resort
     # Use a higher threshold (0.7) for template matching as it's more reliable for simple shapes
-    result = findMatchings_multiscale(main_image, template, 
-                                     scales=[0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6, 1.7, 1.8, 1.9, 2.0], 
-                                     threshold=0.7)
+    _reset_match_info()
+    if band:
+        # Already searched around the calibrated scale above
+        _note_match(**band_info)
+        return band_result
+    _note_match(strategy="multiscale")
+    with timed(Stages.LOOKUP, "multiscale"):
+        result = findMatchings_multiscale(main_image, template, 
+                                         scales=[0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6, 1.7, 1.8, 1.9, 2.0], 
+                                         threshold=0.7)
     if result:
         return result
     
-    return []
\ No newline at end of file
+    return []
+
+
+# =============================================================================
+# Known-Location Verification
+# =============================================================================
+
+VERIFY_PRESENT = 0.90     # NCC at the known location that confirms the template
+VERIFY_ABSENT = 0.40      # NCC below which a stable location confirms it is gone
+VERIFY_MARGIN = 4         # pixels of drift searched around the known location
+STABLE_SIGHTINGS = 2      # sightings at the same spot before absence is trusted
+ESCALATE_EVERY = 10       # every Nth absence verdict is re-checked with the full cascade
+
+
+class LookupOutcomes:
+    """How a lookup through a :class:`LocationCache` was answered."""
+    PRESENT = "present"            # fast path confirmed the template at its known location
+    ABSENT = "absent"              # fast path confirmed the known location shows something else
+    INCONCLUSIVE = "inconclusive"  # fast path could not decide, full cascade ran
+    ESCALATED = "escalated"        # periodic full-cascade re-check of an absence verdict
+    UNKNOWN = "unknown"            # no known location yet, full cascade ran
+    FAST = (PRESENT, ABSENT)
+    ALL = (PRESENT, ABSENT, INCONCLUSIVE, ESCALATED, UNKNOWN)
+
+
+class _KnownLocation:
+    """Where a template was last found, with the template resized to the scale it was found at."""
+    
+    __slots__ = ("center", "patch", "frame_shape", "sightings", "absences")
+    
+    def __init__(self, center: Tuple[int, int], patch: np.ndarray, frame_shape: Tuple[int, ...]):
+        self.center = center
+        self.patch = patch
+        self.frame_shape = frame_shape
+        self.sightings = 1
+        self.absences = 0
+
+
+class LocationCache:
+    """
+    Remembers where each template was last found and verifies it there first.
+    
+    A poll for a template seen before compares one small patch at the last
+    known location and scale using normalised cross-correlation, which takes
+    microseconds instead of a full-frame feature extraction. Only when that
+    comparison is inconclusive (or periodically, to notice a moved button)
+    does the lookup escalate to the full findMatchings cascade.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _KnownLocation] = {}
+        self._counts: Dict[str, int] = {outcome: 0 for outcome in LookupOutcomes.ALL}
+    
+    def find(self, main_image: ImageLike, template: ImageLike, key: str,
+             threshold: float = 0.65) -> List[Tuple[int, int]]:
+        """
+        Find a template, verifying its known location before running findMatchings.
+        
+        Args:
+            main_image: The frame to search (grayscale), or its ImageFeatures.
+            template: The template (grayscale), or its ImageFeatures.
+            key: Identifies the template, e.g. its file name and language.
+            threshold: Passed on to findMatchings.
+        
+        Returns:
+            List of (x, y) match centers, like findMatchings.
+        """
+        frame = main_image.image if isinstance(main_image, ImageFeatures) else main_image
+        outcome, loc = self.verify(frame, key)
+        if outcome in LookupOutcomes.FAST:
+            return loc
+        
+        loc = findMatchings(main_image, template, threshold)
+        self.update(key, frame, template, loc, get_last_match_info().get("scale"))
+        return loc
+    
+    def verify(self, frame: np.ndarray, key: str) -> Tuple[str, List[Tuple[int, int]]]:
+        """
+        Check a template at its known location only.
+        
+        Args:
+            frame: The grayscale frame.
+            key: The template's cache key.
+        
+        Returns:
+            ``(outcome, matches)``: one of :class:`LookupOutcomes`, and the match
+            center when the outcome is PRESENT. Other outcomes mean findMatchings
+            has to run and its result be passed to :meth:`update`.
+        """
+        _reset_match_info()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or frame.shape[:2] != entry.frame_shape[:2]:
+            return self._count(LookupOutcomes.UNKNOWN), []
+        
+        with timed(Stages.VERIFICATION, "known_location"):
+            score, center = _score_at(frame, entry.patch, entry.center)
+        _note_match(strategy="known_location", score=score)
+        
+        if score >= VERIFY_PRESENT:
+            with self._lock:
+                entry.center = center
+                entry.absences = 0
+            return self._count(LookupOutcomes.PRESENT), [center]
+        
+        if score <= VERIFY_ABSENT and entry.sightings >= STABLE_SIGHTINGS:
+            with self._lock:
+                entry.absences += 1
+                escalate = entry.absences % ESCALATE_EVERY == 0
+            if not escalate:
+                return self._count(LookupOutcomes.ABSENT), []
+            return self._count(LookupOutcomes.ESCALATED), []
+        
+        return self._count(LookupOutcomes.INCONCLUSIVE), []
+    
+    def update(self, key: str, frame: np.ndarray, template: ImageLike,
+               loc: List[Tuple[int, int]], scale: Optional[float]) -> None:
+        """Learn from a full findMatchings result for a template."""
+        if not loc or not scale:
+            return
+        
+        template_image = template.image if isinstance(template, ImageFeatures) else template
+        h, w = template_image.shape[:2]
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        if size[0] > frame.shape[1] or size[1] > frame.shape[0]:
+            return
+        
+        center = tuple(loc[0])
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None and entry.frame_shape[:2] == frame.shape[:2]
+                    and entry.patch.shape[1::-1] == size
+                    and abs(entry.center[0] - center[0]) <= VERIFY_MARGIN
+                    and abs(entry.center[1] - center[1]) <= VERIFY_MARGIN):
+                entry.center = center
+                entry.sightings += 1
+                entry.absences = 0
+                return
+        
+        # New or moved location: resize the template once, outside the lock
+        patch = cv2.resize(template_image, size, interpolation=cv2.INTER_AREA)
+        with self._lock:
+            self._entries[key] = _KnownLocation(center, patch, frame.shape)
+    
+    def forget(self, key: Optional[str] = None) -> None:
+        """Drop one template's known location, or all of them (e.g. after a resize)."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Lookup counts by outcome.
+        
+        Returns:
+            Dict with the count of every :class:`LookupOutcomes` value, the total,
+            and ``hit_rate``: the share of lookups the fast path answered alone.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        hits = sum(counts[outcome] for outcome in LookupOutcomes.FAST)
+        return {**counts, "total": total, "hit_rate": hits / total if total else 0.0}
+    
+    def _count(self, outcome: str) -> str:
+        with self._lock:
+            self._counts[outcome] += 1
+        count(Counters.KNOWN_LOCATION, outcome)
+        return outcome
+
+
+def _score_at(frame: np.ndarray, patch: np.ndarray, center: Tuple[int, int]) -> Tuple[float, Tuple[int, int]]:
+    """Best NCC score of a patch within VERIFY_MARGIN of a center, and where it was found."""
+    ph, pw = patch.shape[:2]
+    left = center[0] - pw // 2 - VERIFY_MARGIN
+    top = center[1] - ph // 2 - VERIFY_MARGIN
+    x0, y0 = max(0, left), max(0, top)
+    x1 = min(frame.shape[1], left + pw + 2 * VERIFY_MARGIN)
+    y1 = min(frame.shape[0], top + ph + 2 * VERIFY_MARGIN)
+    if x1 - x0 < pw or y1 - y0 < ph:
+        return 0.0, center
+    
+    res = cv2.matchTemplate(frame[y0:y1, x0:x1], patch, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(res)
+    if not np.isfinite(max_val):
+        return 0.0, center
+    return float(max_val), (x0 + max_loc[0] + pw // 2, y0 + max_loc[1] + ph // 2)
+
+
+# =============================================================================
+# UI Scale Calibration
+# =============================================================================
+
+CALIBRATION_MIN_INLIERS = 15     # SIFT inliers a match needs to calibrate the UI scale
+CALIBRATION_MIN_RATIO = 0.8      # inlier ratio a match needs to calibrate the UI scale
+CALIBRATION_SAMPLES = 5          # recent confident matches the scale is the median of
+SCALE_BAND = (0.96, 1.0, 1.04)   # template scales tried around the calibrated scale
+CALIBRATED_THRESHOLD = 0.85      # single-scale score accepted without running SIFT
+
+
+class ScaleCalibration:
+    """
+    The scale between the asset templates and the live UI, for one game window.
+    
+    The scale depends only on the window's resolution and DPI, so it is the
+    same for every button. It is estimated from confident SIFT matches; once
+    known, lookups first try a single ``matchTemplate`` at that scale (a narrow
+    band around it) instead of feature matching, and the multi-scale fallback
+    searches only that band instead of 16 scales. Whenever the window changes
+    size or moves to another monitor, the scale is estimated again.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: List[float] = []
+        self._placement: Optional[tuple] = None
+    
+    @classmethod
+    def at(cls, scale: float) -> "ScaleCalibration":
+        """A calibration already set to a scale, e.g. the parent's in a matcher process."""
+        calibration = cls()
+        calibration._samples.append(scale)
+        return calibration
+    
+    @property
+    def scale(self) -> Optional[float]:
+        """The calibrated scale, or None until a confident match was seen."""
+        with self._lock:
+            return float(np.median(self._samples)) if self._samples else None
+    
+    def scales(self) -> Optional[List[float]]:
+        """Template scales to search, or None while uncalibrated."""
+        scale = self.scale
+        return [scale * factor for factor in SCALE_BAND] if scale is not None else None
+    
+    def observe(self, info: Dict[str, Any]) -> None:
+        """Fold in a SIFT match (its get_last_match_info()) if it is confident enough."""
+        scale = info.get("scale")
+        if (scale is None or info.get("inliers", 0) < CALIBRATION_MIN_INLIERS
+                or info.get("inlier_ratio", 0.0) < CALIBRATION_MIN_RATIO):
+            return
+        with self._lock:
+            first = not self._samples
+            self._samples.append(scale)
+            del self._samples[:-CALIBRATION_SAMPLES]
+        if first:
+            _log.info("UI scale calibrated at %.2fx", scale)
+    
+    def check(self, placement: tuple) -> None:
+        """
+        Start over if the window was resized or moved to another monitor.
+        
+        Args:
+            placement: Anything that changes with the scale, e.g. (monitor, width, height).
+        """
+        with self._lock:
+            if placement == self._placement:
+                return
+            recalibrate = self._placement is not None and bool(self._samples)
+            self._placement = placement
+            self._samples.clear()
+        if recalibrate:
+            _log.info("Game window changed (%s), recalibrating the UI scale", placement)
+    
+    def reset(self) -> None:
+        """Forget the scale."""
+        with self._lock:
+            self._samples.clear()
+            self._placement = None
+
+
+# =============================================================================
+# Matcher Pool
+# =============================================================================
+
+# OpenCV releases the GIL while detecting and matching, so a thread pool
+# spreads lookups from every session across all cores
+_matcher_pool: Optional[Executor] = None
+
+
+def set_matcher_pool(pool: Optional[Executor]) -> None:
+    """Share an executor that runs template lookups concurrently; None runs them inline."""
+    global _matcher_pool
+    _matcher_pool = pool
+
+
+def get_matcher_pool() -> Optional[Executor]:
+    """Get the shared matcher executor, or None if lookups run inline."""
+    return _matcher_pool
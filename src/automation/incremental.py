@@ -0,0 +1,248 @@
+"""Incremental keypoint extraction between consecutive frames.
+
+During a battle only parts of the screen change between polls (character
+animations, damage numbers) while the UI around them stays put, yet every
+poll used to run SIFT/AKAZE on the whole frame. An
+:class:`IncrementalExtractor` remembers the previous frame of its game
+window and that frame's features, and for the next frame:
+
+- diffs the two frames on a grid of :data:`TILE`-pixel tiles and grows the
+  changed tiles by :data:`MARGIN_TILES` tiles, so keypoints whose
+  descriptors see a changed pixel are recomputed too;
+- runs the detector only on those dirty regions (plus a border of context
+  for the scale space) and keeps the keypoints centred inside them;
+- reuses every previous keypoint and descriptor outside the dirty regions.
+
+A frame that did not change at all reuses everything. When too much of the
+frame changed, the mask or frame size changed, or after
+:data:`FULL_EVERY` incremental frames (so small differences from a full
+extraction cannot accumulate), the whole frame is extracted again.
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .image_matching import detect_features
+from .log import get_logger
+from .metrics import Counters, count
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+TILE = 16                  # side of the diff grid's tiles in pixels
+DIFF_THRESHOLD = 8         # gray-level change that marks a pixel as changed
+MARGIN_TILES = 2           # tiles a dirty region is grown by, covering descriptor support
+BORDER = 16                # pixels of context around a dirty region given to the detector
+MAX_DIRTY_SHARE = 0.4      # above this share of the frame, extracting it whole is cheaper
+MAX_REGIONS = 24           # above this many dirty regions, extracting the frame whole is cheaper
+FULL_EVERY = 20            # incremental frames between two full extractions
+
+
+class ExtractionOutcomes:
+    """How a frame's features were obtained."""
+    FULL = "full"
+    INCREMENTAL = "incremental"
+    STATIC = "static"
+
+
+Rect = Tuple[int, int, int, int]    # left, top, right, bottom in pixels
+
+
+# =============================================================================
+# Dirty Regions
+# =============================================================================
+
+def dirty_regions(previous: np.ndarray, current: np.ndarray) -> Optional[List[Rect]]:
+    """
+    The regions of a frame that changed since the previous one.
+
+    Args:
+        previous: The previous grayscale frame.
+        current: The new grayscale frame, of the same shape.
+
+    Returns:
+        Changed rectangles grown by the margin (empty if nothing changed), or
+        None when so much changed that the frame should be extracted whole.
+    """
+    height, width = current.shape[:2]
+    _, changed = cv2.threshold(cv2.absdiff(previous, current), DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
+    grid_w, grid_h = -(-width // TILE), -(-height // TILE)
+    # Area averaging keeps a tile non-zero if any of its pixels changed
+    tiles = cv2.resize(changed, (grid_w, grid_h), interpolation=cv2.INTER_AREA)
+    if not tiles.any():
+        return []
+
+    tiles = cv2.dilate((tiles > 0).astype(np.uint8), np.ones((3, 3), np.uint8), iterations=MARGIN_TILES)
+    regions, _, stats, _ = cv2.connectedComponentsWithStats(tiles, connectivity=8)
+    if regions - 1 > MAX_REGIONS:
+        return None
+
+    rects = []
+    area = 0
+    for x, y, w, h, _ in stats[1:]:
+        rect = (x * width // grid_w, y * height // grid_h,
+                min(width, -(-(x + w) * width // grid_w)), min(height, -(-(y + h) * height // grid_h)))
+        rects.append(rect)
+        area += (rect[2] - rect[0]) * (rect[3] - rect[1])
+    if area > MAX_DIRTY_SHARE * width * height:
+        return None
+    return rects
+
+
+def _inside(points: np.ndarray, rect: Rect) -> np.ndarray:
+    """Which (x, y) points lie inside a rectangle."""
+    return ((points[:, 0] >= rect[0]) & (points[:, 0] < rect[2])
+            & (points[:, 1] >= rect[1]) & (points[:, 1] < rect[3]))
+
+
+def _points(keypoints: Sequence) -> np.ndarray:
+    return np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2)
+
+
+# =============================================================================
+# Extractor
+# =============================================================================
+
+class _FrameFeatures:
+    """The last frame extracted for one feature type, with its features."""
+
+    __slots__ = ("image", "mask", "token", "keypoints", "descriptors", "points", "incremental")
+
+    def __init__(self, image, mask, token, keypoints, descriptors):
+        self.image = image
+        self.mask = mask
+        self.token = token
+        self.keypoints = keypoints
+        self.descriptors = descriptors
+        self.points = _points(keypoints)
+        self.incremental = 0
+
+
+class IncrementalExtractor:
+    """Extracts features of one game window's frames, recomputing only what changed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last: Dict[str, _FrameFeatures] = {}
+
+    def extract(self, kind: str, image: np.ndarray, mask: Optional[np.ndarray], token, limits=None) -> tuple:
+        """
+        Keypoints and descriptors of a frame, reusing the previous frame's where it did not change.
+
+        Args:
+            kind: ``sift`` or ``akaze``.
+            image: The grayscale frame.
+            mask: Its keypoint mask, if any.
+            token: The descriptor encoding token (see automation.descriptors); features
+                encoded differently are never reused.
+            limits: The frame's KeypointLimits (see automation.keypoint_budget), if any;
+                features extracted under other limits are never reused, and a dirty
+                region gets its share of the keypoint cap.
+
+        Returns:
+            ``(keypoints, descriptors)``, as detect_features returns them.
+        """
+        token = (token, limits)
+        with self._lock:
+            last = self._last.get(kind)
+            regions = None
+            if last is not None and self._comparable(last, image, mask, token):
+                regions = dirty_regions(last.image, image)
+
+            if regions is None:
+                outcome = ExtractionOutcomes.FULL
+                keypoints, descriptors = detect_features(kind, image, mask, limits=limits)
+                current = _FrameFeatures(image, mask, token, keypoints, descriptors)
+            elif not regions:
+                outcome = ExtractionOutcomes.STATIC
+                current = last
+                current.image = image
+            else:
+                outcome = ExtractionOutcomes.INCREMENTAL
+                current = self._update(kind, last, image, mask, regions, limits)
+            self._last[kind] = current
+        count(Counters.INCREMENTAL_EXTRACTION, outcome)
+        return current.keypoints, current.descriptors
+
+    def reset(self) -> None:
+        """Forget the previous frame; the next one is extracted whole."""
+        with self._lock:
+            self._last.clear()
+
+    @staticmethod
+    def _comparable(last: _FrameFeatures, image: np.ndarray, mask: Optional[np.ndarray], token) -> bool:
+        """Whether the previous frame's features may be reused for this one."""
+        if last.token != token or last.image.shape != image.shape or last.incremental >= FULL_EVERY:
+            return False
+        if mask is last.mask:
+            return True
+        return mask is not None and last.mask is not None and np.array_equal(mask, last.mask)
+
+    @staticmethod
+    def _update(kind: str, last: _FrameFeatures, image: np.ndarray, mask: Optional[np.ndarray],
+                regions: List[Rect], limits=None) -> _FrameFeatures:
+        """Recompute the features inside the dirty regions and keep the previous ones elsewhere."""
+        height, width = image.shape[:2]
+        keep = np.ones(len(last.points), dtype=bool)
+        for rect in regions:
+            keep &= ~_inside(last.points, rect)
+        keypoints = [last.keypoints[i] for i in np.flatnonzero(keep)]
+        descriptors = [last.descriptors[keep]] if last.descriptors is not None else []
+
+        for i, rect in enumerate(regions):
+            x0, y0 = max(0, rect[0] - BORDER), max(0, rect[1] - BORDER)
+            x1, y1 = min(width, rect[2] + BORDER), min(height, rect[3] + BORDER)
+            crop_mask = mask[y0:y1, x0:x1] if mask is not None else None
+            crop_limits = None
+            if limits is not None:
+                crop_limits = limits.for_share((x1 - x0) * (y1 - y0) / (width * height))
+            found, found_descriptors = detect_features(kind, image[y0:y1, x0:x1], crop_mask, limits=crop_limits)
+            if not found or found_descriptors is None:
+                continue
+            points = _points(found) + (x0, y0)
+            # Keypoints in the border belong to a neighbouring (reused or other dirty) region
+            own = _inside(points, rect)
+            for earlier in regions[:i]:
+                own &= ~_inside(points, earlier)
+            for j in np.flatnonzero(own):
+                kp = found[j]
+                keypoints.append(cv2.KeyPoint(float(points[j, 0]), float(points[j, 1]), kp.size, kp.angle,
+                                              kp.response, kp.octave, kp.class_id))
+            descriptors.append(found_descriptors[own])
+
+        descriptors = [d for d in descriptors if len(d)]
+        current = _FrameFeatures(image, mask, last.token, tuple(keypoints),
+                                 np.vstack(descriptors) if descriptors else None)
+        current.incremental = last.incremental + 1
+        return current
+
+
+# =============================================================================
+# Global Extractor
+# =============================================================================
+
+_extractor = IncrementalExtractor()
+_enabled = True
+
+
+def default_extractor() -> Optional[IncrementalExtractor]:
+    """The extractor of the standard game window; None when incremental extraction is disabled."""
+    return _extractor if _enabled else None
+
+
+def set_incremental_enabled(enabled: bool) -> None:
+    """Enable or disable incremental keypoint extraction."""
+    global _enabled
+    _enabled = enabled
+    _extractor.reset()
+
+
+def is_incremental_enabled() -> bool:
+    return _enabled
@@ -0,0 +1,296 @@
+"""Adaptive keypoint budget for screenshot feature extraction.
+
+SIFT and AKAZE keep every keypoint they find, so a busy 4K battle screen can
+yield many thousands of them, and extraction and matching cost grows with
+that count from frame to frame. A :class:`KeypointBudget` caps it:
+
+- the cap scales with the area keypoints are extracted from (the frame, or
+  its keypoint mask), :data:`FEATURES_PER_MEGAPIXEL` at the default level;
+- the budget's level scales the cap and the detector's contrast threshold
+  together, so a tighter budget also skips the weakest candidates early;
+- an exponentially weighted mean of the extraction time is kept against a
+  latency target: above it the level steps down, well below it the level
+  steps back up, never past the default level. Unless one is set, each
+  feature type's target is calibrated from its first
+  :data:`CALIBRATION_FRAMES` frames, since extraction time depends on the
+  machine and the window size far more than on any fixed number; a target
+  that even the lowest level cannot meet is reported once;
+- a wait that times out (the expected screen was not found) widens the
+  budget by :data:`WIDEN_STEPS` levels, past the default if need be, and
+  holds it there for :data:`HOLD_FRAMES` frames before it steps back.
+
+Templates are never budgeted; they are extracted once and kept whole.
+"""
+
+import threading
+from typing import Dict, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from .log import get_logger
+from .metrics import Counters, count
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+CALIBRATION_FRAMES = 10          # frames at the default level a target is calibrated from
+CALIBRATED_HEADROOM = 1.5        # calibrated target, as a multiple of the default level's extraction time
+FEATURES_PER_MEGAPIXEL = 1000    # keypoint cap per megapixel of extraction area at the default level
+MIN_FEATURES = 500               # keypoint cap floor at the default level
+MAX_FEATURES = 5000              # keypoint cap ceiling at the default level
+FEATURE_STEP = 250               # caps are rounded to this, so few distinct detectors are created
+MIN_CROP_FEATURES = 50           # keypoint cap floor and step of a dirty region (see automation.incremental)
+
+# Budget levels, as multiples of the default cap, in ~sqrt(2) steps
+LEVELS = (0.25, 0.35, 0.5, 0.7, 1.0, 1.4, 2.0, 2.8, 4.0)
+DEFAULT_LEVEL = LEVELS.index(1.0)
+
+SIFT_CONTRAST = 0.04             # OpenCV's default SIFT contrastThreshold
+AKAZE_THRESHOLD = 0.001          # OpenCV's default AKAZE threshold
+
+EWMA_ALPHA = 0.2
+RELAX_SHARE = 0.6                # below this share of the target, the level steps back up
+ADJUST_EVERY = 5                 # frames between two level changes, so the mean can follow
+WIDEN_STEPS = 2                  # levels a failed wait widens the budget by
+HOLD_FRAMES = 30                 # frames a widened budget is held before it may tighten
+
+
+class BudgetChanges:
+    """Why a budget's level changed."""
+    TIGHTENED = "tightened"
+    RELAXED = "relaxed"
+    WIDENED = "widened"
+
+
+class KeypointLimits(NamedTuple):
+    """Detector settings for one extraction."""
+    nfeatures: int       # keypoints kept, strongest first
+    contrast: float      # SIFT contrastThreshold or AKAZE threshold
+
+    def for_share(self, share: float) -> "KeypointLimits":
+        """The limits of a crop covering ``share`` of the budgeted area."""
+        # Rounded like full caps, so crops of every size share a few detectors
+        steps = int(round(self.nfeatures * share / MIN_CROP_FEATURES))
+        return self._replace(nfeatures=max(1, steps) * MIN_CROP_FEATURES)
+
+
+# =============================================================================
+# Budget
+# =============================================================================
+
+class _KindState:
+    """Budget level and measurements of one feature type."""
+
+    __slots__ = ("level", "seconds", "keypoints", "frames", "since_change", "hold", "widened",
+                 "target", "floor_warned")
+
+    def __init__(self, level: int = DEFAULT_LEVEL):
+        self.level = level
+        self.target: Optional[float] = None     # calibrated target, when the budget has none set
+        self.seconds = 0.0
+        self.keypoints = 0.0
+        self.frames = 0
+        self.since_change = 0
+        self.hold = 0
+        self.widened = 0
+        self.floor_warned = False
+
+
+class KeypointBudget:
+    """Caps the keypoints extracted from one game window's frames to keep a latency target."""
+
+    def __init__(self, target: Optional[float] = None):
+        """
+        Args:
+            target: Seconds of keypoint extraction per frame to aim for; defaults
+                to the one set with set_budget_target, or else one calibrated
+                per feature type from the first frames.
+        """
+        self.target = target if target is not None else _target
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, _KindState] = {}
+        self._mask_area: Optional[tuple] = None
+
+    @classmethod
+    def at(cls, levels: Dict[str, int]) -> "KeypointBudget":
+        """A budget already set to levels, e.g. the parent's in a matcher process."""
+        budget = cls()
+        for kind, level in levels.items():
+            budget._kinds[kind] = _KindState(level)
+        return budget
+
+    def levels(self) -> Dict[str, int]:
+        """The current level of each feature type, as :meth:`at` takes them."""
+        with self._lock:
+            return {kind: state.level for kind, state in self._kinds.items()}
+
+    def limits(self, kind: str, image: np.ndarray, mask: Optional[np.ndarray] = None) -> KeypointLimits:
+        """
+        Detector settings for extracting a frame under the current budget.
+
+        Args:
+            kind: ``sift`` or ``akaze``.
+            image: The grayscale frame.
+            mask: Its keypoint mask, if any; only the masked area counts.
+
+        Returns:
+            The keypoint cap and contrast threshold to extract with.
+        """
+        area = self._area(image, mask)
+        with self._lock:
+            scale = LEVELS[self._state(kind).level]
+        base = min(MAX_FEATURES, max(MIN_FEATURES, area / 1e6 * FEATURES_PER_MEGAPIXEL))
+        nfeatures = max(FEATURE_STEP, int(round(base * scale / FEATURE_STEP)) * FEATURE_STEP)
+        # A tighter budget also raises the contrast bar, so weak candidates are dropped before description
+        contrast = (SIFT_CONTRAST if kind == "sift" else AKAZE_THRESHOLD) / scale ** 0.5
+        return KeypointLimits(nfeatures, contrast)
+
+    def observe(self, kind: str, keypoints: int, seconds: float) -> None:
+        """
+        Fold in one extraction and adjust the level against the target.
+
+        Args:
+            kind: ``sift`` or ``akaze``.
+            keypoints: Number of keypoints extracted.
+            seconds: Time the extraction took.
+        """
+        with self._lock:
+            state = self._state(kind)
+            if state.frames == 0:
+                state.seconds, state.keypoints = seconds, float(keypoints)
+            else:
+                state.seconds += EWMA_ALPHA * (seconds - state.seconds)
+                state.keypoints += EWMA_ALPHA * (keypoints - state.keypoints)
+            state.frames += 1
+            state.since_change += 1
+            if state.hold > 0:
+                state.hold -= 1
+                return
+            target = self.target if self.target is not None else state.target
+            calibrated = target is None and state.frames >= CALIBRATION_FRAMES and state.level == DEFAULT_LEVEL
+            if calibrated:
+                target = state.target = state.seconds * CALIBRATED_HEADROOM
+            change = None
+            if state.since_change < ADJUST_EVERY:
+                pass
+            # A widened budget steps back to the default once its hold is over
+            elif state.level > DEFAULT_LEVEL or (target is not None and state.seconds > target and state.level > 0):
+                change = BudgetChanges.TIGHTENED
+                state.level -= 1
+            elif target is not None and state.seconds < RELAX_SHARE * target and state.level < DEFAULT_LEVEL:
+                change = BudgetChanges.RELAXED
+                state.level += 1
+            # The lowest level cannot do better, which the level changes alone would never show
+            floor_missed = (change is None and target is not None and state.level == 0
+                            and state.seconds > target and not state.floor_warned)
+            if floor_missed:
+                state.floor_warned = True
+            if change is not None:
+                state.since_change = 0
+            level, mean_seconds, mean_keypoints = state.level, state.seconds, state.keypoints
+        if calibrated:
+            _log.info("%s keypoint budget target calibrated to %.0f ms per frame (%.0f keypoints in %.0f ms)",
+                      kind, target * 1000, mean_keypoints, mean_seconds * 1000)
+        if floor_missed:
+            _log.warning("%s keypoint extraction takes %.0f ms per frame even at the lowest budget level, "
+                         "above the %.0f ms target", kind, mean_seconds * 1000, target * 1000)
+        if change is None:
+            return
+        count(Counters.KEYPOINT_BUDGET, change)
+        _log.debug("%s keypoint budget %s to x%.2f (%.0f keypoints, %.0f ms per frame)",
+                   kind, change, LEVELS[level], mean_keypoints, mean_seconds * 1000)
+
+    def widen(self) -> None:
+        """Allow more keypoints after a lookup failed, in case the budget dropped the ones it needed."""
+        with self._lock:
+            for state in self._kinds.values():
+                state.level = min(len(LEVELS) - 1, max(state.level, DEFAULT_LEVEL - 1) + WIDEN_STEPS)
+                state.hold = HOLD_FRAMES
+                state.since_change = 0
+                state.widened += 1
+            levels = ", ".join(f"{kind} x{LEVELS[state.level]:.2f}" for kind, state in self._kinds.items())
+        if levels:
+            count(Counters.KEYPOINT_BUDGET, BudgetChanges.WIDENED)
+            _log.debug("Keypoint budget widened to %s", levels)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Level, target, mean keypoint count and mean extraction time of each feature type."""
+        with self._lock:
+            return {
+                kind: {"level": LEVELS[state.level], "keypoints": state.keypoints, "seconds": state.seconds,
+                       "frames": state.frames, "widened": state.widened,
+                       "target": self.target if self.target is not None else state.target}
+                for kind, state in self._kinds.items()
+            }
+
+    def _state(self, kind: str) -> _KindState:
+        state = self._kinds.get(kind)
+        if state is None:
+            state = self._kinds[kind] = _KindState()
+        return state
+
+    def _area(self, image: np.ndarray, mask: Optional[np.ndarray]) -> int:
+        """Pixels keypoints are extracted from; a mask's count is cached while the same mask is reused."""
+        if mask is None:
+            return image.shape[0] * image.shape[1]
+        cached = self._mask_area
+        if cached is not None and cached[0] is mask:
+            return cached[1]
+        area = cv2.countNonZero(mask)
+        self._mask_area = (mask, area)
+        return area
+
+
+def format_budget(snapshot: Dict[str, Dict[str, float]]) -> str:
+    """
+    Render a budget snapshot as one line per feature type.
+
+    Args:
+        snapshot: A :meth:`KeypointBudget.snapshot`.
+
+    Returns:
+        The lines.
+    """
+    lines = ["Keypoint budget:"]
+    for kind, state in sorted(snapshot.items()):
+        target = "uncalibrated" if state["target"] is None else f"target {state['target'] * 1000:.0f} ms"
+        lines.append(f"  {kind:<6} x{state['level']:<5.2f} {state['keypoints']:>7.0f} keypoints "
+                     f"{state['seconds'] * 1000:>7.1f} ms ({target})  {state['frames']:>6} frames  "
+                     f"widened {state['widened']}x")
+    return "\n".join(lines)
+
+
+# =============================================================================
+# Global Budget
+# =============================================================================
+
+_target: Optional[float] = None
+_budget = KeypointBudget()
+_enabled = True
+
+
+def default_budget() -> Optional[KeypointBudget]:
+    """The budget of the standard game window; None when budgeting is disabled."""
+    return _budget if _enabled else None
+
+
+def set_budget_enabled(enabled: bool) -> None:
+    """Enable or disable the keypoint budget."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_budget_enabled() -> bool:
+    return _enabled
+
+
+def set_budget_target(target: Optional[float]) -> None:
+    """Set the latency target of the standard game window's budget and of budgets created later; None calibrates it."""
+    global _target
+    _target = target
+    _budget.target = target
@@ -0,0 +1,286 @@
+"""Layout model: where in the game window each template can appear.
+
+SIFT and AKAZE extraction costs grow with the area searched, and a monitor
+capture includes the desktop around the game window as well as UI areas
+where no button the automation looks for ever shows. The layout model learns
+from every sighting which part of the window a template appears in and turns
+the templates a poll looks for into a keypoint mask for ``detectAndCompute``:
+
+- the area outside the game window is always masked out;
+- once a template has been seen :data:`MIN_SIGHTINGS` times, only its
+  learned region (plus a margin) is searched for it;
+- a template without a learned region keeps the whole window searchable.
+
+Regions are stored as fractions of the window, so they survive resizes and
+DPI changes, and saved per profile so the next run starts with them. Every
+:data:`FULL_FRAME_EVERY`-th extraction for a set of templates is unmasked,
+so a button that moved is still found and its region widens.
+"""
+
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .log import get_logger
+from .timing import DEFAULT_PROFILE_DIR
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+MIN_SIGHTINGS = 3        # sightings before a template's region is trusted
+REGION_MARGIN = 0.05     # share of the window added around a learned region on every side
+FULL_FRAME_EVERY = 10    # every Nth extraction for a template set searches the whole window
+SAVE_EVERY = 20          # region changes between saves
+MASK_CACHE_SIZE = 32
+
+Box = Tuple[int, int, int, int]                      # left, top, right, bottom in frame pixels
+Region = Tuple[float, float, float, float]           # left, top, right, bottom as window fractions
+
+
+class _TemplateRegion:
+    """Bounding box of every sighting of one template, in window fractions."""
+
+    __slots__ = ("box", "sightings")
+
+    def __init__(self, box: Region, sightings: int = 1):
+        self.box = box
+        self.sightings = sightings
+
+    def extend(self, box: Region) -> bool:
+        """Grow to include a sighting; returns whether the box changed."""
+        self.sightings += 1
+        grown = (min(self.box[0], box[0]), min(self.box[1], box[1]),
+                 max(self.box[2], box[2]), max(self.box[3], box[3]))
+        changed = grown != self.box
+        self.box = grown
+        return changed
+
+
+def default_layout_path() -> str:
+    """Path of the saved layout regions."""
+    return os.path.join(DEFAULT_PROFILE_DIR, "layout.json")
+
+
+# =============================================================================
+# Layout Model
+# =============================================================================
+
+class LayoutModel:
+    """Learned template regions and the keypoint masks built from them."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON file the regions are loaded from and saved to; None keeps them in memory.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._regions: Dict[str, _TemplateRegion] = {}
+        self._polls: Dict[Tuple[str, ...], int] = {}
+        self._masks: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._unsaved = 0
+        if path:
+            self._load()
+
+    def region(self, key: str) -> Optional[Region]:
+        """The learned region of a template, or None while it may appear anywhere."""
+        with self._lock:
+            entry = self._regions.get(key)
+            if entry is None or entry.sightings < MIN_SIGHTINGS:
+                return None
+            return entry.box
+
+    def observe(self, key: str, window: Box, center: Tuple[int, int], size: Tuple[float, float]) -> None:
+        """
+        Record where a template was found.
+
+        Args:
+            key: The template, e.g. ``EN/fight.png``.
+            window: The game window's box in the frame.
+            center: Center of the match in the frame.
+            size: Width and height of the match in the frame.
+        """
+        width, height = window[2] - window[0], window[3] - window[1]
+        if width <= 0 or height <= 0:
+            return
+        half_w, half_h = size[0] / 2, size[1] / 2
+        box = ((center[0] - half_w - window[0]) / width, (center[1] - half_h - window[1]) / height,
+               (center[0] + half_w - window[0]) / width, (center[1] + half_h - window[1]) / height)
+        with self._lock:
+            entry = self._regions.get(key)
+            if entry is None:
+                self._regions[key] = _TemplateRegion(box)
+                changed = True
+            else:
+                changed = entry.extend(box)
+                # The region only starts masking once it has enough sightings
+                changed = changed or entry.sightings == MIN_SIGHTINGS
+            if changed:
+                self._unsaved += 1
+            save = self._unsaved >= SAVE_EVERY
+        if save:
+            self.save()
+
+    def mask(self, frame_shape: Tuple[int, ...], window: Box, keys: Sequence[str]) -> Optional[np.ndarray]:
+        """
+        Keypoint mask for a frame that is searched for the given templates.
+
+        Args:
+            frame_shape: Shape of the frame.
+            window: The game window's box in the frame.
+            keys: The templates the frame is searched for.
+
+        Returns:
+            A uint8 mask (255 where keypoints are extracted), or None to
+            extract from the whole frame.
+        """
+        height, width = frame_shape[:2]
+        window = (max(0, window[0]), max(0, window[1]), min(width, window[2]), min(height, window[3]))
+        if window[2] <= window[0] or window[3] <= window[1]:
+            return None
+        full_window = window == (0, 0, width, height)
+        keys = tuple(sorted(keys))
+
+        with self._lock:
+            polls = self._polls[keys] = self._polls.get(keys, 0) + 1
+            boxes = [self._regions.get(key) for key in keys]
+            if polls % FULL_FRAME_EVERY == 0 or any(b is None or b.sightings < MIN_SIGHTINGS for b in boxes):
+                regions = None
+            else:
+                regions = tuple(b.box for b in boxes)
+            if regions is None and full_window:
+                return None
+
+            cache_key = (frame_shape[:2], window, regions)
+            mask = self._masks.get(cache_key)
+            if mask is not None:
+                self._masks.move_to_end(cache_key)
+                return mask
+
+        mask = np.zeros((height, width), dtype=np.uint8)
+        if regions is None:
+            mask[window[1]:window[3], window[0]:window[2]] = 255
+        else:
+            win_w, win_h = window[2] - window[0], window[3] - window[1]
+            for left, top, right, bottom in regions:
+                x0 = max(window[0], int(window[0] + (left - REGION_MARGIN) * win_w))
+                y0 = max(window[1], int(window[1] + (top - REGION_MARGIN) * win_h))
+                x1 = min(window[2], int(np.ceil(window[0] + (right + REGION_MARGIN) * win_w)))
+                y1 = min(window[3], int(np.ceil(window[1] + (bottom + REGION_MARGIN) * win_h)))
+                mask[y0:y1, x0:x1] = 255
+
+        with self._lock:
+            self._masks[cache_key] = mask
+            while len(self._masks) > MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return mask
+
+    def forget(self, key: Optional[str] = None) -> None:
+        """Forget one template's region, or all of them."""
+        with self._lock:
+            if key is None:
+                self._regions.clear()
+            else:
+                self._regions.pop(key, None)
+            self._masks.clear()
+            self._unsaved += 1
+
+    def clear_masks(self) -> None:
+        """Drop the cached masks; they are rebuilt on demand."""
+        with self._lock:
+            self._masks.clear()
+
+    def save(self) -> None:
+        """Write the regions to the model's file, if it has one."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "regions": {key: {"box": list(entry.box), "sightings": entry.sightings}
+                            for key, entry in self._regions.items()},
+            }
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            _log.warning("Could not save layout model: %s", e)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            _log.warning("Could not load layout model %s: %s", self.path, e)
+            return
+
+        for key, values in data.get("regions", {}).items():
+            box = values.get("box")
+            if isinstance(box, list) and len(box) == 4:
+                self._regions[key] = _TemplateRegion(tuple(float(v) for v in box), int(values.get("sightings", 1)))
+        _log.debug("Loaded layout regions for %d templates from %s", len(self._regions), self.path)
+
+
+def observe_match(frame: object, key: str, template_shape: Tuple[int, ...], center: Tuple[int, int],
+                  scale: Optional[float]) -> None:
+    """
+    Feed a full-cascade match into the layout model.
+
+    Args:
+        frame: The ImageFeatures the template was found in; only captures know their window.
+        key: The template, e.g. ``EN/fight.png``.
+        template_shape: Shape of the template image.
+        center: Center of the match in the frame.
+        scale: Scale the template was found at; None (a fast-path verdict) is not recorded.
+    """
+    window = getattr(frame, "window", None)
+    layout = get_layout_model()
+    if window is None or layout is None or scale is None:
+        return
+    height, width = template_shape[:2]
+    layout.observe(key, window, center, (width * scale, height * scale))
+
+
+# =============================================================================
+# Global Model
+# =============================================================================
+
+_model: Optional[LayoutModel] = None
+_enabled = True
+
+
+def get_layout_model() -> Optional[LayoutModel]:
+    """Get the process-wide layout model, loading the saved regions on first use; None when disabled."""
+    global _model
+    if not _enabled:
+        return None
+    if _model is None:
+        _model = LayoutModel(default_layout_path())
+        atexit.register(_model.save)
+    return _model
+
+
+def set_layout_enabled(enabled: bool) -> None:
+    """Enable or disable masked keypoint extraction."""
+    global _enabled
+    _enabled = enabled
+
+
+def set_layout_model(model: Optional[LayoutModel]) -> None:
+    """Install the process-wide layout model, e.g. one kept in memory; None goes back to the saved one."""
+    global _model
+    _model = model
@@ -0,0 +1,242 @@
+"""Structured, leveled logging for the automation package.
+
+All automation modules log through children of the ``automation`` logger.
+Messages use lazy ``%``-style arguments, so nothing is formatted unless a
+handler actually wants the record. Records go to two places:
+
+* a bounded in-memory ring buffer (cheap ``deque`` append, always on), and
+* a background sink thread that writes to the console and, optionally, a file.
+
+The automation thread only enqueues records; formatting and I/O happen on the
+sink thread, so a slow terminal or disk never stalls a lookup.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+LOGGER_NAME = "automation"
+DEFAULT_RING_SIZE = 2000
+SINK_QUEUE_SIZE = 10000
+
+FILE_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_STANDARD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+# =============================================================================
+# Handlers
+# =============================================================================
+
+class RingBufferHandler(logging.Handler):
+    """Keep the most recent log records in a fixed-size in-memory ring."""
+
+    def __init__(self, capacity: int = DEFAULT_RING_SIZE):
+        super().__init__(logging.DEBUG)
+        self._records = deque(maxlen=capacity)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # deque.append is atomic, no lock needed
+        self._records.append(record)
+
+    def records(self) -> List[logging.LogRecord]:
+        """Return a snapshot of the buffered records, oldest first."""
+        return list(self._records)
+
+    def clear(self) -> None:
+        """Drop all buffered records."""
+        self._records.clear()
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks and defers formatting to the sink thread."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens in the listener thread instead of the caller
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _ConsoleFormatter(logging.Formatter):
+    """Plain console output, with the historical ``[DEBUG]`` prefix for debug records."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        if record.levelno <= logging.DEBUG:
+            return f"[DEBUG] {message}"
+        if record.levelno >= logging.WARNING:
+            return f"{record.levelname.capitalize()}: {message}"
+        return message
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+_lock = threading.Lock()
+_ring_handler: Optional[RingBufferHandler] = None
+_queue_handler: Optional[_NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(
+    debug: bool = False,
+    log_file: Optional[str] = None,
+    ring_size: int = DEFAULT_RING_SIZE,
+    console: bool = True,
+) -> None:
+    """
+    (Re)configure the automation logger.
+
+    Args:
+        debug: Whether debug records should be emitted.
+        log_file: Optional path of a file the background sink appends to.
+        ring_size: Number of records kept in the in-memory ring buffer.
+        console: Whether the background sink also writes to the console.
+    """
+    global _ring_handler, _queue_handler, _listener
+
+    with _lock:
+        logger = logging.getLogger(LOGGER_NAME)
+        _stop_listener()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+
+        _ring_handler = RingBufferHandler(ring_size)
+
+        sinks: List[logging.Handler] = []
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(_ConsoleFormatter())
+            sinks.append(console_handler)
+        if log_file:
+            file_handler = logging.FileHandler(log_file, encoding="utf-8")
+            file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+            sinks.append(file_handler)
+
+        _queue_handler = _NonBlockingQueueHandler(queue.Queue(SINK_QUEUE_SIZE))
+        _listener = logging.handlers.QueueListener(
+            _queue_handler.queue, *sinks, respect_handler_level=True
+        )
+        _listener.start()
+
+        logger.addHandler(_ring_handler)
+        logger.addHandler(_queue_handler)
+        logger.setLevel(logging.DEBUG if debug else logging.INFO)
+        logger.propagate = False
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def flush_logging() -> None:
+    """Wait until the background sink has written every record queued so far."""
+    with _lock:
+        listener, handler = _listener, _queue_handler
+    # Without a running sink nothing would ever drain the queue
+    if listener is not None and handler is not None:
+        handler.queue.join()
+
+
+def shutdown_logging() -> None:
+    """Flush pending records and stop the background sink thread."""
+    with _lock:
+        _stop_listener()
+
+
+def set_log_level(debug: bool) -> None:
+    """Enable or disable debug records for the automation logger."""
+    logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG if debug else logging.INFO)
+
+
+def is_debug_enabled() -> bool:
+    """Check whether debug records are currently emitted."""
+    return logging.getLogger(LOGGER_NAME).isEnabledFor(logging.DEBUG)
+
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """
+    Get a logger under the automation namespace.
+
+    Args:
+        name: Optional child name, e.g. a module's ``__name__``.
+
+    Returns:
+        The requested logger.
+    """
+    if not name or name == LOGGER_NAME:
+        return logging.getLogger(LOGGER_NAME)
+    if name.startswith(LOGGER_NAME + "."):
+        return logging.getLogger(name)
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+# =============================================================================
+# Ring Buffer Access
+# =============================================================================
+
+def get_recent_records(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Get the most recent log records as structured dictionaries.
+
+    Args:
+        limit: Maximum number of records to return (newest kept).
+
+    Returns:
+        List of dicts with time, level, logger, message and any ``extra`` fields.
+    """
+    if _ring_handler is None:
+        return []
+
+    records = _ring_handler.records()
+    if limit is not None:
+        records = records[-limit:]
+
+    result = []
+    for record in records:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        result.append(entry)
+    return result
+
+
+def get_dropped_count() -> int:
+    """Number of records the background sink dropped because its queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+# Default configuration so library users get console output without setup
+configure_logging()
+atexit.register(shutdown_logging)
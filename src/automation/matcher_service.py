@@ -0,0 +1,307 @@
+"""Out-of-process template matching fed through shared-memory frames.
+
+OpenCV releases the GIL while extracting and matching features, but the
+Python around it (ratio tests, building keypoint lists, handling results)
+does not, so a thread pool cannot use every core once several sessions poll
+at the same time. :class:`MatcherService` runs the matching cascade in a
+pool of worker processes instead:
+
+- a frame (plus its keypoint mask, if any) is written once into a
+  ``multiprocessing.shared_memory`` block; workers map that block and wrap it
+  in an ImageFeatures without copying, so the frame is never pickled;
+- a request names the frame's block and the template set to look for, and
+  goes on one queue that every worker takes from, so lookups from several
+  sessions run in parallel on separate cores;
+- each worker loads its own templates and computes their features once, and
+  a collector thread hands results back through ``concurrent.futures``.
+
+The shared block is released as soon as its request is answered.
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .log import get_logger
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+POLL_INTERVAL = 0.5         # seconds between liveness checks of the workers
+SHUTDOWN_TIMEOUT = 2.0      # seconds a worker gets to exit before it is terminated
+
+# (template name, match centers, seconds, match info) for each template of a request
+MatchOutcome = Tuple[str, List[Tuple[int, int]], float, Dict[str, Any]]
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Map an existing shared memory block without taking ownership of it."""
+    try:
+        # Python 3.13+: do not let this process's resource tracker unlink the parent's block
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Older versions: spawned workers share the parent's tracker, so registering again is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+# =============================================================================
+# Worker Process
+# =============================================================================
+
+class _MappedFrame:
+    """A frame mapped from shared memory in a worker, with its lazily computed features."""
+
+    __slots__ = ("shm", "features")
+
+    def __init__(self, header: tuple, window: Optional[tuple], scale: Optional[float],
+                 levels: Optional[Dict[str, int]]):
+        """
+        Args:
+            header: ``(block name, shape, dtype, has_mask)`` of the published frame.
+            window: The game window's box in the frame.
+            scale: The parent's calibrated UI scale, if any.
+            levels: The parent's keypoint budget levels, if it has a budget.
+        """
+        from .image_matching import ImageFeatures, ScaleCalibration
+        from .keypoint_budget import KeypointBudget
+
+        name, shape, dtype, has_mask = header
+        self.shm = _attach(name)
+        size = int(np.prod(shape))
+        image = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        mask = np.ndarray(shape[:2], dtype=np.uint8, buffer=self.shm.buf, offset=size) if has_mask else None
+        calibration = ScaleCalibration.at(scale) if scale is not None else None
+        budget = KeypointBudget.at(levels) if levels is not None else None
+        self.features = ImageFeatures(image, mask=mask, window=window, calibration=calibration, budget=budget)
+
+    def close(self) -> None:
+        # The array views must go before the mapping can be closed
+        self.features = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a view is still referenced somewhere; the mapping goes with the process
+
+
+def _worker_main(requests: "multiprocessing.Queue", results: "multiprocessing.Queue",
+                 descriptor_mode: str, estimator: str) -> None:
+    """Answer (request id, frame header, window, scale, budget levels, language, templates, threshold) requests until a None arrives."""
+    from .descriptors import set_descriptor_mode
+    from .image_matching import findMatchings, get_last_match_info
+    from .templates import get_template_registry
+    from .verification import set_verification_estimator
+
+    # Match exactly as the parent process would
+    set_descriptor_mode(descriptor_mode)
+    set_verification_estimator(estimator)
+    registry = get_template_registry()
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, header, window, scale, levels, language, names, threshold = request
+        frame = None
+        try:
+            frame = _MappedFrame(header, window, scale, levels)
+            outcomes: List[MatchOutcome] = []
+            for name in names:
+                template = registry.get(language, name)
+                if template is None:
+                    outcomes.append((name, [], 0.0, {}))
+                    continue
+                start = time.perf_counter()
+                loc = findMatchings(frame.features, template, threshold)
+                outcomes.append((name, loc, time.perf_counter() - start, dict(get_last_match_info())))
+            message = (request_id, outcomes, None)
+        except Exception as e:
+            message = (request_id, None, f"{type(e).__name__}: {e}")
+        if frame is not None:
+            frame.close()
+        results.put(message)
+
+
+# =============================================================================
+# Service
+# =============================================================================
+
+class _Pending:
+    """A submitted request and the shared block its frame lives in until it is answered."""
+
+    __slots__ = ("future", "shm")
+
+    def __init__(self, future: Future, shm: shared_memory.SharedMemory):
+        self.future = future
+        self.shm = shm
+
+
+class MatcherService:
+    """A pool of matcher processes that look templates up in shared-memory frames."""
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Args:
+            workers: Number of worker processes; defaults to the CPU count.
+        """
+        from .descriptors import get_descriptor_mode
+        from .verification import get_verification_estimator
+
+        self.workers = workers or os.cpu_count() or 1
+        # Spawn, as on Windows, so workers never inherit locks or windows from the automation threads
+        self._context = multiprocessing.get_context("spawn")
+        self._requests = self._context.Queue()
+        self._results = self._context.Queue()
+        self._config = (get_descriptor_mode(), get_verification_estimator())
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending: Dict[int, _Pending] = {}
+        self._closed = False
+        self._processes = [self._start_worker(i) for i in range(self.workers)]
+        self._collector = threading.Thread(target=self._collect, name="matcher-results", daemon=True)
+        self._collector.start()
+        _log.info("Started %d matcher processes", self.workers)
+
+    def submit(self, frame: Any, language: str, names: Sequence[str], threshold: float = 0.65) -> "Future[List[MatchOutcome]]":
+        """
+        Look templates up in a frame on a worker process.
+
+        Args:
+            frame: The frame's ImageFeatures (its mask, window, UI scale and keypoint budget are passed on)
+                or a grayscale array.
+            language: Asset language of the templates.
+            names: Template file names, matched in order on one worker so the frame is extracted once.
+            threshold: Passed on to findMatchings.
+
+        Returns:
+            A future resolving to one (name, centers, seconds, match info) per template.
+        """
+        image = getattr(frame, "image", frame)
+        mask = getattr(frame, "mask", None)
+        calibration = getattr(frame, "calibration", None)
+        budget = getattr(frame, "budget", None)
+        image = np.ascontiguousarray(image)
+
+        shm = shared_memory.SharedMemory(create=True, size=image.nbytes + (mask.size if mask is not None else 0))
+        np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+        if mask is not None:
+            np.ndarray(mask.shape, dtype=np.uint8, buffer=shm.buf, offset=image.nbytes)[...] = mask
+        header = (shm.name, image.shape, image.dtype.str, mask is not None)
+
+        future: "Future[List[MatchOutcome]]" = Future()
+        with self._lock:
+            if self._closed:
+                self._release(shm)
+                raise RuntimeError("Matcher service is shut down")
+            request_id = next(self._ids)
+            self._pending[request_id] = _Pending(future, shm)
+            # Under the lock, so a pool restart cannot swap the queue in between
+            self._requests.put((request_id, header, getattr(frame, "window", None),
+                                calibration.scale if calibration is not None else None,
+                                budget.levels() if budget is not None else None,
+                                language, list(names), threshold))
+        return future
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        """Stop the workers and fail whatever is still pending."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self._processes:
+            self._requests.put(None)
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self._fail_pending("Matcher service shut down")
+        self._results.put(None)
+        self._collector.join(timeout)
+
+    def _start_worker(self, index: int) -> "multiprocessing.Process":
+        process = self._context.Process(target=_worker_main, args=(self._requests, self._results) + self._config,
+                                        name=f"matcher-{index}", daemon=True)
+        process.start()
+        return process
+
+    def _collect(self) -> None:
+        while True:
+            try:
+                message = self._results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if message is None:
+                return
+
+            request_id, outcomes, error = message
+            with self._lock:
+                pending = self._pending.pop(request_id, None)
+            if pending is None:
+                continue
+            self._release(pending.shm)
+            if error is not None:
+                pending.future.set_exception(RuntimeError(f"Matcher process failed: {error}"))
+            else:
+                pending.future.set_result(outcomes)
+
+    def _check_workers(self) -> None:
+        """Restart the pool if a worker died; pending requests are failed so no caller waits forever."""
+        with self._lock:
+            if self._closed or all(process.is_alive() for process in self._processes):
+                return
+            _log.warning("A matcher process exited, restarting the matcher processes")
+            # A killed worker may hold a queue's lock, so the survivors and both queues are replaced
+            for process in self._processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join(SHUTDOWN_TIMEOUT)
+            self._requests = self._context.Queue()
+            self._results = self._context.Queue()
+            self._processes = [self._start_worker(i) for i in range(self.workers)]
+        self._fail_pending("Matcher process exited")
+
+    def _fail_pending(self, reason: str) -> None:
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+        for entry in pending:
+            self._release(entry.shm)
+            entry.future.set_exception(RuntimeError(reason))
+
+    @staticmethod
+    def _release(shm: shared_memory.SharedMemory) -> None:
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# =============================================================================
+# Global Service
+# =============================================================================
+
+_service: Optional[MatcherService] = None
+
+
+def set_matcher_service(service: Optional[MatcherService]) -> None:
+    """Route scene lookups through a matcher service; None matches in this process."""
+    global _service
+    _service = service
+
+
+def get_matcher_service() -> Optional[MatcherService]:
+    """Get the matcher service, or None if lookups run in this process."""
+    return _service
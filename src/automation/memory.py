@@ -0,0 +1,350 @@
+"""Long-run memory tracking and a soft memory limit.
+
+Every poll allocates a full capture, its keypoints and descriptors, a FLANN
+index and match lists. All of them should be freed when the poll ends, so
+a run of thousands of rounds ought to stay flat. :class:`MemoryGuard`
+checks that from a background thread:
+
+- every interval it samples the process's resident set size (RSS) and, with
+  tracing on, a ``tracemalloc`` snapshot grouped by subsystem (the
+  automation module, or the third-party package, that allocated);
+- the report gives the RSS growth per hour, each subsystem's size and growth
+  rate, and the source lines whose allocations grew most since the first
+  sample;
+- above a soft RSS limit it logs a warning and flushes the caches (layout
+  masks, remembered transforms, template features, freed heap pages).
+
+Tracing makes every allocation slower, so it is only on when asked for;
+RSS sampling and the soft limit cost next to nothing.
+"""
+
+import ctypes
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from .log import get_logger
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+DEFAULT_INTERVAL = 60.0       # seconds between samples
+TRACE_FRAMES = 1              # traceback depth kept by tracemalloc; 1 groups by allocating line
+TOP_SITES = 10                # growth sites in the report
+FLUSH_COOLDOWN = 300.0        # seconds between two cache flushes
+SAMPLE_CAPACITY = 1440        # samples kept (24 hours at the default interval)
+MB = 1024 * 1024
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# =============================================================================
+# Measurements
+# =============================================================================
+
+def process_rss() -> Optional[int]:
+    """Resident set size (working set on Windows) of this process in bytes, or None if unknown."""
+    if sys.platform == "win32":
+        return _windows_working_set()
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def _windows_working_set() -> Optional[int]:
+    try:
+        kernel32, psapi = ctypes.windll.kernel32, ctypes.windll.psapi
+        kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+        psapi.GetProcessMemoryInfo.argtypes = [ctypes.c_void_p, ctypes.POINTER(_ProcessMemoryCounters), ctypes.c_ulong]
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+        return counters.WorkingSetSize
+    except (AttributeError, OSError):
+        return None
+
+
+def subsystem_of(filename: str) -> str:
+    """The subsystem an allocation belongs to: an automation module, a third-party package, or ``python``."""
+    path = os.path.abspath(filename)
+    if os.path.dirname(path) == _PACKAGE_DIR:
+        return os.path.splitext(os.path.basename(path))[0]
+    parts = path.replace("\\", "/").split("/")
+    for marker in ("site-packages", "dist-packages"):
+        if marker in parts:
+            index = parts.index(marker)
+            if index + 1 < len(parts):
+                return os.path.splitext(parts[index + 1])[0]
+    return "python"
+
+
+def _trace_filters() -> List[tracemalloc.Filter]:
+    # The tracer's and the guard's own bookkeeping and import machinery are not the automation's memory
+    return [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+
+
+# =============================================================================
+# Cache Flushing
+# =============================================================================
+
+def flush_caches() -> None:
+    """Drop every cache that is rebuilt on demand and hand freed heap pages back to the OS."""
+    from .layout import get_layout_model
+    from .templates import get_template_registry
+    from .verification import forget_transforms
+
+    layout = get_layout_model()
+    if layout is not None:
+        layout.clear_masks()
+    forget_transforms()
+    # Template features are recomputed on their next lookup
+    get_template_registry().clear()
+    gc.collect()
+    _trim_heap()
+
+
+def _trim_heap() -> None:
+    """Return free heap memory to the OS (glibc keeps it in its arenas otherwise)."""
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+# =============================================================================
+# Guard
+# =============================================================================
+
+class MemoryGuard:
+    """Samples memory use in the background and flushes caches above a soft limit."""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        soft_limit_mb: Optional[float] = None,
+        trace: bool = False,
+        report_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            interval: Seconds between samples.
+            soft_limit_mb: RSS in MB above which caches are flushed; None for no limit.
+            trace: Whether to trace allocations with tracemalloc, for per-subsystem
+                sizes and growth sites.
+            report_path: JSON file the report is written to after every sample; None keeps it in memory.
+        """
+        self.interval = interval
+        self.soft_limit_mb = soft_limit_mb
+        self.trace = trace
+        self.report_path = report_path
+        self.flushes = 0
+        self._samples: Deque[Dict[str, Any]] = deque(maxlen=SAMPLE_CAPACITY)
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._latest: Optional[tracemalloc.Snapshot] = None
+        self._last_flush = float("-inf")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "MemoryGuard":
+        """Start sampling in the background; returns self."""
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self._thread = threading.Thread(target=self._run, name="memory-guard", daemon=True)
+        self._thread.start()
+        limit = f", soft limit {self.soft_limit_mb:.0f} MB" if self.soft_limit_mb else ""
+        _log.info("Memory guard sampling every %gs%s%s", self.interval, limit,
+                  ", tracing allocations" if self.trace else "")
+        return self
+
+    def stop(self) -> None:
+        """Stop sampling, take a last sample and log the report."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+        self.sample()
+        self.write_report()
+        _log.info("Memory report:\n%s", format_report(self.report()))
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def sample(self) -> Dict[str, Any]:
+        """Take one sample now, flushing caches if RSS is above the soft limit."""
+        now = time.monotonic()
+        sample: Dict[str, Any] = {"time": now, "rss": process_rss()}
+        if self.trace and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(_trace_filters())
+            sizes: Dict[str, int] = {}
+            for stat in snapshot.statistics("filename"):
+                name = subsystem_of(stat.traceback[0].filename)
+                sizes[name] = sizes.get(name, 0) + stat.size
+            sample["traced"] = tracemalloc.get_traced_memory()[0]
+            sample["subsystems"] = sizes
+            with self._lock:
+                if self._baseline is None:
+                    self._baseline = snapshot
+                self._latest = snapshot
+        with self._lock:
+            self._samples.append(sample)
+
+        rss = sample["rss"]
+        if (self.soft_limit_mb is not None and rss is not None and rss > self.soft_limit_mb * MB
+                and now - self._last_flush >= FLUSH_COOLDOWN):
+            self._last_flush = now
+            self.flushes += 1
+            _log.warning("Memory use %.0f MB is above the soft limit of %.0f MB, flushing caches",
+                         rss / MB, self.soft_limit_mb)
+            flush_caches()
+            after = process_rss()
+            if after is not None:
+                _log.info("Memory use after flushing caches: %.0f MB", after / MB)
+        return sample
+
+    def report(self, top: int = TOP_SITES) -> Dict[str, Any]:
+        """
+        Summarize the samples so far.
+
+        Args:
+            top: Number of growth sites listed.
+
+        Returns:
+            RSS at the first, latest and highest sample, its growth per hour,
+            each subsystem's traced size and growth per hour, and the source
+            lines whose traced allocations grew most since the first sample.
+        """
+        with self._lock:
+            samples = list(self._samples)
+            baseline, latest = self._baseline, self._latest
+        if not samples:
+            return {"samples": 0}
+
+        first, last = samples[0], samples[-1]
+        hours = (last["time"] - first["time"]) / 3600
+        rss = [s["rss"] for s in samples if s["rss"] is not None]
+        report: Dict[str, Any] = {
+            "samples": len(samples),
+            "hours": hours,
+            "rss_first_mb": rss[0] / MB if rss else None,
+            "rss_last_mb": rss[-1] / MB if rss else None,
+            "rss_peak_mb": max(rss) / MB if rss else None,
+            "rss_growth_mb_per_hour": (rss[-1] - rss[0]) / MB / hours if rss and hours > 0 else 0.0,
+            "flushes": self.flushes,
+        }
+
+        traced = [s for s in samples if "subsystems" in s]
+        if traced:
+            start, end = traced[0]["subsystems"], traced[-1]["subsystems"]
+            span = (traced[-1]["time"] - traced[0]["time"]) / 3600
+            report["subsystems"] = sorted(
+                ({"name": name, "size_mb": size / MB,
+                  "growth_mb_per_hour": (size - start.get(name, 0)) / MB / span if span > 0 else 0.0}
+                 for name, size in end.items()),
+                key=lambda row: -row["size_mb"],
+            )
+        if baseline is not None and latest is not None and latest is not baseline:
+            report["growth_sites"] = [
+                {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_mb": stat.size / MB, "growth_mb": stat.size_diff / MB, "count_diff": stat.count_diff}
+                for stat in latest.compare_to(baseline, "lineno")[:top] if stat.size_diff > 0
+            ]
+        return report
+
+    def write_report(self) -> None:
+        """Atomically write the report to the report path, if there is one."""
+        if not self.report_path:
+            return
+        temp_path = f"{self.report_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=2)
+            os.replace(temp_path, self.report_path)
+        except OSError as e:
+            _log.warning("Could not write memory report: %s", e)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+                self.write_report()
+            except Exception as e:
+                # A failed sample must not end the guard, let alone the automation
+                _log.warning("Memory sample failed: %s", e)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a MemoryGuard report as text."""
+    if not report.get("samples"):
+        return "No memory samples"
+    lines = [f"{report['samples']} samples over {report['hours']:.2f} h, {report['flushes']} cache flushes"]
+    if report["rss_last_mb"] is not None:
+        lines.append(f"RSS {report['rss_first_mb']:.0f} -> {report['rss_last_mb']:.0f} MB "
+                     f"(peak {report['rss_peak_mb']:.0f} MB, {report['rss_growth_mb_per_hour']:+.1f} MB/h)")
+    if report.get("subsystems"):
+        lines.append(f"{'subsystem':<24}{'traced':>10}{'growth':>14}")
+        for row in report["subsystems"]:
+            lines.append(f"{row['name']:<24}{row['size_mb']:>7.1f} MB{row['growth_mb_per_hour']:>+9.1f} MB/h")
+    if report.get("growth_sites"):
+        lines.append("Top growth sites:")
+        for row in report["growth_sites"]:
+            lines.append(f"  {row['growth_mb']:+8.2f} MB {row['count_diff']:+8d} blocks  {row['site']}")
+    return "\n".join(lines)
+
+
+# =============================================================================
+# Global Guard
+# =============================================================================
+
+_guard: Optional[MemoryGuard] = None
+
+
+def start_memory_guard(
+    interval: float = DEFAULT_INTERVAL,
+    soft_limit_mb: Optional[float] = None,
+    trace: bool = False,
+    report_path: Optional[str] = None,
+) -> MemoryGuard:
+    """Start the process-wide memory guard (see :class:`MemoryGuard`)."""
+    global _guard
+    _guard = MemoryGuard(interval, soft_limit_mb, trace, report_path).start()
+    return _guard
+
+
+def get_memory_guard() -> Optional[MemoryGuard]:
+    """Get the running memory guard, or None."""
+    return _guard
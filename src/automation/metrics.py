@@ -0,0 +1,448 @@
+"""Per-stage latency metrics for template lookups.
+
+Every stage of a lookup (capture, grayscale conversion, template load,
+keypoint detection, matching, geometric verification, click delivery) can be
+timed with :func:`timed`. Samples are aggregated into fixed-bucket histograms
+keyed by ``(stage, template, strategy)``, so memory stays constant no matter
+how many rounds run, and p50/p95/p99 can be read at any time.
+
+Metrics are disabled by default. While disabled, :func:`timed` returns a
+shared no-op context manager and records nothing.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .log import get_logger
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+class Stages:
+    """Names of the timed lookup stages."""
+    CAPTURE = "capture"
+    GRAYSCALE = "grayscale"
+    TEMPLATE_LOAD = "template_load"
+    KEYPOINTS = "keypoints"
+    MATCHING = "matching"
+    VERIFICATION = "verification"
+    LOOKUP = "lookup"
+    CLICK = "click"
+
+
+class Counters:
+    """Names of the counted lookup events."""
+    KNOWN_LOCATION = "known_location"    # outcome of the known-location fast path
+    INCREMENTAL_EXTRACTION = "incremental_extraction"    # how a frame's keypoints were obtained
+    KEYPOINT_BUDGET = "keypoint_budget"    # why a keypoint budget's level changed
+
+
+# Log-spaced bucket upper bounds from 0.1 ms to ~2 minutes (25% steps)
+BUCKET_BOUNDS: Tuple[float, ...] = tuple(0.0001 * 1.25 ** i for i in range(64))
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_EXPORT_INTERVAL = 10.0
+PROMETHEUS_PREFIX = "afk_stage_seconds"
+PROMETHEUS_COUNTER_PREFIX = "afk_lookup_events_total"
+
+
+# =============================================================================
+# Histogram
+# =============================================================================
+
+class Histogram:
+    """Fixed-bucket latency histogram with interpolated percentiles."""
+
+    __slots__ = ("counts", "count", "total", "minimum", "maximum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one sample."""
+        index = _bucket_index(seconds)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.minimum:
+            self.minimum = seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate a percentile from the bucket counts.
+
+        Args:
+            q: Quantile in the range 0-1.
+
+        Returns:
+            Estimated latency in seconds (0.0 if no samples).
+        """
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count == 0:
+                continue
+            if cumulative + bucket_count >= rank:
+                lower = BUCKET_BOUNDS[index - 1] if index > 0 else 0.0
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.maximum
+                fraction = (rank - cumulative) / bucket_count
+                value = lower + (upper - lower) * fraction
+                return min(max(value, self.minimum), self.maximum)
+            cumulative += bucket_count
+        return self.maximum
+
+    def summary(self, quantiles=DEFAULT_QUANTILES) -> Dict[str, float]:
+        """Return count, sum, min, max, mean and the requested percentiles."""
+        result = {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.minimum if self.count else 0.0,
+            "max": self.maximum,
+            "mean": self.total / self.count if self.count else 0.0,
+        }
+        for q in quantiles:
+            result[f"p{int(round(q * 100))}"] = self.percentile(q)
+        return result
+
+
+def _bucket_index(seconds: float) -> int:
+    """Index of the first bucket whose upper bound is >= seconds."""
+    if seconds <= BUCKET_BOUNDS[0]:
+        return 0
+    index = int(math.ceil(math.log(seconds / BUCKET_BOUNDS[0], 1.25)))
+    return min(index, len(BUCKET_BOUNDS))
+
+
+# =============================================================================
+# Registry
+# =============================================================================
+
+MetricKey = Tuple[str, str, str]  # (stage, template, strategy)
+CounterKey = Tuple[str, str, str]  # (counter, template, outcome)
+
+
+class MetricsRegistry:
+    """Thread-safe collection of stage histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[MetricKey, Histogram] = {}
+        self._counters: Dict[CounterKey, int] = {}
+
+    def observe(self, stage: str, seconds: float, template: str = "", strategy: str = "") -> None:
+        """Record a stage duration."""
+        key = (stage, template, strategy)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, counter: str, template: str = "", outcome: str = "") -> None:
+        """Count one lookup event."""
+        key = (counter, template, outcome)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def reset(self) -> None:
+        """Drop all recorded samples."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """
+        Summarise every histogram.
+
+        Returns:
+            List of dicts with stage, template, strategy and summary statistics.
+        """
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [
+                {"stage": stage, "template": template, "strategy": strategy, **histogram.summary()}
+                for (stage, template, strategy), histogram in items
+            ]
+
+    def counters(self) -> List[Dict[str, object]]:
+        """
+        List every event counter.
+
+        Returns:
+            List of dicts with counter, template, outcome and count.
+        """
+        with self._lock:
+            return [
+                {"counter": counter, "template": template, "outcome": outcome, "count": value}
+                for (counter, template, outcome), value in sorted(self._counters.items())
+            ]
+
+    def to_prometheus(self) -> str:
+        """Render all histograms in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX} Lookup stage latency in seconds.",
+            f"# TYPE {PROMETHEUS_PREFIX} histogram",
+        ]
+        quantile_lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_quantile Estimated lookup stage latency percentiles.",
+            f"# TYPE {PROMETHEUS_PREFIX}_quantile gauge",
+        ]
+
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (stage, template, strategy), histogram in items:
+                labels = f'stage="{stage}",template="{template}",strategy="{strategy}"'
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKET_BOUNDS, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{PROMETHEUS_PREFIX}_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{PROMETHEUS_PREFIX}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{PROMETHEUS_PREFIX}_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"{PROMETHEUS_PREFIX}_count{{{labels}}} {histogram.count}")
+                for q in DEFAULT_QUANTILES:
+                    quantile_lines.append(
+                        f'{PROMETHEUS_PREFIX}_quantile{{{labels},quantile="{q}"}} {histogram.percentile(q):.6f}'
+                    )
+
+            counter_lines = [
+                f"# HELP {PROMETHEUS_COUNTER_PREFIX} Lookup events by outcome.",
+                f"# TYPE {PROMETHEUS_COUNTER_PREFIX} counter",
+            ]
+            for (counter, template, outcome), value in sorted(self._counters.items()):
+                labels = f'counter="{counter}",template="{template}",outcome="{outcome}"'
+                counter_lines.append(f"{PROMETHEUS_COUNTER_PREFIX}{{{labels}}} {value}")
+
+        return "\n".join(lines + quantile_lines + counter_lines) + "\n"
+
+
+# =============================================================================
+# Global State and Timers
+# =============================================================================
+
+_registry = MetricsRegistry()
+_enabled = False
+_context = threading.local()
+
+
+def set_metrics_enabled(enabled: bool) -> None:
+    """Enable or disable stage timing."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_metrics_enabled() -> bool:
+    """Check if stage timing is enabled."""
+    return _enabled
+
+
+def get_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry."""
+    return _registry
+
+
+def current_template() -> str:
+    """Name of the template being looked up on this thread, if any."""
+    return getattr(_context, "template", "")
+
+
+@contextmanager
+def lookup(template_name: str) -> Iterator[None]:
+    """
+    Label all stages timed on this thread with a template name.
+
+    Args:
+        template_name: The template file name, e.g. ``fight.png``.
+    """
+    previous = getattr(_context, "template", "")
+    _context.template = template_name
+    try:
+        yield
+    finally:
+        _context.template = previous
+
+
+class _StageTimer:
+    """Context manager that records the elapsed time of one stage."""
+
+    __slots__ = ("stage", "strategy", "start")
+
+    def __init__(self, stage: str, strategy: str):
+        self.stage = stage
+        self.strategy = strategy
+        self.start = 0.0
+
+    def __enter__(self) -> "_StageTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _registry.observe(self.stage, time.perf_counter() - self.start,
+                          current_template(), self.strategy)
+
+
+class _NullTimer:
+    """Shared no-op timer used while metrics are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def count(counter: str, outcome: str) -> None:
+    """
+    Count a lookup event under the current template label, if metrics are enabled.
+
+    Args:
+        counter: Counter name, one of :class:`Counters`.
+        outcome: What happened, e.g. ``present`` or ``absent``.
+    """
+    if _enabled:
+        _registry.increment(counter, current_template(), outcome)
+
+
+def timed(stage: str, strategy: str = ""):
+    """
+    Time a lookup stage.
+
+    Args:
+        stage: Stage name, one of :class:`Stages`.
+        strategy: Matching strategy the stage belongs to (sift, akaze, multiscale).
+
+    Returns:
+        A context manager; a shared no-op one while metrics are disabled.
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _StageTimer(stage, strategy)
+
+
+# =============================================================================
+# Exporters
+# =============================================================================
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serve the registry in Prometheus text format."""
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = _registry.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        _log.debug("metrics endpoint: " + format, *args)
+
+
+class MetricsExporter:
+    """Background exporter writing JSON snapshots or serving a Prometheus endpoint."""
+
+    def __init__(self, target: str, interval: float = DEFAULT_EXPORT_INTERVAL):
+        """
+        Args:
+            target: A JSON file path, or ``[host]:port`` for an HTTP endpoint.
+            interval: Seconds between JSON snapshots.
+        """
+        self.target = target
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def is_http(self) -> bool:
+        """Whether the target is an HTTP endpoint rather than a file."""
+        return _parse_http_target(self.target) is not None
+
+    def start(self) -> None:
+        """Start the exporter thread."""
+        address = _parse_http_target(self.target)
+        if address is not None:
+            self._server = ThreadingHTTPServer(address, _MetricsRequestHandler)
+            self._server.daemon_threads = True
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            _log.info("Serving metrics at http://%s:%d/metrics", address[0], address[1])
+        else:
+            self._thread = threading.Thread(target=self._write_loop, daemon=True)
+            _log.info("Writing metrics snapshots to %s every %gs", self.target, self.interval)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the exporter, writing a final snapshot for file targets."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        elif self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self.write_snapshot()
+
+    def write_snapshot(self) -> None:
+        """Atomically write the current registry to the JSON target."""
+        data = {"timestamp": time.time(), "stages": _registry.snapshot(), "counters": _registry.counters()}
+        temp_path = f"{self.target}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.target)
+        except OSError as e:
+            _log.warning("Could not write metrics snapshot: %s", e)
+
+    def _write_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write_snapshot()
+
+
+def _parse_http_target(target: str) -> Optional[Tuple[str, int]]:
+    """Parse ``[host]:port`` into an address tuple, or None for file targets."""
+    host, sep, port = target.rpartition(":")
+    if not sep or not port.isdigit() or "\\" in host or "/" in host:
+        return None
+    return (host or "127.0.0.1", int(port))
+
+
+def start_metrics(target: str, interval: float = DEFAULT_EXPORT_INTERVAL) -> MetricsExporter:
+    """
+    Enable stage timing and start an exporter.
+
+    Args:
+        target: A JSON file path, or ``[host]:port`` for a Prometheus text endpoint.
+        interval: Seconds between JSON snapshots.
+
+    Returns:
+        The running exporter.
+    """
+    set_metrics_enabled(True)
+    exporter = MetricsExporter(target, interval)
+    exporter.start()
+    return exporter
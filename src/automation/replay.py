@@ -0,0 +1,217 @@
+"""Replay flight recorder dumps through the matching cascade.
+
+Every recorded lookup whose frame is still in the dump is run through
+``findMatchings`` again against the same template, so a slow or wrong
+decision can be reproduced and profiled offline, without the game.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .assets import get_template_path
+from .flight_recorder import EVENTS_FILE, frame_file_name
+from . import descriptors
+from .descriptors import DescriptorModes
+from .image_matching import ImageFeatures, _get_detector, findMatchings, findMatchings_sift, get_last_match_info
+
+
+def load_dump(path: str) -> Dict[str, Any]:
+    """
+    Load the metadata and events of a flight recorder dump.
+
+    Args:
+        path: The dump directory.
+
+    Returns:
+        The parsed ``events.json`` contents.
+    """
+    with open(os.path.join(path, EVENTS_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_frame(path: str, frame_id: int) -> Optional[np.ndarray]:
+    """Load one grayscale frame from a dump, or None if it was not retained."""
+    frame_path = os.path.join(path, frame_file_name(frame_id))
+    if not os.path.exists(frame_path):
+        return None
+    with np.load(frame_path) as data:
+        return data["frame"]
+
+
+def _recorded_lookups(path: str, template: Optional[str] = None) -> Iterator[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]:
+    """Yield ``(event, frame, template_image)`` for every lookup of a dump whose frame was retained."""
+    dump = load_dump(path)
+    frames: Dict[int, np.ndarray] = {}
+    templates: Dict[str, np.ndarray] = {}
+
+    for event in dump["events"]:
+        if event.get("kind") != "lookup" or event.get("frame_id") is None:
+            continue
+        if template is not None and event["template"] != template:
+            continue
+
+        frame_id = event["frame_id"]
+        if frame_id not in frames:
+            frames[frame_id] = load_frame(path, frame_id)
+        frame = frames[frame_id]
+        if frame is None:
+            continue
+
+        template_path = get_template_path(event["language"], event["template"])
+        if template_path not in templates:
+            templates[template_path] = cv2.imread(template_path, 0)
+        template_image = templates[template_path]
+        if template_image is None:
+            continue
+
+        yield event, frame, template_image
+
+
+def replay_dump(path: str, repeat: int = 1, template: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Re-run the recorded lookups of a dump.
+
+    Args:
+        path: The dump directory.
+        repeat: How many times to run each lookup; the fastest run is reported.
+        template: Only replay lookups for this template file name.
+
+    Returns:
+        One dict per replayed lookup with the recorded and replayed outcome.
+    """
+    results = []
+
+    for event, frame, template_image in _recorded_lookups(path, template):
+        durations = []
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            loc = findMatchings(frame, template_image)
+            durations.append(time.perf_counter() - start)
+        info = get_last_match_info()
+
+        results.append({
+            "frame_id": event["frame_id"],
+            "template": event["template"],
+            "recorded_found": event.get("found"),
+            "recorded_strategy": event.get("strategy"),
+            "recorded_duration": event.get("duration"),
+            "found": bool(loc),
+            "location": loc[0] if loc else None,
+            "strategy": info.get("strategy"),
+            "inlier_ratio": info.get("inlier_ratio"),
+            "score": info.get("score"),
+            "duration": min(durations),
+        })
+
+    return results
+
+
+# Distance in pixels within which two modes are considered to have found the same spot
+SAME_LOCATION = 5
+
+
+def compare_descriptor_modes(
+    path: str,
+    modes: Sequence[str] = DescriptorModes.ALL,
+    template: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run the SIFT stage of every recorded lookup under each descriptor mode and
+    compare the outcome with the full float32 descriptors.
+
+    Args:
+        path: The dump directory.
+        modes: Descriptor modes to compare; ``full`` is always run as the reference.
+        template: Only replay lookups for this template file name.
+
+    Returns:
+        One dict per mode with the share of lookups that agree with ``full``,
+        the mean offset of agreeing locations, the median lookup time and the
+        memory of the template descriptors.
+    """
+    lookups = list(_recorded_lookups(path, template))
+    modes = [DescriptorModes.FULL] + [m for m in modes if m != DescriptorModes.FULL]
+    previous_mode = descriptors.get_descriptor_mode()
+    if DescriptorModes.PCA in modes and descriptors.get_pca_basis() is None:
+        sift = _get_detector("sift")
+        unique = {id(image): image for _, _, image in lookups}
+        descriptors.fit_pca_basis(sift.detectAndCompute(image, None)[1] for image in unique.values())
+
+    outcomes: Dict[str, List[Optional[Tuple[int, int]]]] = {}
+    rows = []
+    try:
+        for mode in modes:
+            descriptors.set_descriptor_mode(mode)
+            # Fresh wrappers per mode, so nothing encoded for another mode is reused
+            frames: Dict[int, ImageFeatures] = {}
+            templates: Dict[int, ImageFeatures] = {}
+            found, durations = [], []
+            for _, frame, template_image in lookups:
+                frame_features = frames.setdefault(id(frame), ImageFeatures(frame))
+                template_features = templates.setdefault(id(template_image), ImageFeatures(template_image, compact=True))
+                template_features.sift()
+                start = time.perf_counter()
+                loc = findMatchings_sift(frame_features, template_features)
+                durations.append(time.perf_counter() - start)
+                found.append(loc[0] if loc else None)
+            outcomes[mode] = found
+
+            agree, offsets = 0, []
+            for reference, loc in zip(outcomes[DescriptorModes.FULL], found):
+                if reference is None or loc is None:
+                    agree += reference is None and loc is None
+                    continue
+                offset = float(np.hypot(reference[0] - loc[0], reference[1] - loc[1]))
+                if offset <= SAME_LOCATION:
+                    agree += 1
+                    offsets.append(offset)
+            rows.append({
+                "mode": mode,
+                "lookups": len(found),
+                "found": sum(loc is not None for loc in found),
+                "agreement": agree / len(found) if found else 1.0,
+                "mean_offset": float(np.mean(offsets)) if offsets else 0.0,
+                "median_ms": float(np.median(durations)) * 1000 if durations else 0.0,
+                "template_bytes": sum(t.nbytes() for t in templates.values()),
+            })
+    finally:
+        descriptors.set_descriptor_mode(previous_mode)
+    return rows
+
+
+def format_descriptor_comparison(rows: List[Dict[str, Any]]) -> str:
+    """Render compare_descriptor_modes results as a plain-text table."""
+    if not rows or not rows[0]["lookups"]:
+        return "No replayable lookups in dump."
+
+    lines = [f"{'mode':<10} {'found':>7} {'agree':>7} {'offset':>8} {'median':>10} {'templates':>10}"]
+    for r in rows:
+        lines.append(
+            f"{r['mode']:<10} {r['found']:>3}/{r['lookups']:<3} {r['agreement']:>7.0%} "
+            f"{r['mean_offset']:>6.1f}px {r['median_ms']:>8.1f}ms {r['template_bytes'] / 1024:>8.0f}KB"
+        )
+    return "\n".join(lines)
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    """Render replay results as a plain-text table, slowest lookups first."""
+    if not results:
+        return "No replayable lookups in dump."
+
+    lines = [
+        f"{'frame':>6}  {'template':<16} {'recorded':>10} {'replayed':>10}  {'strategy':<10} {'found':<5} {'same':<4}",
+    ]
+    for r in sorted(results, key=lambda r: r["duration"], reverse=True):
+        recorded = r["recorded_duration"]
+        recorded_text = f"{recorded * 1000:8.1f}ms" if recorded is not None else "         -"
+        same = "yes" if r["found"] == r["recorded_found"] else "NO"
+        lines.append(
+            f"{r['frame_id']:>6}  {r['template']:<16} {recorded_text:>10} "
+            f"{r['duration'] * 1000:8.1f}ms  {str(r['strategy']):<10} {str(r['found']):<5} {same:<4}"
+        )
+    return "\n".join(lines)
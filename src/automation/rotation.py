@@ -0,0 +1,188 @@
+"""Team rotation memory for modes that adopt teams from the battle records.
+
+The record list is an ordered set of teams. Instead of paging further down
+the list after every few losses, :class:`TeamRotation` remembers which
+record is adopted and how each record has fared, and picks the most
+promising record when the team needs to change: proven winners first, then
+records not tried yet, in list order. When the best choice is the team
+already adopted, the record list does not need to be opened at all.
+
+Results decay geometrically, so a record that used to win but has started
+losing (or a list the player has re-recorded) is re-evaluated quickly. The
+memory is saved per mode, and per session when several clients are driven.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from .log import get_logger
+from .timing import DEFAULT_PROFILE_DIR
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+DECAY = 0.95            # weight kept by older results each time a record is played
+UNTRIED_SCORE = 0.5     # prior win rate of a record never played
+RECENT_WINS = 0.5       # decayed wins above which a record counts as a recent winner
+
+
+def default_rotation_path(mode: str, profile: Optional[str] = None) -> str:
+    """Path of the rotation memory of a mode (and optionally a session profile)."""
+    name = mode if profile is None else f"{mode}_{profile}"
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    return os.path.join(DEFAULT_PROFILE_DIR, f"teams_{name}.json")
+
+
+# =============================================================================
+# Rotation
+# =============================================================================
+
+class RecordHistory:
+    """Decayed win/loss counts of one record."""
+
+    __slots__ = ("wins", "losses")
+
+    def __init__(self, wins: float = 0.0, losses: float = 0.0):
+        self.wins = wins
+        self.losses = losses
+
+    def observe(self, won: bool) -> None:
+        self.wins *= DECAY
+        self.losses *= DECAY
+        if won:
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    @property
+    def recent_winner(self) -> bool:
+        return self.wins >= RECENT_WINS
+
+    @property
+    def score(self) -> float:
+        """Smoothed win rate (Laplace), pulled towards the untried prior."""
+        return (self.wins + UNTRIED_SCORE) / (self.wins + self.losses + 1)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"wins": self.wins, "losses": self.losses}
+
+
+class TeamRotation:
+    """Chooses which record to adopt, remembering every record's results."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON file the memory is loaded from and saved to; None keeps it in memory.
+        """
+        self.path = path
+        self.current: Optional[int] = None
+        self._records: Dict[int, RecordHistory] = {}
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    @classmethod
+    def for_mode(cls, mode: str, profile: Optional[str] = None) -> "TeamRotation":
+        """The persisted rotation memory of a mode."""
+        return cls(default_rotation_path(mode, profile))
+
+    def choose(self, fail_count: int, fail_threshold: int, record_count: int) -> int:
+        """
+        Pick the record to play the next round with.
+
+        The current record is kept until it has lost ``fail_threshold`` times in
+        a row; then the best other record is chosen.
+
+        Args:
+            fail_count: Consecutive losses so far.
+            fail_threshold: Losses in a row after which the team is changed.
+            record_count: Number of records that may be chosen (indices 0..count-1).
+
+        Returns:
+            The record index.
+        """
+        with self._lock:
+            # A saved record past the end of the list (the player deleted records) is chosen afresh
+            if self.current is None or self.current >= max(1, record_count):
+                return self._best(record_count)
+            if fail_count > 0 and fail_count % fail_threshold == 0:
+                return self._best(record_count, exclude=self.current)
+            return self.current
+
+    def _best(self, record_count: int, exclude: Optional[int] = None) -> int:
+        candidates = [i for i in range(max(1, record_count)) if i != exclude] or [0]
+        # Recent winners, then untried records, then the rest; ties go to the record nearest the top
+        return max(candidates, key=lambda i: self._rank(i) + (-i,))
+
+    def _rank(self, index: int) -> Tuple[int, float]:
+        history = self._records.get(index)
+        if history is None:
+            return 1, UNTRIED_SCORE
+        return (2 if history.recent_winner else 0), history.score
+
+    def record(self, index: int, won: bool) -> None:
+        """Record the outcome of a round played with a record and mark it as adopted."""
+        with self._lock:
+            self.current = index
+            self._records.setdefault(index, RecordHistory()).observe(won)
+
+    def snapshot(self) -> Dict[int, Dict[str, float]]:
+        """Every record's decayed counts and score."""
+        with self._lock:
+            return {i: {**h.to_dict(), "score": h.score} for i, h in sorted(self._records.items())}
+
+    def save(self) -> None:
+        """Write the memory to its file, if it has one."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "current": self.current,
+                "records": {str(i): h.to_dict() for i, h in self._records.items()},
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            _log.warning("Could not save team rotation: %s", e)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            _log.warning("Could not load team rotation %s: %s", self.path, e)
+            return
+
+        try:
+            records = {int(index): RecordHistory(float(values.get("wins", 0.0)), float(values.get("losses", 0.0)))
+                       for index, values in data.get("records", {}).items()}
+            if any(index < 0 for index in records):
+                raise ValueError("negative record index")
+        except (AttributeError, TypeError, ValueError) as e:
+            # Parsed but not a rotation memory (hand-edited, or another file); start fresh like a missing one
+            _log.warning("Ignoring malformed team rotation %s: %s", self.path, e)
+            return
+        self._records = records
+
+        # Resume with the record adopted last; anything but a record index is ignored
+        current = data.get("current")
+        if isinstance(current, int) and not isinstance(current, bool) and current >= 0:
+            self.current = current
+        elif current is not None:
+            _log.warning("Ignoring invalid current record %r in %s", current, self.path)
+        _log.debug("Loaded team rotation for %d records from %s (current %s)",
+                   len(self._records), self.path, self.current)
@@ -0,0 +1,197 @@
+"""Single-capture scene classification.
+
+A :class:`SceneClassifier` decides which known screen is showing from one
+frame. Every candidate template is evaluated against the same frame, whose
+keypoints are extracted once and shared, so a poll costs one capture and one
+feature extraction no matter how many screens are candidates, and all
+decisions describe the same moment in time.
+
+With a :class:`~automation.image_matching.LocationCache`, templates seen
+before are first verified at their known location; the frame's keypoints
+are only extracted when some template still needs the full cascade.
+
+With a :class:`~automation.matcher_service.MatcherService`, that cascade
+runs in a matcher process that reads the frame from shared memory.
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .image_matching import (
+    ImageFeatures,
+    ImageLike,
+    LocationCache,
+    LookupOutcomes,
+    as_features,
+    findMatchings,
+    get_last_match_info,
+    get_matcher_pool,
+)
+from .layout import observe_match
+from .log import get_logger
+from .matcher_service import MatcherService, get_matcher_service
+from .metrics import lookup
+from .screenshot import CaptureSource
+from .templates import get_template_registry
+from . import flight_recorder
+
+_log = get_logger(__name__)
+
+
+class Scenes:
+    """Names of the known game screens."""
+    IN_BATTLE = "in_battle"
+    WON = "won"
+    LOST = "lost"
+    TEAM_SELECT = "team_select"
+    RECORD_LIST = "record_list"
+    UNKNOWN = "unknown"
+
+
+class SceneResult:
+    """Outcome of classifying one frame."""
+
+    __slots__ = ("scene", "template", "location", "matches", "frame", "duration", "monitor")
+
+    def __init__(
+        self,
+        scene: str,
+        template: Optional[str],
+        location: Optional[Tuple[int, int]],
+        matches: Dict[str, Tuple[int, int]],
+        frame: ImageFeatures,
+        duration: float,
+    ):
+        self.scene = scene
+        self.template = template
+        self.location = location
+        self.matches = matches
+        self.frame = frame
+        self.duration = duration
+        self.monitor: Optional[CaptureSource] = None
+
+    def __repr__(self) -> str:
+        return f"SceneResult(scene={self.scene!r}, template={self.template!r}, location={self.location})"
+
+
+def _match_template(frame: ImageFeatures, template: ImageFeatures, template_name: str):
+    """Run one lookup under the template's metrics label; safe to run on a pool thread."""
+    with lookup(template_name):
+        start = time.perf_counter()
+        loc = findMatchings(frame, template)
+        return loc, time.perf_counter() - start, get_last_match_info()
+
+
+def _match_remote(service: MatcherService, frame: ImageFeatures, language: str,
+                  names: List[str]) -> Dict[str, tuple]:
+    """Run the cascade for several templates in a matcher process; results are keyed by template."""
+    outcomes = {}
+    for name, loc, duration, info in service.submit(frame, language, names).result():
+        outcomes[name] = (loc, duration, info)
+        # The worker's UI scale estimate is not shared, so calibrate this process's from its SIFT matches
+        if frame.calibration is not None and info.get("strategy") == "sift" and loc:
+            frame.calibration.observe(info)
+    return outcomes
+
+
+def _verify_template(frame: ImageFeatures, locations: LocationCache, key: str, template_name: str):
+    """Verify a template at its known location; the outcome tells whether the cascade must still run."""
+    with lookup(template_name):
+        start = time.perf_counter()
+        outcome, loc = locations.verify(frame.image, key)
+        return outcome, (loc, time.perf_counter() - start, get_last_match_info())
+
+
+class SceneClassifier:
+    """Classify a frame among known screens, each identified by one or more templates."""
+
+    def __init__(self, scenes: Sequence[Tuple[str, Sequence[str]]], default_scene: str = Scenes.UNKNOWN):
+        """
+        Args:
+            scenes: ``(scene, templates)`` pairs in priority order. When several
+                scenes match the same frame, the first one listed wins.
+            default_scene: Scene reported when no template matches.
+        """
+        self.scenes = [(scene, tuple(templates)) for scene, templates in scenes]
+        self.default_scene = default_scene
+
+    @property
+    def templates(self) -> List[str]:
+        """All candidate templates, in priority order."""
+        return [template for _, templates in self.scenes for template in templates]
+
+    def classify(self, frame: ImageLike, language: str, locations: Optional[LocationCache] = None) -> SceneResult:
+        """
+        Decide which scene a frame shows.
+
+        Args:
+            frame: The screenshot (grayscale) or its ImageFeatures.
+            language: Asset language of the templates.
+            locations: Known template locations to verify before the full cascade.
+
+        Returns:
+            The winning scene with its matched template and location in the
+            frame, plus every template that matched.
+        """
+        start = time.perf_counter()
+        frame = as_features(frame)
+        registry = get_template_registry()
+        recorder = flight_recorder.get_flight_recorder()
+        pool = get_matcher_pool()
+        service = get_matcher_service()
+
+        candidates = [(name, registry.get(language, name)) for name in self.templates]
+        candidates = [(name, template) for name, template in candidates if template is not None]
+        outcomes: List[Optional[tuple]] = [None] * len(candidates)
+        if locations is not None:
+            for i, (name, _) in enumerate(candidates):
+                verdict, outcome = _verify_template(frame, locations, f"{language}/{name}", name)
+                if verdict in LookupOutcomes.FAST:
+                    outcomes[i] = outcome
+
+        pending = [i for i, outcome in enumerate(outcomes) if outcome is None]
+        if pending:
+            if service is not None:
+                outcomes_by_name = _match_remote(service, frame, language, [candidates[i][0] for i in pending])
+                for i in pending:
+                    outcomes[i] = outcomes_by_name[candidates[i][0]]
+            else:
+                # Extract the frame's keypoints once, outside any single template's label
+                frame.sift()
+                if pool is not None and len(pending) > 1:
+                    futures = {i: pool.submit(_match_template, frame, candidates[i][1], candidates[i][0])
+                               for i in pending}
+                    for i, future in futures.items():
+                        outcomes[i] = future.result()
+                else:
+                    for i in pending:
+                        outcomes[i] = _match_template(frame, candidates[i][1], candidates[i][0])
+            for i in pending:
+                (name, template), (loc, _, info) = candidates[i], outcomes[i]
+                if locations is not None:
+                    locations.update(f"{language}/{name}", frame.image, template, loc, info.get("scale"))
+                if loc:
+                    observe_match(frame, f"{language}/{name}", template.shape, loc[0], info.get("scale"))
+
+        matches: Dict[str, Tuple[int, int]] = {}
+        for (template_name, _), (loc, duration, info) in zip(candidates, outcomes):
+            if recorder is not None:
+                recorder.record_lookup(template_name, language, bool(loc), duration, info, frame=frame.image)
+            if loc:
+                matches[template_name] = loc[0]
+
+        result = SceneResult(self.default_scene, None, None, matches, frame,
+                             time.perf_counter() - start)
+        for scene, templates in self.scenes:
+            for template_name in templates:
+                if template_name in matches:
+                    result.scene = scene
+                    result.template = template_name
+                    result.location = matches[template_name]
+                    break
+            if result.template is not None:
+                break
+
+        _log.debug("Scene %s (matched: %s) in %.0fms", result.scene,
+                   ", ".join(matches) or "none", result.duration * 1000)
+        return result
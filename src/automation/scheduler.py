@@ -0,0 +1,132 @@
+"""Run several automation sessions at once from one process.
+
+Each session plays its mode on its own thread with the session activated,
+so captures, clicks, language and stop requests stay per client. All
+sessions share the process-wide template registry (every template is loaded
+and its features computed once) and one pool of matcher threads, so the
+lookups of every client are spread across the machine's cores. Mouse input
+is serialised by the click layer.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .flows import Flow, FlowResult, get_flow, run_flow
+from .image_matching import get_matcher_pool, set_matcher_pool
+from .log import get_logger
+from .session import AutomationSession
+
+_log = get_logger(__name__)
+
+
+class _ScheduledRun:
+    """A session together with the flow it plays and its limits."""
+
+    __slots__ = ("session", "flow", "max_rounds", "max_runtime", "thread", "result", "error")
+
+    def __init__(self, session: AutomationSession, flow: Flow, max_rounds: Optional[int],
+                 max_runtime: Optional[float]):
+        self.session = session
+        self.flow = flow
+        self.max_rounds = max_rounds
+        self.max_runtime = max_runtime
+        self.thread: Optional[threading.Thread] = None
+        self.result: Optional[FlowResult] = None
+        self.error: Optional[BaseException] = None
+
+
+class SessionScheduler:
+    """Plays one flow per session, all sessions concurrently."""
+
+    def __init__(self, matcher_workers: Optional[int] = None):
+        """
+        Args:
+            matcher_workers: Threads in the shared matcher pool; defaults to the CPU count.
+        """
+        self.matcher_workers = matcher_workers or os.cpu_count() or 1
+        self._runs: List[_ScheduledRun] = []
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._previous_pool = None
+
+    def add(
+        self,
+        session: AutomationSession,
+        mode: str,
+        max_rounds: Optional[int] = None,
+        max_runtime: Optional[float] = None
+    ) -> None:
+        """
+        Schedule a session.
+
+        Args:
+            session: The client to drive.
+            mode: Mode name, e.g. ``autoFight``.
+            max_rounds: Round limit; defaults to the mode's configuration.
+            max_runtime: Seconds after which the session starts no new round.
+        """
+        if any(run.session.name == session.name for run in self._runs):
+            raise ValueError(f"A session named {session.name!r} is already scheduled")
+        self._runs.append(_ScheduledRun(session, get_flow(mode), max_rounds, max_runtime))
+
+    def start(self) -> None:
+        """Start every scheduled session on its own thread."""
+        self._pool = ThreadPoolExecutor(max_workers=self.matcher_workers, thread_name_prefix="matcher")
+        self._previous_pool = get_matcher_pool()
+        set_matcher_pool(self._pool)
+
+        for run in self._runs:
+            run.thread = threading.Thread(target=self._play, args=(run,),
+                                          name=f"session-{run.session.name}", daemon=True)
+            run.thread.start()
+        _log.info("Started %d sessions with %d matcher threads", len(self._runs), self.matcher_workers)
+
+    def _play(self, run: _ScheduledRun) -> None:
+        with run.session.activate():
+            try:
+                run.result = run_flow(run.flow, run.max_rounds, run.max_runtime)
+                _log.info("[%s] %s", run.session.name, run.result.summary())
+            except Exception as e:
+                run.error = e
+                _log.exception("Session %s failed", run.session.name)
+
+    @property
+    def running(self) -> bool:
+        """Whether any session is still playing."""
+        return any(run.thread is not None and run.thread.is_alive() for run in self._runs)
+
+    def stop(self) -> None:
+        """Ask every session to stop after its current step."""
+        for run in self._runs:
+            run.session.stop()
+
+    def join(self, timeout: Optional[float] = None) -> Dict[str, Optional[FlowResult]]:
+        """
+        Wait for the sessions to finish.
+
+        Args:
+            timeout: Maximum seconds to wait for all sessions together.
+
+        Returns:
+            Each session's result by name; None for sessions that failed or are still running.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for run in self._runs:
+            if run.thread is None:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            run.thread.join(remaining)
+
+        if not self.running:
+            self._shutdown_pool()
+        return {run.session.name: run.result for run in self._runs}
+
+    def _shutdown_pool(self) -> None:
+        if self._pool is None:
+            return
+        if get_matcher_pool() is self._pool:
+            set_matcher_pool(self._previous_pool)
+        self._pool.shutdown(wait=False)
+        self._pool = None
@@ -1,9 +1,25 @@
 """Screenshot utilities for capturing monitor screens."""
 
+from typing import NamedTuple, Union
+
 import mss
 import numpy as np
 import cv2
 
+from .metrics import Stages, timed
+
+
+class CaptureRegion(NamedTuple):
+    """A screen rectangle in absolute (virtual screen) coordinates."""
+    left: int
+    top: int
+    width: int
+    height: int
+
+
+# What a capture covers: a monitor number (1-indexed) or an explicit region
+CaptureSource = Union[int, CaptureRegion]
+
 
 def screenshot_monitor(monitor_number: int = 1, output: str = "screenshot.png") -> np.ndarray:
     """
@@ -26,10 +42,33 @@ def screenshot_monitor(monitor_number: int = 1, output: str = "screenshot.png")
             )
 
         monitor = monitors[monitor_number]
-        screenshot = sct.grab(monitor)
-        mss.tools.to_png(screenshot.rgb, screenshot.size, output=output)
+        with timed(Stages.CAPTURE):
+            screenshot = sct.grab(monitor)
+            mss.tools.to_png(screenshot.rgb, screenshot.size, output=output)
+
+        with timed(Stages.GRAYSCALE):
+            img = np.array(screenshot, dtype=np.uint8)[:, :, :3]
+            gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        return gray_img
+
+
+def screenshot_region(region: CaptureRegion) -> np.ndarray:
+    """
+    Take a screenshot of a screen region, e.g. one game window.
+    
+    Args:
+        region: The rectangle to capture, in absolute screen coordinates.
+        
+    Returns:
+        Grayscale image as numpy array
+    """
+    with mss.mss() as sct:
+        with timed(Stages.CAPTURE):
+            screenshot = sct.grab(region._asdict())
 
-        img = np.array(screenshot, dtype=np.uint8)[:, :, :3]
-        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        with timed(Stages.GRAYSCALE):
+            img = np.array(screenshot, dtype=np.uint8)[:, :, :3]
+            gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        return gray_img
\ No newline at end of file
+        return gray_img
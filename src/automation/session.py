@@ -0,0 +1,185 @@
+"""Automation sessions: one game client each.
+
+An :class:`AutomationSession` owns everything that used to be a module global
+for a single client -- its window, capture region, language, stop event,
+known template locations, UI scale calibration and the previous frame's
+features.
+Activating a session on a thread makes the capture, click, language and stop
+functions of the package act on that session, so the same automation code
+can drive several clients from one process, one thread per session.
+"""
+
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional
+
+try:
+    from pywinauto import Application, findwindows
+    from pywinauto.controls.hwndwrapper import HwndWrapper
+except ImportError:
+    # Not on Windows: sessions can only drive a game backend such as the simulator
+    Application = findwindows = None
+    HwndWrapper = Any
+
+from .assets import SUPPORTED_LANGUAGES
+from .image_matching import LocationCache, ScaleCalibration
+from .incremental import IncrementalExtractor
+from .keypoint_budget import KeypointBudget
+from .log import get_logger
+from .screenshot import CaptureRegion
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+GAME_WINDOW_TITLE = "AFK Journey"
+GAME_WINDOW_CLASS = "UnityWndClass"
+
+
+def find_game_windows(title: str = GAME_WINDOW_TITLE, class_name: Optional[str] = GAME_WINDOW_CLASS) -> List[int]:
+    """
+    Find the handles of all top-level windows with a title.
+
+    Args:
+        title: Exact window title.
+        class_name: Window class to require; None accepts any (e.g. emulators).
+
+    Returns:
+        Window handles, in no particular order.
+    """
+    kwargs = {"title": title}
+    if class_name is not None:
+        kwargs["class_name"] = class_name
+    return findwindows.find_windows(**kwargs)
+
+
+# =============================================================================
+# Session
+# =============================================================================
+
+class AutomationSession:
+    """State of one automated game client."""
+
+    def __init__(
+        self,
+        name: str,
+        window_title: str = GAME_WINDOW_TITLE,
+        handle: Optional[int] = None,
+        language: str = "EN",
+        region: Optional[CaptureRegion] = None,
+    ):
+        """
+        Args:
+            name: Session name used in logs.
+            window_title: Title of the client window, used when no handle is given.
+            handle: Window handle of the client; needed when several windows share a title.
+            language: Asset language of the client (EN or CN).
+            region: Fixed capture region; by default the window's current rectangle.
+        """
+        if language not in SUPPORTED_LANGUAGES:
+            raise ValueError(f"Invalid language: {language}. Must be 'EN' or 'CN'")
+        self.name = name
+        self.window_title = window_title
+        self.handle = handle
+        self.language = language
+        self.region = region
+        self.stop_event = threading.Event()
+        self.locations = LocationCache()
+        self.calibration = ScaleCalibration()
+        self.extractor = IncrementalExtractor()
+        self.budget = KeypointBudget()
+        self.last_click = None
+        self._stop_callbacks: List[Callable[[], None]] = []
+        self._window: Optional[HwndWrapper] = None
+        _sessions.add(self)
+
+    def get_window(self) -> Optional[HwndWrapper]:
+        """The session's window, connecting on first use; None if it cannot be found."""
+        if self._window is not None:
+            try:
+                if self._window.exists():
+                    return self._window
+            except Exception:
+                pass
+            self._window = None
+
+        try:
+            if self.handle is not None:
+                app = Application().connect(handle=self.handle)
+                self._window = app.window(handle=self.handle)
+            else:
+                app = Application().connect(class_name=GAME_WINDOW_CLASS, title=self.window_title)
+                self._window = app.window(title=self.window_title)
+        except Exception as e:
+            _log.warning("Session %s could not find its game window: %s", self.name, e)
+            return None
+        return self._window
+
+    def capture_region(self) -> Optional[CaptureRegion]:
+        """The screen region to capture: the fixed region, or the window's current rectangle."""
+        if self.region is not None:
+            return self.region
+        window = self.get_window()
+        if window is None:
+            return None
+        try:
+            rect = window.rectangle()
+        except Exception as e:
+            _log.warning("Session %s could not read its window rectangle: %s", self.name, e)
+            return None
+        return CaptureRegion(rect.left, rect.top, rect.width(), rect.height())
+
+    def stop(self) -> None:
+        """Ask the session's automation to stop."""
+        self.stop_event.set()
+        for callback in list(self._stop_callbacks):
+            callback()
+
+    def add_stop_callback(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` (from the stopping thread) when the session is stopped; at once if it already is."""
+        self._stop_callbacks.append(callback)
+        if self.stop_event.is_set():
+            callback()
+
+    def remove_stop_callback(self, callback: Callable[[], None]) -> None:
+        if callback in self._stop_callbacks:
+            self._stop_callbacks.remove(callback)
+
+    def should_stop(self) -> bool:
+        return self.stop_event.is_set()
+
+    @contextmanager
+    def activate(self) -> Iterator["AutomationSession"]:
+        """Make this the current session of the calling thread for the duration of the block."""
+        previous = getattr(_local, "session", None)
+        _local.session = self
+        try:
+            yield self
+        finally:
+            _local.session = previous
+
+    def __repr__(self) -> str:
+        return f"AutomationSession({self.name!r}, language={self.language!r})"
+
+
+# =============================================================================
+# Current Session
+# =============================================================================
+
+_local = threading.local()
+_sessions: "weakref.WeakSet[AutomationSession]" = weakref.WeakSet()
+
+
+def current_session() -> Optional[AutomationSession]:
+    """The session active on the calling thread, or None outside of any session."""
+    return getattr(_local, "session", None)
+
+
+def stop_all_sessions() -> None:
+    """Ask every live session to stop."""
+    for session in list(_sessions):
+        session.stop()
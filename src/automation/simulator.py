@@ -0,0 +1,404 @@
+"""A local stand-in for the game, for end-to-end runs without Windows.
+
+:class:`GameSimulator` renders the screens of one automation mode from the
+bundled template assets and moves between them when its buttons are
+clicked, the way the game does:
+
+- team selection shows the record button and the check mark; the record
+  list pages with ``next.png`` and closes with the adopt button;
+- the fight button starts a battle (after a second check mark and fight
+  click for modes that confirm twice) that lasts a configurable time and is
+  won with a configurable probability;
+- the result screen's button (plus the follow-up button after a win, for
+  modes that have one) leads back to team selection.
+
+Screens render at a configurable resolution with buttons scaled by a DPI
+factor, and every screen change passes through a short blank transition.
+Like the game, the simulator redraws late: the first captures after a click
+still show the screen as it was, and the second confirmation is a dialog
+over the dimmed fight screen, so a step that polls too early can match the
+previous screen's fight button.
+
+Installed with :func:`~automation.click_simulation.set_game_backend`, the
+simulator takes the place of the screen capture and the mouse, so the full
+loops run headless -- on a Linux CI machine, for example -- and
+:func:`benchmark_flows` measures their rounds per hour.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .assets import get_template_path
+from .click_simulation import get_game_backend, set_game_backend
+from .flows import Actions, Flow, FlowEngine, FlowResult, get_flow
+from .game_automation import Images
+from .layout import LayoutModel, set_layout_model
+from .log import get_logger
+from .rotation import TeamRotation
+from .screenshot import CaptureRegion, CaptureSource
+from .session import AutomationSession
+from .timing import TimingModel, set_timing_model
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+DEFAULT_RESOLUTION = (1920, 1080)
+BATTLE_SECONDS = 5.0          # mean battle length
+BATTLE_SPREAD = 0.2           # standard deviation of the battle length, as a share of the mean
+TRANSITION_SECONDS = 0.3      # blank screen between two screens
+STALE_FRAMES = 2              # captures after a click that still show the screen before it
+DIALOG_DIM = 0.5              # brightness of the screen behind a dialog
+WIN_RATE = 0.5
+
+# Button centers as fractions of the window
+BUTTON_LAYOUT: Dict[str, Tuple[float, float]] = {
+    Images.RECORD: (0.1, 0.88),
+    Images.CHECK_MARK: (0.88, 0.88),
+    Images.NEXT: (0.92, 0.5),
+    Images.ADOPT_TEAM: (0.5, 0.8),
+    Images.FIGHT: (0.5, 0.88),
+    Images.FIGHT_AGAIN: (0.35, 0.85),
+    Images.CHALLENGE: (0.65, 0.85),
+    Images.CHALLENGE3: (0.6, 0.85),
+    Images.NEXT_LEVEL: (0.65, 0.85),
+}
+
+
+class SimScreens:
+    """Screens of the simulated game."""
+    TEAM_SELECT = "team_select"
+    RECORD_LIST = "record_list"
+    READY = "ready"                    # team confirmed, fight button showing
+    CONFIRM = "confirm"                # second check mark of modes that confirm twice
+    CONFIRM_READY = "confirm_ready"    # second fight button
+    BATTLE = "battle"
+    WON = "won"
+    LOST = "lost"
+    FOLLOWUP = "followup"              # after a win, for modes that click on to the next battle
+    TRANSITION = "transition"
+
+
+# =============================================================================
+# Simulator
+# =============================================================================
+
+class GameSimulator:
+    """Simulated game client playing the screens of one automation mode."""
+
+    def __init__(
+        self,
+        flow: Flow,
+        language: str = "EN",
+        resolution: Tuple[int, int] = DEFAULT_RESOLUTION,
+        dpi_scale: float = 1.0,
+        battle_seconds: float = BATTLE_SECONDS,
+        win_rate: float = WIN_RATE,
+        transition_seconds: float = TRANSITION_SECONDS,
+        origin: Tuple[int, int] = (0, 0),
+        seed: Optional[int] = None,
+        stale_frames: int = STALE_FRAMES,
+    ):
+        """
+        Args:
+            flow: The mode whose screens are simulated.
+            language: Asset language the screens are rendered from.
+            resolution: Width and height of the simulated window.
+            dpi_scale: Size of the buttons relative to the template assets.
+            battle_seconds: Mean battle length.
+            win_rate: Probability of winning a battle.
+            transition_seconds: How long the screen stays blank after a click.
+            origin: Position of the window on the (virtual) screen.
+            seed: Seed of the battle outcomes and lengths; None for a random one.
+            stale_frames: Captures after a click that still show the screen before it.
+        """
+        self.flow = flow
+        self.language = language
+        self.resolution = resolution
+        self.dpi_scale = dpi_scale
+        self.battle_seconds = battle_seconds
+        self.win_rate = win_rate
+        self.transition_seconds = transition_seconds
+        self.stale_frames = stale_frames
+        self.region = CaptureRegion(origin[0], origin[1], resolution[0], resolution[1])
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._buttons = self._button_map(flow)
+        self._sprites: Dict[str, np.ndarray] = {}
+        self._frames: Dict[str, np.ndarray] = {}
+
+        self._screen = SimScreens.TEAM_SELECT
+        self._visible_at = 0.0
+        self._battle_ends = 0.0
+        self._page = 0
+        self._stale_screen = SimScreens.TEAM_SELECT
+        self._stale_left = 0
+        self.adopted = 0
+        self.captures = 0
+        self.clicks = 0
+        self.missed_clicks = 0
+        self.battles = 0
+        self.wins = 0
+
+    @staticmethod
+    def _button_map(flow: Flow) -> Dict[str, Dict[str, str]]:
+        """The buttons of every screen and the screen each one leads to, for a flow's win screen and steps."""
+        steps = {step.name: step for step in flow.steps}
+        battle = next(step for step in flow.steps if step.action == Actions.BATTLE_RESULT)
+        followup = steps.get("win_followup")
+        double_confirm = "confirm_check_mark" in steps
+        buttons = {
+            SimScreens.TEAM_SELECT: {Images.RECORD: SimScreens.RECORD_LIST, Images.CHECK_MARK: SimScreens.READY},
+            SimScreens.RECORD_LIST: {Images.NEXT: SimScreens.RECORD_LIST, Images.ADOPT_TEAM: SimScreens.TEAM_SELECT},
+            SimScreens.READY: {Images.FIGHT: SimScreens.CONFIRM if double_confirm else SimScreens.BATTLE},
+            SimScreens.CONFIRM: {Images.CHECK_MARK: SimScreens.CONFIRM_READY},
+            SimScreens.CONFIRM_READY: {Images.FIGHT: SimScreens.BATTLE},
+            SimScreens.BATTLE: {},
+            SimScreens.WON: {battle.templates[-1]: SimScreens.FOLLOWUP if followup else SimScreens.TEAM_SELECT},
+            SimScreens.LOST: {Images.FIGHT_AGAIN: SimScreens.TEAM_SELECT},
+            SimScreens.TRANSITION: {},
+        }
+        if followup is not None:
+            buttons[SimScreens.FOLLOWUP] = {followup.templates[0]: SimScreens.TEAM_SELECT}
+        return buttons
+
+    @property
+    def screen(self) -> str:
+        """The screen showing now (one of :class:`SimScreens`)."""
+        with self._lock:
+            return self._current(time.monotonic())
+
+    def capture(self, source: Optional[CaptureSource] = None) -> np.ndarray:
+        """
+        Take a screenshot of the simulated window.
+
+        Args:
+            source: Ignored; the simulator always shows its whole window.
+
+        Returns:
+            Grayscale image as numpy array.
+        """
+        with self._lock:
+            screen = self._current(time.monotonic())
+            if self._stale_left > 0:
+                self._stale_left -= 1
+                screen = self._stale_screen
+            self.captures += 1
+        # A copy, as a real capture is a new frame every time
+        return self._frame(screen).copy()
+
+    def click(self, x: int, y: int) -> bool:
+        """
+        Click a point on the (virtual) screen.
+
+        Args:
+            x: The x coordinate to click.
+            y: The y coordinate to click.
+
+        Returns:
+            True if the click hit a button of the screen showing.
+        """
+        x, y = x - self.region.left, y - self.region.top
+        with self._lock:
+            now = time.monotonic()
+            screen = self._current(now)
+            self.clicks += 1
+            for template, target in self._buttons[screen].items():
+                if self._hit(template, x, y):
+                    self._press(screen, template, target, now)
+                    return True
+            self.missed_clicks += 1
+        _log.debug("Simulated click at (%d, %d) hit no button on %s", x, y, screen)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts of captures, clicks and battles so far."""
+        with self._lock:
+            return {
+                "captures": self.captures,
+                "clicks": self.clicks,
+                "missed_clicks": self.missed_clicks,
+                "battles": self.battles,
+                "wins": self.wins,
+            }
+
+    # -------------------------------------------------------------------------
+    # State
+    # -------------------------------------------------------------------------
+
+    def _current(self, now: float) -> str:
+        """The screen showing at ``now``, ending the battle if it is over; call with the lock held."""
+        if self._screen == SimScreens.BATTLE and now >= self._battle_ends:
+            won = self._rng.random() < self.win_rate
+            self.battles += 1
+            self.wins += won
+            self._screen = SimScreens.WON if won else SimScreens.LOST
+            self._visible_at = self._battle_ends
+        return self._screen if now >= self._visible_at else SimScreens.TRANSITION
+
+    def _press(self, screen: str, template: str, target: str, now: float) -> None:
+        """Act on a button click; call with the lock held."""
+        if template == Images.NEXT:
+            # Paging shows the next record at once
+            self._page += 1
+            return
+        if template == Images.ADOPT_TEAM:
+            self.adopted = self._page
+            self._page = 0
+        self._stale_screen = screen
+        self._stale_left = self.stale_frames
+        self._screen = target
+        self._visible_at = now + self.transition_seconds
+        if target == SimScreens.BATTLE:
+            length = self._rng.gauss(self.battle_seconds, self.battle_seconds * BATTLE_SPREAD)
+            self._battle_ends = self._visible_at + max(0.0, length)
+        _log.debug("Simulator: %s clicked on %s, showing %s", template, screen, target)
+
+    def _hit(self, template: str, x: int, y: int) -> bool:
+        sprite = self._sprite(template)
+        cx, cy = self._center(template)
+        height, width = sprite.shape[:2]
+        return abs(x - cx) <= width / 2 and abs(y - cy) <= height / 2
+
+    def _center(self, template: str) -> Tuple[int, int]:
+        fx, fy = BUTTON_LAYOUT[template]
+        return int(fx * self.resolution[0]), int(fy * self.resolution[1])
+
+    # -------------------------------------------------------------------------
+    # Rendering
+    # -------------------------------------------------------------------------
+
+    def _sprite(self, template: str) -> np.ndarray:
+        """A template asset at the simulated DPI."""
+        sprite = self._sprites.get(template)
+        if sprite is None:
+            image = cv2.imread(get_template_path(self.language, template), 0)
+            if image is None:
+                raise FileNotFoundError(get_template_path(self.language, template))
+            if self.dpi_scale != 1.0:
+                interpolation = cv2.INTER_AREA if self.dpi_scale < 1.0 else cv2.INTER_LINEAR
+                image = cv2.resize(image, None, fx=self.dpi_scale, fy=self.dpi_scale, interpolation=interpolation)
+            sprite = self._sprites[template] = image
+        return sprite
+
+    def _frame(self, screen: str) -> np.ndarray:
+        """The rendered screen; rendered once and reused."""
+        frame = self._frames.get(screen)
+        if frame is not None:
+            return frame
+
+        # Smooth texture in place of the game's scenery, so frames have keypoints that match no button
+        if screen == SimScreens.TRANSITION:
+            frame = _texture(self.resolution, 3, 10, 40)
+        elif screen == SimScreens.BATTLE:
+            frame = _texture(self.resolution, 2, 30, 200)
+        elif screen == SimScreens.CONFIRM:
+            # A dialog over the dimmed fight screen, whose fight button still shows
+            frame = (self._frame(SimScreens.READY) * DIALOG_DIM).astype(np.uint8)
+        else:
+            frame = _texture(self.resolution, 1, 40, 160)
+        for template in self._buttons[screen]:
+            self._paste(frame, template)
+        self._frames[screen] = frame
+        return frame
+
+    def _paste(self, frame: np.ndarray, template: str) -> None:
+        sprite = self._sprite(template)
+        cx, cy = self._center(template)
+        height, width = sprite.shape[:2]
+        left, top = cx - width // 2, cy - height // 2
+        # Clip buttons that stick out of a small window
+        x0, y0 = max(0, left), max(0, top)
+        x1, y1 = min(frame.shape[1], left + width), min(frame.shape[0], top + height)
+        if x1 > x0 and y1 > y0:
+            frame[y0:y1, x0:x1] = sprite[y0 - top:y1 - top, x0 - left:x1 - left]
+
+
+def _texture(resolution: Tuple[int, int], seed: int, low: int, high: int) -> np.ndarray:
+    """A smooth random grayscale texture with values between low and high."""
+    width, height = resolution
+    rng = np.random.default_rng(seed)
+    coarse = rng.random((max(2, height // 32), max(2, width // 32)), dtype=np.float32)
+    smooth = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    return np.clip(low + smooth * (high - low), 0, 255).astype(np.uint8)
+
+
+# =============================================================================
+# Simulated Runs
+# =============================================================================
+
+def run_simulated(simulator: GameSimulator, max_rounds: Optional[int] = None,
+                  max_runtime: Optional[float] = None) -> FlowResult:
+    """
+    Play the simulator's mode against it until a limit is reached or a stop is requested.
+
+    The run gets its own session, so its known locations and UI scale start
+    fresh, and what it learns (transition timings, layout regions, team
+    results) is kept in memory instead of the real game's profile.
+
+    Args:
+        simulator: The simulated game.
+        max_rounds: Round limit; defaults to the mode's ``max_rounds``.
+        max_runtime: Seconds after which no new round is started.
+
+    Returns:
+        The run's outcome and throughput.
+    """
+    set_timing_model(TimingModel())
+    set_layout_model(LayoutModel())
+    session = AutomationSession(f"simulator-{simulator.flow.name}", language=simulator.language)
+    previous = get_game_backend()
+    set_game_backend(simulator)
+    try:
+        with session.activate():
+            return FlowEngine(simulator.flow, rotation=TeamRotation()).run(max_rounds, max_runtime)
+    finally:
+        set_game_backend(previous)
+
+
+def benchmark_flows(modes: Sequence[str], rounds: int = 10, **options: Any) -> List[Dict[str, Any]]:
+    """
+    Play modes against the simulator and measure their throughput.
+
+    Args:
+        modes: Mode names, e.g. ``autoFight``.
+        rounds: Rounds played per mode.
+        **options: Passed on to :class:`GameSimulator`.
+
+    Returns:
+        One dict per mode with its rounds, wins, battles per hour, mean
+        round time, the reason the run ended and the simulator's counts.
+    """
+    rows = []
+    for mode in modes:
+        simulator = GameSimulator(get_flow(mode), **options)
+        result = run_simulated(simulator, max_rounds=rounds)
+        rows.append({
+            "mode": mode,
+            "rounds": result.rounds,
+            "wins": result.wins,
+            "battles_per_hour": result.battles_per_hour,
+            "round_seconds": result.elapsed / result.rounds if result.rounds else 0.0,
+            "reason": result.reason,
+            **simulator.stats(),
+        })
+    return rows
+
+
+def format_benchmark(rows: List[Dict[str, Any]]) -> str:
+    """Render benchmark_flows results as a table."""
+    lines = [f"{'mode':<20}{'rounds':>8}{'won':>6}{'battles/h':>11}{'round':>9}{'captures':>10}{'missed':>8}  ended by"]
+    for row in rows:
+        lines.append(
+            f"{row['mode']:<20}{row['rounds']:>8}{row['wins']:>6}{row['battles_per_hour']:>11.1f}"
+            f"{row['round_seconds']:>8.2f}s{row['captures']:>10}{row['missed_clicks']:>8}  {row['reason']}"
+        )
+    return "\n".join(lines)
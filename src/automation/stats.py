@@ -0,0 +1,256 @@
+"""Persistent run statistics.
+
+Every round played by the flow engine is stored in a local SQLite database
+with its mode, language, team slot, outcome and how long each phase took.
+The report built from it answers the questions that matter for long runs:
+how many battles per hour, which team slots win, and where the wall-clock
+time goes.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .log import get_logger
+from .timing import DEFAULT_PROFILE_DIR, get_machine_id
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+class Phases:
+    """The phases a round's wall-clock time is split into."""
+    TEAM_SELECT = "team_select"
+    START = "start"
+    BATTLE = "battle"
+    RESULT = "result"
+
+    ALL = (TEAM_SELECT, START, BATTLE, RESULT)
+
+
+DEFAULT_STATS_PATH = os.path.join(DEFAULT_PROFILE_DIR, "stats.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    mode TEXT NOT NULL,
+    language TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    round_index INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    language TEXT NOT NULL,
+    team_index INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    team_select REAL NOT NULL DEFAULT 0,
+    start REAL NOT NULL DEFAULT 0,
+    battle REAL NOT NULL DEFAULT 0,
+    result REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS rounds_mode_time ON rounds(mode, started_at);
+"""
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class RunStatsStore:
+    """SQLite store of runs and their rounds."""
+
+    def __init__(self, path: str = DEFAULT_STATS_PATH):
+        """
+        Args:
+            path: Database file; created with its directory if missing.
+                ``:memory:`` keeps the statistics in memory.
+        """
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Rounds are written from the automation thread, reports read from any thread
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def begin_run(self, mode: str, language: str) -> int:
+        """
+        Register the start of a run.
+
+        Returns:
+            The run id to record its rounds under.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (mode, language, machine, started_at) VALUES (?, ?, ?, ?)",
+                (mode, language, get_machine_id(), time.time()),
+            )
+            return cursor.lastrowid
+
+    def end_run(self, run_id: int) -> None:
+        """Register the end of a run."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE runs SET ended_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def record_round(
+        self,
+        run_id: int,
+        round_index: int,
+        mode: str,
+        language: str,
+        team_index: int,
+        won: bool,
+        started_at: float,
+        duration: float,
+        phases: Dict[str, float],
+    ) -> None:
+        """
+        Store one finished round.
+
+        Args:
+            run_id: Id returned by :meth:`begin_run`.
+            round_index: Zero-based round number within the run.
+            mode: Flow name.
+            language: Asset language the round was played with.
+            team_index: Record slot the team was adopted from.
+            won: Whether the battle was won.
+            started_at: Unix time the round started.
+            duration: Wall-clock duration of the round in seconds.
+            phases: Seconds spent per :class:`Phases` value.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO rounds (run_id, round_index, mode, language, team_index, won, started_at, "
+                "duration, team_select, start, battle, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, round_index, mode, language, team_index, int(won), started_at, duration,
+                 *(phases.get(phase, 0.0) for phase in Phases.ALL)),
+            )
+
+    def summarize(self, mode: Optional[str] = None, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Aggregate the stored rounds per mode.
+
+        Args:
+            mode: Only include this mode.
+            since: Only include rounds started at or after this Unix time.
+
+        Returns:
+            One dict per mode with round and win counts, battles per hour,
+            per-team-slot win rates and the total seconds per phase.
+        """
+        where, params = ["1 = 1"], []
+        if mode is not None:
+            where.append("mode = ?")
+            params.append(mode)
+        if since is not None:
+            where.append("started_at >= ?")
+            params.append(since)
+        condition = " AND ".join(where)
+        phase_columns = ", ".join(f"SUM({phase}) AS {phase}" for phase in Phases.ALL)
+
+        with self._lock:
+            totals = self._conn.execute(
+                f"SELECT mode, COUNT(*) AS rounds, SUM(won) AS wins, SUM(duration) AS duration, "
+                f"{phase_columns} FROM rounds WHERE {condition} GROUP BY mode ORDER BY mode",
+                params,
+            ).fetchall()
+            slots = self._conn.execute(
+                f"SELECT mode, team_index, COUNT(*) AS rounds, SUM(won) AS wins "
+                f"FROM rounds WHERE {condition} GROUP BY mode, team_index ORDER BY mode, team_index",
+                params,
+            ).fetchall()
+
+        summaries = []
+        for row in totals:
+            duration = row["duration"] or 0.0
+            summaries.append({
+                "mode": row["mode"],
+                "rounds": row["rounds"],
+                "wins": row["wins"],
+                "win_rate": row["wins"] / row["rounds"],
+                "duration": duration,
+                "battles_per_hour": row["rounds"] * 3600 / duration if duration > 0 else 0.0,
+                "phases": {phase: row[phase] or 0.0 for phase in Phases.ALL},
+                "team_slots": [
+                    {"team_index": slot["team_index"], "rounds": slot["rounds"], "wins": slot["wins"],
+                     "win_rate": slot["wins"] / slot["rounds"]}
+                    for slot in slots if slot["mode"] == row["mode"]
+                ],
+            })
+        return summaries
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def format_report(summaries: List[Dict[str, Any]]) -> str:
+    """Render run summaries as plain text."""
+    if not summaries:
+        return "No rounds recorded."
+
+    lines = [f"{'mode':<20} {'rounds':>7} {'wins':>6} {'win rate':>9} {'battles/h':>10}"]
+    for s in summaries:
+        lines.append(
+            f"{s['mode']:<20} {s['rounds']:>7} {s['wins']:>6} {s['win_rate']:>8.1%} {s['battles_per_hour']:>10.1f}"
+        )
+
+    for s in summaries:
+        lines += ["", f"{s['mode']}: win rate per team slot"]
+        lines.append(f"  {'slot':>4} {'rounds':>7} {'wins':>6} {'win rate':>9}")
+        for slot in s["team_slots"]:
+            lines.append(
+                f"  {slot['team_index']:>4} {slot['rounds']:>7} {slot['wins']:>6} {slot['win_rate']:>8.1%}"
+            )
+
+        duration = s["duration"]
+        lines += ["", f"{s['mode']}: where the time goes ({duration / 3600:.2f}h total)"]
+        other = duration - sum(s["phases"].values())
+        for phase, seconds in list(s["phases"].items()) + [("other", other)]:
+            share = seconds / duration if duration > 0 else 0.0
+            lines.append(f"  {phase:<12} {share:>6.1%} {seconds / s['rounds']:>7.1f}s/round")
+    return "\n".join(lines)
+
+
+# =============================================================================
+# Global Store
+# =============================================================================
+
+_store: Optional[RunStatsStore] = None
+
+
+def enable_run_stats(path: str = DEFAULT_STATS_PATH) -> Optional[RunStatsStore]:
+    """Open the process-wide statistics store; None if the database cannot be opened."""
+    global _store
+    try:
+        _store = RunStatsStore(path)
+    except (OSError, sqlite3.Error) as e:
+        _log.warning("Run statistics disabled, could not open %s: %s", path, e)
+        _store = None
+    return _store
+
+
+def disable_run_stats() -> None:
+    """Close and remove the process-wide statistics store."""
+    global _store
+    if _store is not None:
+        _store.close()
+    _store = None
+
+
+def get_run_stats() -> Optional[RunStatsStore]:
+    """Get the installed statistics store, or None if statistics are off."""
+    return _store
@@ -0,0 +1,108 @@
+"""Shared registry of loaded templates and their cached features."""
+
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import cv2
+
+from .assets import get_template_path
+from .descriptors import DescriptorModes, fit_pca_basis, get_descriptor_mode, get_pca_basis
+from .image_matching import ImageFeatures, _get_detector
+from .metrics import Stages, timed
+from .warmup import template_names
+
+
+class TemplateRegistry:
+    """
+    Thread-safe cache of template images keyed by (language, file name).
+
+    Each template is read from disk once, and its SIFT/AKAZE features are
+    computed once on first use and then shared by every lookup and thread.
+    Templates keep their SIFT descriptors compactly when the descriptor mode
+    allows it (see :mod:`automation.descriptors`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates: Dict[Tuple[str, str], Optional[ImageFeatures]] = {}
+
+    def get(self, language: str, name: str) -> Optional[ImageFeatures]:
+        """
+        Get a template, loading it on first use.
+
+        Args:
+            language: Asset language (EN or CN).
+            name: Template file name, e.g. ``fight.png``.
+
+        Returns:
+            The template's ImageFeatures, or None if the file could not be read.
+        """
+        key = (language, name)
+        with self._lock:
+            if key in self._templates:
+                return self._templates[key]
+
+        with timed(Stages.TEMPLATE_LOAD):
+            image = cv2.imread(get_template_path(language, name), 0)
+        template = ImageFeatures(image, compact=True) if image is not None else None
+
+        with self._lock:
+            return self._templates.setdefault(key, template)
+
+    def warm(self, language: str, names: Iterable[str], detectors: Iterable[str] = ("sift",),
+             fit_pca: bool = False) -> None:
+        """
+        Load templates and compute their features ahead of the lookups that need them.
+
+        Args:
+            language: Asset language (EN or CN).
+            names: Template file names to load.
+            detectors: Feature types computed for each template.
+            fit_pca: Fit the PCA basis first, on every template of the language, when the
+                ``pca`` mode has none yet. Only startup sets this: the basis is installed
+                once per process, so fitting it on a few prefetched templates would fix a
+                poor basis for good.
+        """
+        names = list(names)
+        if (fit_pca and "sift" in detectors and get_descriptor_mode() == DescriptorModes.PCA
+                and get_pca_basis() is None):
+            self.fit_pca(language)
+        for name in names:
+            template = self.get(language, name)
+            if template is None:
+                continue
+            for kind in detectors:
+                template.akaze() if kind == "akaze" else template.sift()
+
+    def fit_pca(self, language: str, names: Optional[Iterable[str]] = None) -> None:
+        """Fit the PCA descriptor basis on the raw SIFT descriptors of the given templates (default: all)."""
+        sift = _get_detector("sift")
+        descriptors = []
+        for name in (template_names(language) if names is None else names):
+            template = self.get(language, name)
+            if template is not None:
+                descriptors.append(sift.detectAndCompute(template.image, None)[1])
+        fit_pca_basis(descriptors)
+
+    def descriptor_bytes(self) -> int:
+        """Memory held by the cached template descriptors."""
+        with self._lock:
+            templates = [t for t in self._templates.values() if t is not None]
+        return sum(t.nbytes() for t in templates)
+
+    def clear(self) -> None:
+        """Drop all cached templates and features."""
+        with self._lock:
+            self._templates.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._templates)
+
+
+_registry = TemplateRegistry()
+
+
+def get_template_registry() -> TemplateRegistry:
+    """Get the process-wide template registry."""
+    return _registry
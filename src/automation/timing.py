@@ -0,0 +1,352 @@
+"""Adaptive timing model that learns UI transition latencies per machine.
+
+Each transition (e.g. clicking the record button until the record list shows)
+keeps an exponentially weighted mean and variance of the observed latency.
+Waits are then scheduled from the learned distribution instead of fixed
+constants: the first poll is delayed until the transition is likely to have
+finished, and the timeout is set from a high quantile. A missed step widens
+the timeout with an exponential backoff that decays again on success.
+
+Battles are scheduled the same way from their learned length per mode and
+team (:class:`BattleSchedule`): result polls are sparse early in the fight
+and dense around its expected end.
+
+Estimates are saved per machine, so a fast PC and a slow laptop sharing a
+profile directory each keep their own timings.
+"""
+
+import atexit
+import json
+import math
+import os
+import platform
+import re
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from .log import get_logger
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+EWMA_ALPHA = 0.2
+MIN_SAMPLES = 5
+HIGH_QUANTILE_Z = 2.33   # ~99th percentile of a normal distribution
+LOW_QUANTILE_Z = 1.64    # ~5th percentile (mean - z * std)
+SAFETY_FACTOR = 1.25
+MIN_TIMEOUT = 1.0
+MAX_BACKOFF = 8.0
+SAVE_EVERY = 20
+
+# Battle result polling (see BattleSchedule)
+SPARSE_POLL_FACTOR = 4   # early in a battle, poll at most this many base intervals apart
+DENSE_POLLS = 10         # polls spread over the window a battle is expected to end in
+MIN_POLL_INTERVAL = 0.5
+MIN_BATTLE_SPREAD = 1.0  # seconds; floor of the spread, so a steady team still gets a window
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".afk_journey_automation")
+
+
+def get_machine_id() -> str:
+    """A filesystem-safe identifier for the current machine."""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", platform.node() or "default")
+
+
+# =============================================================================
+# Estimates
+# =============================================================================
+
+class TransitionEstimate:
+    """EWMA latency estimate and miss backoff for one transition."""
+
+    __slots__ = ("mean", "variance", "count", "backoff")
+
+    def __init__(self, mean: float = 0.0, variance: float = 0.0, count: int = 0, backoff: float = 1.0):
+        self.mean = mean
+        self.variance = variance
+        self.count = count
+        self.backoff = backoff
+
+    def observe(self, seconds: float) -> None:
+        """Fold in an observed latency and relax the backoff."""
+        if self.count == 0:
+            self.mean = seconds
+            self.variance = 0.0
+        else:
+            delta = seconds - self.mean
+            self.mean += EWMA_ALPHA * delta
+            self.variance = (1 - EWMA_ALPHA) * (self.variance + EWMA_ALPHA * delta * delta)
+        self.count += 1
+        self.backoff = max(1.0, self.backoff / 2)
+
+    def miss(self) -> None:
+        """Widen future timeouts after the expected screen did not appear."""
+        self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def high(self) -> float:
+        """Estimated high quantile of the latency."""
+        return self.mean + HIGH_QUANTILE_Z * self.std
+
+    @property
+    def low(self) -> float:
+        """Estimated low quantile of the latency."""
+        return max(0.0, self.mean - LOW_QUANTILE_Z * self.std)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"mean": self.mean, "variance": self.variance, "count": self.count, "backoff": self.backoff}
+
+
+# =============================================================================
+# Model
+# =============================================================================
+
+class TimingModel:
+    """Per-machine collection of transition latency estimates."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON file the estimates are loaded from and saved to; None keeps them in memory.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._estimates: Dict[str, TransitionEstimate] = {}
+        self._unsaved = 0
+        if path:
+            self._load()
+
+    def _estimate(self, transition: str) -> TransitionEstimate:
+        estimate = self._estimates.get(transition)
+        if estimate is None:
+            estimate = self._estimates[transition] = TransitionEstimate()
+        return estimate
+
+    def timeout_for(self, transition: str, default: float, shrink: bool = True) -> float:
+        """
+        How long to wait for a transition before counting it as missed.
+
+        Args:
+            transition: Transition name.
+            default: The fixed timeout used until enough samples are collected.
+            shrink: Whether the learned timeout may be shorter than the default.
+
+        Returns:
+            Timeout in seconds.
+        """
+        with self._lock:
+            estimate = self._estimate(transition)
+            if estimate.count < MIN_SAMPLES:
+                return default * estimate.backoff
+            learned = max(MIN_TIMEOUT, estimate.high * SAFETY_FACTOR)
+            if not shrink:
+                learned = max(learned, default)
+            return min(learned * estimate.backoff, default * MAX_BACKOFF)
+
+    def first_poll_delay(self, transition: str) -> float:
+        """How long to wait before the first poll, since the screen is unlikely to be ready earlier."""
+        with self._lock:
+            estimate = self._estimate(transition)
+            if estimate.count < MIN_SAMPLES or estimate.backoff > 1.0:
+                return 0.0
+            return estimate.low
+
+    def learned(self, transitions: Sequence[str]) -> Optional[Tuple[float, float]]:
+        """
+        The learned latency of the first transition that has a settled estimate.
+
+        Args:
+            transitions: Transition names, most specific first.
+
+        Returns:
+            ``(mean, std)`` in seconds, or None while none has enough samples
+            or each is backing off after a miss.
+        """
+        with self._lock:
+            for transition in transitions:
+                estimate = self._estimates.get(transition)
+                if estimate is not None and estimate.count >= MIN_SAMPLES and estimate.backoff <= 1.0:
+                    return estimate.mean, estimate.std
+        return None
+
+    def observe(self, transition: str, seconds: float) -> None:
+        """Record how long a transition took."""
+        with self._lock:
+            self._estimate(transition).observe(seconds)
+            self._unsaved += 1
+            save = self._unsaved >= SAVE_EVERY
+        if save:
+            self.save()
+
+    def miss(self, transition: str) -> None:
+        """Record that a transition did not complete within its timeout."""
+        with self._lock:
+            estimate = self._estimate(transition)
+            estimate.miss()
+            backoff = estimate.backoff
+        _log.debug("Transition %s missed, backoff now x%.0f", transition, backoff)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Current estimates with their learned quantiles."""
+        with self._lock:
+            return {
+                name: {**estimate.to_dict(), "low": estimate.low, "high": estimate.high}
+                for name, estimate in self._estimates.items()
+            }
+
+    def save(self) -> None:
+        """Write the estimates to the model's file, if it has one."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "machine": get_machine_id(),
+                "transitions": {name: e.to_dict() for name, e in self._estimates.items()},
+            }
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            _log.warning("Could not save timing model: %s", e)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            _log.warning("Could not load timing model %s: %s", self.path, e)
+            return
+
+        for name, values in data.get("transitions", {}).items():
+            self._estimates[name] = TransitionEstimate(
+                mean=float(values.get("mean", 0.0)),
+                variance=float(values.get("variance", 0.0)),
+                count=int(values.get("count", 0)),
+                backoff=float(values.get("backoff", 1.0)),
+            )
+        _log.debug("Loaded timing model for %d transitions from %s", len(self._estimates), self.path)
+
+
+# =============================================================================
+# Battle Schedule
+# =============================================================================
+
+def battle_transitions(transition: str, mode: str, team: int) -> Tuple[str, str]:
+    """Names a battle's length is learned under: its mode and team, then the mode alone."""
+    return f"{transition}/{mode}/team{team}", f"{transition}/{mode}"
+
+
+class BattleSchedule:
+    """
+    When to poll for the result of one battle.
+
+    Battle length depends on the mode and the team fighting, so it is learned
+    per mode and team, falling back to the mode alone until the team has
+    enough samples. Polls are rare until the battle is likely to end (a low
+    quantile of the learned length), dense across the window it usually ends
+    in, and at the base interval once it runs longer than that. Without a
+    learned length, every poll is the base interval apart.
+    """
+
+    def __init__(self, model: TimingModel, transition: str, mode: str, team: int,
+                 timeout: float, interval: float):
+        """
+        Args:
+            model: Timing model the battle lengths are learned in.
+            transition: Base transition name of the battle (fight -> result).
+            mode: Mode name the battle is fought in.
+            team: Index of the team fighting it.
+            timeout: Fixed timeout used until the team's length is learned.
+            interval: Base poll interval in seconds.
+        """
+        self.model = model
+        self.transitions = battle_transitions(transition, mode, team)
+        self.interval = interval
+        # Battle length depends on the team, never cut it short
+        self.timeout = model.timeout_for(self.transitions[0], timeout, shrink=False)
+        self.window: Optional[Tuple[float, float]] = None
+        self.dense_interval = interval
+
+        learned = model.learned(self.transitions)
+        if learned is not None:
+            mean, std = learned
+            spread = max(std, MIN_BATTLE_SPREAD)
+            self.window = (max(0.0, mean - LOW_QUANTILE_Z * spread), mean + HIGH_QUANTILE_Z * spread)
+            width = self.window[1] - self.window[0]
+            self.dense_interval = min(interval, max(MIN_POLL_INTERVAL, width / DENSE_POLLS))
+
+    def first_delay(self) -> float:
+        """Seconds from the fight click to the first poll."""
+        if self.window is None:
+            return 0.0
+        return min(self.window[0], self.interval * SPARSE_POLL_FACTOR)
+
+    def next_delay(self, elapsed: float) -> float:
+        """Seconds from a poll that missed, ``elapsed`` seconds into the battle, to the next one."""
+        if self.window is None:
+            return self.interval
+        start, end = self.window
+        if elapsed < start:
+            # Land the next poll on the window's start, but never leave a long gap
+            return min(self.interval * SPARSE_POLL_FACTOR, max(self.dense_interval, start - elapsed))
+        if elapsed < end:
+            return self.dense_interval
+        return self.interval
+
+    def observe(self, elapsed: float, previous: Optional[float]) -> None:
+        """
+        Learn from a battle whose result was seen ``elapsed`` seconds in.
+
+        Args:
+            elapsed: Seconds from the fight click to the poll that saw the result.
+            previous: Seconds to the poll before it, if any; the battle ended
+                in between, so the middle of the two is recorded.
+        """
+        seconds = elapsed if previous is None else (previous + elapsed) / 2
+        for transition in self.transitions:
+            self.model.observe(transition, seconds)
+
+    def miss(self) -> None:
+        """Record that no result was seen within the timeout."""
+        self.model.miss(self.transitions[0])
+
+
+# =============================================================================
+# Global Model
+# =============================================================================
+
+def default_model_path() -> str:
+    """Path of this machine's timing profile."""
+    return os.path.join(DEFAULT_PROFILE_DIR, f"timing_{get_machine_id()}.json")
+
+
+_model: Optional[TimingModel] = None
+
+
+def get_timing_model() -> TimingModel:
+    """Get the process-wide timing model, loading this machine's profile on first use."""
+    global _model
+    if _model is None:
+        _model = TimingModel(default_model_path())
+        atexit.register(_model.save)
+    return _model
+
+
+def set_timing_model(model: TimingModel) -> None:
+    """Replace the process-wide timing model (e.g. an in-memory one for benchmarks)."""
+    global _model
+    _model = model
@@ -0,0 +1,318 @@
+"""Geometric verification of feature matches.
+
+After SIFT/AKAZE matching, the matched keypoints must agree on one
+transform from the template into the frame. This module fits that
+transform with a selectable estimator:
+
+- ``ransac``: OpenCV RANSAC, a partial affine for few matches and a
+  homography otherwise (the original behaviour).
+- ``magsac``: OpenCV's USAC/MAGSAC++ homography, more robust to outliers at
+  a similar cost; falls back to RANSAC where unsupported.
+- ``scale_translation``: a three-parameter model (uniform scale plus
+  translation) that fits UI buttons, which are never rotated or skewed.
+
+Every estimator runs with a capped number of iterations, so the cost of a
+verification is bounded. Before estimating, the transform found for the
+same template on the previous frame is tried as a hypothesis: buttons rarely
+move between polls, and checking a known transform costs one pass over the
+matches.
+"""
+
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .log import get_logger
+
+_log = get_logger(__name__)
+
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+class Estimators:
+    """Names of the available transform estimators."""
+    RANSAC = "ransac"
+    MAGSAC = "magsac"
+    SCALE_TRANSLATION = "scale_translation"
+    ALL = (RANSAC, MAGSAC, SCALE_TRANSLATION)
+
+
+REPROJ_THRESHOLD = 5.0      # pixels a match may be off the transform and still count as an inlier
+MAX_ITERS = 500             # cap on estimator iterations per verification
+CONFIDENCE = 0.995          # RANSAC stops early once this sure of the best model
+HOMOGRAPHY_MIN_MATCHES = 8  # below this a homography is unreliable, so a partial affine is fitted
+
+# MAGSAC++ needs OpenCV 4.5+
+_USAC_MAGSAC: Optional[int] = getattr(cv2, "USAC_MAGSAC", None)
+
+Transform = np.ndarray      # 3x3 matrix mapping template points into the frame
+
+
+# =============================================================================
+# Estimators
+# =============================================================================
+
+def _as_3x3(matrix: np.ndarray) -> Transform:
+    """Promote a 2x3 affine matrix to 3x3."""
+    if matrix.shape == (3, 3):
+        return matrix
+    return np.vstack([matrix, [0.0, 0.0, 1.0]])
+
+
+def _estimate_opencv(src: np.ndarray, dst: np.ndarray, method: int,
+                     max_iters: int) -> Tuple[Optional[Transform], Optional[np.ndarray]]:
+    if len(src) < HOMOGRAPHY_MIN_MATCHES:
+        # Partial affine (4 DOF) needs only 3 points; USAC is not available for it
+        matrix, mask = cv2.estimateAffinePartial2D(src, dst, method=cv2.RANSAC,
+                                                   ransacReprojThreshold=REPROJ_THRESHOLD,
+                                                   maxIters=max_iters, confidence=CONFIDENCE)
+    else:
+        matrix, mask = cv2.findHomography(src, dst, method, REPROJ_THRESHOLD,
+                                          maxIters=max_iters, confidence=CONFIDENCE)
+    if matrix is None or mask is None:
+        return None, None
+    return _as_3x3(matrix), mask.ravel().astype(bool)
+
+
+def _fit_scale_translation(src: np.ndarray, dst: np.ndarray) -> Tuple[float, np.ndarray]:
+    """Least-squares uniform scale and translation mapping src onto dst."""
+    src_mean, dst_mean = src.mean(axis=0), dst.mean(axis=0)
+    src_c, dst_c = src - src_mean, dst - dst_mean
+    denom = float(np.sum(src_c * src_c))
+    scale = float(np.sum(src_c * dst_c)) / denom if denom > 1e-9 else 1.0
+    return scale, dst_mean - scale * src_mean
+
+
+def _scale_translation_matrix(scale: float, translation: np.ndarray) -> Transform:
+    return np.array([[scale, 0.0, translation[0]],
+                     [0.0, scale, translation[1]],
+                     [0.0, 0.0, 1.0]])
+
+
+def _estimate_scale_translation(src: np.ndarray, dst: np.ndarray,
+                                max_iters: int) -> Tuple[Optional[Transform], Optional[np.ndarray]]:
+    """RANSAC over two-point samples of a scale + translation model, then a least-squares refit."""
+    src, dst = src.reshape(-1, 2), dst.reshape(-1, 2)
+    n = len(src)
+    if n < 2:
+        return None, None
+
+    rng = np.random.default_rng(n)
+    best_mask, best_count = None, 0
+    needed = max_iters
+    iteration = 0
+    while iteration < min(max_iters, needed):
+        iteration += 1
+        i, j = rng.choice(n, 2, replace=False)
+        src_span = np.linalg.norm(src[i] - src[j])
+        if src_span < 1e-6:
+            continue
+        scale = np.linalg.norm(dst[i] - dst[j]) / src_span
+        translation = dst[i] - scale * src[i]
+        mask = np.linalg.norm(dst - (scale * src + translation), axis=1) < REPROJ_THRESHOLD
+        count = int(mask.sum())
+        if count > best_count:
+            best_mask, best_count = mask, count
+            if count == n:
+                break
+            # Standard adaptive stopping: samples needed to draw two inliers with CONFIDENCE
+            inlier_share = count / n
+            needed = int(np.ceil(np.log(1 - CONFIDENCE) / np.log(max(1e-12, 1 - inlier_share ** 2))))
+
+    if best_mask is None or best_count < 2:
+        return None, None
+    scale, translation = _fit_scale_translation(src[best_mask], dst[best_mask])
+    matrix = _scale_translation_matrix(scale, translation)
+    return matrix, _inlier_mask(matrix, src, dst)
+
+
+def estimate_transform(
+    src: np.ndarray,
+    dst: np.ndarray,
+    estimator: Optional[str] = None,
+    max_iters: int = MAX_ITERS
+) -> Tuple[Optional[Transform], Optional[np.ndarray]]:
+    """
+    Fit a transform from template points to frame points.
+
+    Args:
+        src: Template points, shape (N, 1, 2) float32.
+        dst: Frame points, same shape.
+        estimator: One of :class:`Estimators`; None uses the configured default.
+        max_iters: Iteration cap of the robust estimator.
+
+    Returns:
+        ``(transform, inlier_mask)``, or ``(None, None)`` if no model was found.
+    """
+    estimator = estimator or _estimator
+    if estimator == Estimators.SCALE_TRANSLATION:
+        return _estimate_scale_translation(src, dst, max_iters)
+    if estimator == Estimators.MAGSAC and _USAC_MAGSAC is not None:
+        return _estimate_opencv(src, dst, _USAC_MAGSAC, max_iters)
+    return _estimate_opencv(src, dst, cv2.RANSAC, max_iters)
+
+
+def _inlier_mask(transform: Transform, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Which matches the transform maps to within REPROJ_THRESHOLD of their frame point."""
+    projected = cv2.perspectiveTransform(src.reshape(-1, 1, 2).astype(np.float32), transform)
+    return np.linalg.norm(projected.reshape(-1, 2) - dst.reshape(-1, 2), axis=1) < REPROJ_THRESHOLD
+
+
+# =============================================================================
+# Transform Reuse
+# =============================================================================
+
+# Last accepted transform per template, dropped with the template
+_last_transforms: "weakref.WeakKeyDictionary[Any, Transform]" = weakref.WeakKeyDictionary()
+_last_lock = threading.Lock()
+
+
+def verify_matches(
+    key: Any,
+    src: np.ndarray,
+    dst: np.ndarray,
+    min_inlier_ratio: float,
+    estimator: Optional[str] = None
+) -> Tuple[Optional[Transform], Optional[np.ndarray], str]:
+    """
+    Find the transform behind a set of matches, trying the previous one first.
+
+    Args:
+        key: The template (any weak-referenceable object identifying it).
+        src: Template points, shape (N, 1, 2) float32.
+        dst: Frame points, same shape.
+        min_inlier_ratio: Share of matches the previous transform must explain to be reused.
+        estimator: Estimator used when the previous transform does not fit.
+
+    Returns:
+        ``(transform, inlier_mask, source)``, where source is ``hypothesis``
+        or the estimator's name; transform is None if nothing fits.
+    """
+    with _last_lock:
+        previous = _last_transforms.get(key)
+    if previous is not None:
+        mask = _inlier_mask(previous, src, dst)
+        if mask.mean() >= min_inlier_ratio:
+            return previous, mask, "hypothesis"
+
+    estimator = estimator or _estimator
+    transform, mask = estimate_transform(src, dst, estimator)
+    return transform, mask, estimator
+
+
+def remember_transform(key: Any, transform: Transform) -> None:
+    """Keep an accepted transform as the next lookup's hypothesis for the same template."""
+    try:
+        with _last_lock:
+            _last_transforms[key] = transform
+    except TypeError:
+        pass  # key cannot be weakly referenced; nothing to reuse
+
+
+def forget_transforms() -> None:
+    """Drop every remembered transform (e.g. after the game window changed size)."""
+    with _last_lock:
+        _last_transforms.clear()
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+_estimator = Estimators.RANSAC
+
+
+def set_verification_estimator(name: str) -> None:
+    """Select the estimator used for geometric verification (one of :class:`Estimators`)."""
+    global _estimator
+    if name not in Estimators.ALL:
+        raise ValueError(f"Unknown estimator: {name}. Must be one of {', '.join(Estimators.ALL)}")
+    if name == Estimators.MAGSAC and _USAC_MAGSAC is None:
+        _log.warning("This OpenCV build has no USAC/MAGSAC; RANSAC is used instead")
+    _estimator = name
+
+
+def get_verification_estimator() -> str:
+    """Get the estimator used for geometric verification."""
+    return _estimator
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def _synthetic_matches(count: int, inlier_ratio: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """Matches of a 200x80 button shown at 1.3x scale, with the given share of outliers."""
+    src = rng.uniform((0, 0), (200, 80), size=(count, 2))
+    dst = src * 1.3 + (850, 610) + rng.normal(0, 0.7, size=(count, 2))
+    outliers = rng.random(count) >= inlier_ratio
+    dst[outliers] = rng.uniform((0, 0), (1920, 1080), size=(int(outliers.sum()), 2))
+    return src.reshape(-1, 1, 2).astype(np.float32), dst.reshape(-1, 1, 2).astype(np.float32)
+
+
+def benchmark_estimators(
+    match_counts: Sequence[int] = (6, 12, 25, 50, 100, 200),
+    inlier_ratios: Sequence[float] = (0.9, 0.6, 0.4),
+    repeat: int = 50,
+    estimators: Sequence[str] = Estimators.ALL
+) -> List[Dict[str, Any]]:
+    """
+    Time every estimator on synthetic matches, plus reuse of a known transform.
+
+    Args:
+        match_counts: Numbers of matches to verify.
+        inlier_ratios: Shares of correct matches.
+        repeat: Verifications per cell; the median and worst case are reported.
+        estimators: Estimators to time.
+
+    Returns:
+        One dict per (estimator, matches, inlier ratio) with median and
+        maximum milliseconds and the share of runs that found the transform.
+    """
+    rng = np.random.default_rng(0)
+    expected = _scale_translation_matrix(1.3, np.array([850.0, 610.0]))
+    rows = []
+    for count in match_counts:
+        for ratio in inlier_ratios:
+            samples = [_synthetic_matches(count, ratio, rng) for _ in range(repeat)]
+            for name in tuple(estimators) + ("hypothesis",):
+                times, found = [], 0
+                for src, dst in samples:
+                    start = time.perf_counter()
+                    if name == "hypothesis":
+                        # Reused when it explains as many matches as findMatchings requires at least
+                        mask = _inlier_mask(expected, src, dst)
+                        transform = expected if mask.mean() >= 0.6 else None
+                    else:
+                        transform, mask = estimate_transform(src, dst, name)
+                    times.append(time.perf_counter() - start)
+                    if transform is not None and np.allclose(
+                            cv2.perspectiveTransform(np.float32([[[100, 40]]]), transform),
+                            [[[980, 662]]], atol=REPROJ_THRESHOLD):
+                        found += 1
+                rows.append({
+                    "estimator": name,
+                    "matches": count,
+                    "inlier_ratio": ratio,
+                    "median_ms": float(np.median(times)) * 1000,
+                    "max_ms": max(times) * 1000,
+                    "found": found / repeat,
+                })
+    return rows
+
+
+def format_benchmark(rows: List[Dict[str, Any]]) -> str:
+    """Render benchmark_estimators results as a table."""
+    lines = [f"{'estimator':<20}{'matches':>8}{'inliers':>9}{'median':>10}{'max':>10}{'found':>8}"]
+    for row in rows:
+        lines.append(
+            f"{row['estimator']:<20}{row['matches']:>8}{row['inlier_ratio']:>9.0%}"
+            f"{row['median_ms']:>8.3f}ms{row['max_ms']:>8.3f}ms{row['found']:>8.0%}"
+        )
+    return "\n".join(lines)
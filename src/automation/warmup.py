@@ -0,0 +1,149 @@
+"""Background warm-up of the heavy parts of the automation.
+
+Importing OpenCV, numpy, mss and pywinauto and computing every template's
+keypoints (which also runs OpenCV's one-time lazy initialisation) takes
+seconds on a cold start. The
+GUI starts a :class:`Warmup` as soon as its window is up, so this happens
+while the user picks a language and mode instead of on the first click.
+Every stage is optional: whatever the warm-up has not finished yet is simply
+done on first use, as before.
+
+Feature detectors are not warmed: they are cached per thread (see
+:mod:`automation.image_matching`), so any built here would die with the
+warm-up thread.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from .assets import ASSETS_DIR
+from .log import get_logger
+
+_log = get_logger(__name__)
+
+
+class WarmupStages:
+    """Names of the timed warm-up stages."""
+    IMPORTS = "imports"        # OpenCV, numpy, mss, pywinauto and the automation modules
+    TEMPLATES = "templates"    # template loading and feature extraction
+    ALL = (IMPORTS, TEMPLATES)
+
+
+def template_names(language: str) -> List[str]:
+    """File names of every template shipped for a language."""
+    try:
+        return sorted(name for name in os.listdir(os.path.join(ASSETS_DIR, language))
+                      if name.lower().endswith(".png"))
+    except OSError:
+        return []
+
+
+class Warmup:
+    """Loads modules and template features on a background thread."""
+
+    def __init__(self, language: str, detectors: Sequence[str] = ("sift", "akaze")):
+        """
+        Args:
+            language: Asset language whose templates are prepared.
+            detectors: Feature types computed for every template.
+        """
+        self.language = language
+        self.detectors = tuple(detectors)
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[BaseException] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start = 0.0
+
+    def start(self) -> "Warmup":
+        """Start warming up in the background; returns self."""
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=f"warmup-{self.language}", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds the warm-up took (so far, while it is still running)."""
+        return sum(self.timings.values()) if self.done else time.perf_counter() - self._start
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the warm-up to finish; returns whether it did."""
+        return self._done.wait(timeout)
+
+    def _run(self) -> None:
+        try:
+            with self._stage(WarmupStages.IMPORTS):
+                from . import flows, game_automation  # noqa: F401 (imported for their side effects)
+                from .templates import get_template_registry
+
+            with self._stage(WarmupStages.TEMPLATES):
+                names = template_names(self.language)
+                get_template_registry().warm(self.language, names, self.detectors, fit_pca=True)
+        except Exception as e:
+            # Nothing is lost: whatever is not warm yet is prepared on first use
+            self.error = e
+            _log.warning("Warm-up failed: %s", e)
+        finally:
+            self._done.set()
+
+        _log.debug("Warm-up for %s finished in %.2fs (%s)", self.language, self.elapsed,
+                   ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.timings.items()))
+
+    def _stage(self, name: str) -> "_StageClock":
+        return _StageClock(self.timings, name)
+
+
+class _StageClock:
+    """Context manager that stores the duration of one warm-up stage."""
+
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: Dict[str, float], name: str):
+        self.timings = timings
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "_StageClock":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.timings[self.name] = time.perf_counter() - self.start
+
+
+# =============================================================================
+# Global State
+# =============================================================================
+
+_warmups: Dict[str, Warmup] = {}
+_lock = threading.Lock()
+
+
+def start_warmup(language: str) -> Warmup:
+    """
+    Start warming up for a language, unless that is already done or under way.
+
+    Args:
+        language: Asset language (EN or CN).
+
+    Returns:
+        The language's warm-up.
+    """
+    with _lock:
+        warmup = _warmups.get(language)
+        if warmup is None or warmup.error is not None:
+            warmup = _warmups[language] = Warmup(language).start()
+        return warmup
+
+
+def get_warmup(language: str) -> Optional[Warmup]:
+    """Get the warm-up started for a language, if any."""
+    with _lock:
+        return _warmups.get(language)
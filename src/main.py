@@ -1,25 +1,35 @@
 """AFK Journey Automation - Main GUI Application."""
 
+import time
+
+# Taken first, so the startup benchmark can tell how long the imports below take
+_MAIN_STARTED = time.perf_counter()
+
 import argparse
+import multiprocessing
 import os
+import re
+import signal
+import statistics
+import subprocess
 import sys
 import threading
-from tkinter import Tk, Button, Label, StringVar, OptionMenu, Frame
-
-from PIL import Image, ImageTk, ImageDraw
-
-from automation.game_automation import (
-    autoFight,
-    autoPFightFriends,
-    autoFightFriends,
-    autoPFight,
-    FactionChallenge,
-    set_stop_flag,
-    stop_automation,
-)
-from automation.click_simulation import set_language, set_debug_mode
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple
+
+# Only light modules are imported here: OpenCV, numpy, mss and pywinauto are
+# loaded by the warm-up thread (GUI) or on first use (command line tools)
+from automation.executor import AutomationExecutor, ExecutorStatus, JobStates
+from automation.log import configure_logging, flush_logging, get_logger
+from automation.metrics import DEFAULT_EXPORT_INTERVAL, start_metrics
+from automation.flight_recorder import DEFAULT_FRAME_CAPACITY, enable_flight_recorder
+from automation.stats import DEFAULT_STATS_PATH, enable_run_stats
+from automation.warmup import start_warmup
 from utils.admin import is_admin, request_admin
 
+# Tk and PIL are only needed by the GUI, so headless runs never load them
+if TYPE_CHECKING:
+    from tkinter import Button, Frame, Tk
+
 
 # =============================================================================
 # Constants
@@ -27,6 +37,8 @@ from utils.admin import is_admin, request_admin
 
 VERSION = "1.0"
 
+_log = get_logger("main")
+
 
 def get_base_path() -> str:
     """Get the base path, works both in dev and when packaged with PyInstaller."""
@@ -61,70 +73,118 @@ BUTTON_WIDTH = 28
 
 
 # =============================================================================
-# Threading Utilities
+# Automation Executor
 # =============================================================================
 
 # Global flag to stop execution
 stop_flag = threading.Event()
-set_stop_flag(stop_flag)
 
+# Language picked in the GUI, applied by the automation thread
+selected_language = "EN"
+
+# How often the GUI refreshes the automation status
+STATUS_INTERVAL_MS = 250
 
-def run_in_thread(func):
-    """Decorator to run a function in a separate thread to prevent GUI freezing."""
-    def wrapper():
-        stop_flag.clear()
-        thread = threading.Thread(target=func, daemon=True)
-        thread.start()
-    return wrapper
+# Seconds to wait for a running mode to stop when the window is closed
+SHUTDOWN_TIMEOUT = 3.0
+
+
+def _stop_running() -> None:
+    """Stop the running mode (it has imported the automation already)."""
+    from automation.game_automation import stop_automation
+    
+    stop_automation()
+
+
+# One worker runs one mode at a time; a new button press replaces the running mode
+executor = AutomationExecutor(stop_flag, stop=_stop_running)
 
 
 # =============================================================================
 # Automation Wrappers
 # =============================================================================
 
-@run_in_thread
+# Modes runnable from the command line, by name
+MODES = ("autoFight", "autoPFight", "autoFightFriends", "autoPFightFriends", "FactionChallenge")
+
+
+def get_mode(name: str) -> Callable:
+    """Get a mode's function, importing the automation on first use."""
+    from automation import game_automation
+    
+    return getattr(game_automation, name)
+
+
+def _run_mode(name: str):
+    """Executor job: finish importing the automation (if the warm-up has not), then run a mode."""
+    from automation.click_simulation import set_language
+    from automation.game_automation import set_stop_flag
+    
+    set_stop_flag(stop_flag)
+    set_language(selected_language)
+    return get_mode(name)()
+
+
+def run_mode(name: str) -> None:
+    """Run a mode on the automation executor, stopping the mode running before it."""
+    executor.submit(name, lambda: _run_mode(name))
+
+
 def run_autoFight():
-    autoFight()
+    run_mode("autoFight")
 
 
-@run_in_thread
 def run_autoPFightFriends():
-    autoPFightFriends()
+    run_mode("autoPFightFriends")
 
 
-@run_in_thread
 def run_autoFightFriends():
-    autoFightFriends()
+    run_mode("autoFightFriends")
 
 
-@run_in_thread
 def run_autoPFight():
-    autoPFight()
+    run_mode("autoPFight")
 
 
-@run_in_thread
 def run_FactionChallenge():
-    FactionChallenge()
+    run_mode("FactionChallenge")
 
 
 def change_language(lang: str) -> None:
-    """Change the language for asset loading."""
-    set_language(lang)
-    print(f"Language set to {lang}")
+    """Change the language for asset loading and warm up its templates."""
+    global selected_language
+    selected_language = lang
+    start_warmup(lang)
+    _log.info("Language set to %s", lang)
 
 
 def stop_execution() -> None:
     """Stop all running automation."""
-    stop_automation()
-    print("Automation stopped.")
+    executor.cancel()
+    _log.info("Automation stopped.")
+
+
+def describe_status(status: ExecutorStatus) -> str:
+    """One line for the GUI status label."""
+    if status.state == JobStates.RUNNING:
+        return f"Running {status.job} ({status.running_for / 60:.0f} min)"
+    if status.state == JobStates.STOPPING:
+        return f"Stopping {status.job}..."
+    if status.last_error is not None:
+        return f"{status.last_job} failed: {status.last_error}"
+    if status.last_result is not None and hasattr(status.last_result, "summary"):
+        return status.last_result.summary()
+    return "Idle"
 
 
 # =============================================================================
 # GUI Components
 # =============================================================================
 
-def create_button(parent: Frame, text: str, command, color: str) -> Button:
+def create_button(parent: "Frame", text: str, command, color: str) -> "Button":
     """Create a styled button with hover effects."""
+    from tkinter import Button
+    
     btn = Button(
         parent,
         text=text,
@@ -159,6 +219,8 @@ def create_round_avatar(path: str, size: int = AVATAR_SIZE):
     if not os.path.exists(path):
         return None
     
+    from PIL import Image, ImageTk, ImageDraw
+    
     img = Image.open(path)
     img = img.resize((size, size), Image.LANCZOS)
     
@@ -175,8 +237,15 @@ def create_round_avatar(path: str, size: int = AVATAR_SIZE):
     return ImageTk.PhotoImage(output)
 
 
-def create_gui() -> None:
-    """Create and run the main GUI application."""
+def create_gui(on_ready: Callable[["Tk"], None] = None) -> None:
+    """
+    Create and run the main GUI application.
+    
+    Args:
+        on_ready: Called from the Tk loop once the window is up (used by the startup benchmark).
+    """
+    from tkinter import Tk, Label, StringVar, OptionMenu, Frame
+    
     root = Tk()
     root.title("AFK Journey Automation")
     root.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
@@ -301,11 +370,40 @@ def create_gui() -> None:
     stop_btn = create_button(main_frame, "⏹  Stop Automation", stop_execution, Colors.ACCENT_RED)
     stop_btn.pack(pady=4)
 
+    # Automation status, polled from the executor on the Tk thread
+    status_var = StringVar(root, value="Idle")
+    Label(
+        main_frame,
+        textvariable=status_var,
+        font=("Segoe UI", 10),
+        fg=Colors.TEXT_MUTED,
+        bg=Colors.BG_DARK,
+        wraplength=WINDOW_WIDTH - 80,
+    ).pack(pady=(10, 0))
+
+    def refresh_status() -> None:
+        status_var.set(describe_status(executor.status()))
+        root.after(STATUS_INTERVAL_MS, refresh_status)
+
+    def on_close() -> None:
+        if not executor.shutdown(timeout=SHUTDOWN_TIMEOUT):
+            _log.warning("Automation did not stop within %.0fs", SHUTDOWN_TIMEOUT)
+        root.destroy()
+
+    refresh_status()
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    if on_ready is not None:
+        root.after(0, on_ready, root)
     root.mainloop()
 
 
-if __name__ == "__main__":
-    # Parse command line arguments
+# =============================================================================
+# Command Line
+# =============================================================================
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser (GUI options plus tool subcommands)."""
     parser = argparse.ArgumentParser(
         description="AFK Journey Automation Tool",
         epilog="Example: AFK-Journey-Automation.exe --debug"
@@ -315,23 +413,696 @@ if __name__ == "__main__":
         action="store_true",
         help="Enable debug mode (show detailed logs for template matching and clicks)"
     )
+    parser.add_argument(
+        "--log-file",
+        metavar="PATH",
+        help="Also append log output to this file (written by a background thread)"
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="TARGET",
+        help="Record per-stage lookup latencies; TARGET is a JSON snapshot file "
+             "(e.g. metrics.json) or [host]:port for a Prometheus text endpoint (e.g. :9108)"
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=DEFAULT_EXPORT_INTERVAL,
+        metavar="SECONDS",
+        help=f"Seconds between JSON metrics snapshots (default: {DEFAULT_EXPORT_INTERVAL:.0f})"
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=float,
+        metavar="MB",
+        help="Soft memory limit: above this resident size a warning is logged and caches are flushed"
+    )
+    parser.add_argument(
+        "--memory-profile",
+        metavar="PATH",
+        help="Trace allocations and keep a JSON report of memory growth per subsystem and the top "
+             "growth sites in PATH (slows the automation down a little)"
+    )
+    parser.add_argument(
+        "--memory-interval",
+        type=float,
+        default=60.0,
+        metavar="SECONDS",
+        help="Seconds between memory samples (default: 60)"
+    )
+    parser.add_argument(
+        "--flight-recorder",
+        metavar="DIR",
+        help="Keep recent frames and lookup decisions in memory and dump them to DIR "
+             "when a round is slow, the fail limit is hit, or automation is stopped"
+    )
+    parser.add_argument(
+        "--latency-budget",
+        type=float,
+        metavar="SECONDS",
+        help="Round duration above which the flight recorder writes a dump"
+    )
+    parser.add_argument(
+        "--recorder-frames",
+        type=int,
+        default=DEFAULT_FRAME_CAPACITY,
+        metavar="N",
+        help=f"Number of recent frames the flight recorder keeps (default: {DEFAULT_FRAME_CAPACITY})"
+    )
+    parser.add_argument(
+        "--stats",
+        default=DEFAULT_STATS_PATH,
+        metavar="PATH",
+        help=f"SQLite database every round is recorded to (default: {DEFAULT_STATS_PATH})"
+    )
+    parser.add_argument(
+        "--no-stats",
+        action="store_true",
+        help="Do not record run statistics"
+    )
+    parser.add_argument(
+        "--estimator",
+        choices=["ransac", "magsac", "scale_translation"],
+        help="Transform estimator used to verify feature matches (default: ransac); "
+             "see bench-verify to compare them"
+    )
+    parser.add_argument(
+        "--descriptors",
+        choices=["full", "rootsift", "compact", "pca"],
+        help="SIFT descriptor representation (default: full float32); compact and pca keep "
+             "template descriptors as float16, pca also reduces them to 64 dimensions. "
+             "See replay --compare-descriptors to check their accuracy"
+    )
+    parser.add_argument(
+        "--no-layout-mask",
+        action="store_true",
+        help="Extract keypoints from the whole capture instead of only where the templates "
+             "looked for have been seen in the game window"
+    )
+    parser.add_argument(
+        "--no-incremental",
+        action="store_true",
+        help="Extract keypoints from every capture whole instead of only where it changed "
+             "since the previous one"
+    )
+    parser.add_argument(
+        "--keypoint-target",
+        type=float,
+        metavar="MS",
+        help="Keypoint extraction time per capture the keypoint budget aims for, in milliseconds "
+             "(default: 1.5x the time measured over the first 10 captures)"
+    )
+    parser.add_argument(
+        "--no-keypoint-budget",
+        action="store_true",
+        help="Keep every keypoint of a capture instead of capping them to the keypoint budget"
+    )
+    # Internal: a child process of bench-startup
+    parser.add_argument("--startup-probe", choices=["gui", "headless"], help=argparse.SUPPRESS)
+    
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    
+    replay_parser = subparsers.add_parser(
+        "replay",
+        help="Re-run the lookups of a flight recorder dump through findMatchings"
+    )
+    replay_parser.add_argument("dump", help="Flight recorder dump directory")
+    replay_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per lookup; the fastest is reported (default: 3)"
+    )
+    replay_parser.add_argument("--template", help="Only replay lookups for this template file")
+    replay_parser.add_argument(
+        "--compare-descriptors",
+        action="store_true",
+        help="Compare the SIFT descriptor modes with full descriptors on the dump's lookups"
+    )
+    
+    run_parser = subparsers.add_parser(
+        "run",
+        help="Run an automation mode without the GUI"
+    )
+    run_parser.add_argument("--mode", required=True, choices=sorted(MODES), help="Automation mode")
+    run_parser.add_argument("--lang", default="EN", choices=["EN", "CN"], help="Game language (default: EN)")
+    run_parser.add_argument(
+        "--rounds",
+        type=int,
+        metavar="N",
+        help="Stop after N rounds (default: the mode's configured maximum)"
+    )
+    run_parser.add_argument(
+        "--max-runtime",
+        type=parse_duration,
+        metavar="DURATION",
+        help="Start no new round after this long, e.g. 90m, 2h or 3600 (seconds)"
+    )
+    run_parser.add_argument(
+        "--window",
+        action="append",
+        metavar="TITLE",
+        help="Drive the game windows with this title, one session per window; "
+             "repeat for several clients or emulator instances"
+    )
+    run_parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="Run the sessions as coroutines on one event loop; Stop takes effect within milliseconds"
+    )
+    run_parser.add_argument(
+        "--matcher-threads",
+        type=int,
+        metavar="N",
+        help="Matcher threads shared by all sessions (default: CPU count)"
+    )
+    run_parser.add_argument(
+        "--matcher-processes",
+        type=int,
+        metavar="N",
+        help="Match in N worker processes that read frames from shared memory, "
+             "so lookups of several sessions are not limited by the GIL"
+    )
+    run_parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="Play against the built-in game simulator instead of the game window (works without Windows); "
+             "nothing the run learns is saved"
+    )
+    _add_simulator_arguments(run_parser)
     
+    bench_parser = subparsers.add_parser(
+        "bench-startup",
+        help="Measure cold start in fresh processes: time to the GUI and until the automation is warm"
+    )
+    bench_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Fresh processes to start (default: 5)"
+    )
+    bench_parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Do not open the GUI window (e.g. on a machine without a display)"
+    )
+    bench_parser.add_argument("--lang", default="EN", choices=["EN", "CN"], help="Templates to warm up (default: EN)")
+    
+    verify_parser = subparsers.add_parser(
+        "bench-verify",
+        help="Time every match verification estimator on synthetic matches"
+    )
+    verify_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=50,
+        help="Verifications per match count and inlier ratio (default: 50)"
+    )
+    
+    sim_parser = subparsers.add_parser(
+        "bench-sim",
+        help="Play modes against the game simulator and report rounds per hour"
+    )
+    sim_parser.add_argument(
+        "--mode",
+        action="append",
+        choices=sorted(MODES),
+        help="Mode to play; repeat for several (default: every mode)"
+    )
+    sim_parser.add_argument("--lang", default="EN", choices=["EN", "CN"], help="Game language (default: EN)")
+    sim_parser.add_argument(
+        "--rounds",
+        type=int,
+        default=10,
+        help="Rounds per mode (default: 10)"
+    )
+    sim_parser.add_argument(
+        "--min-rate",
+        type=float,
+        metavar="BATTLES_PER_HOUR",
+        help="Exit with code 1 if any mode plays fewer battles per hour (for CI)"
+    )
+    _add_simulator_arguments(sim_parser)
+    
+    report_parser = subparsers.add_parser(
+        "report",
+        help="Show battles per hour, win rate per team slot and time per phase from the run statistics"
+    )
+    report_parser.add_argument("--mode", help="Only report this mode (e.g. autoFight)")
+    report_parser.add_argument(
+        "--since",
+        type=float,
+        metavar="HOURS",
+        help="Only include rounds from the last HOURS hours"
+    )
+    
+    return parser
+
+
+def _add_simulator_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options of the simulated game, shared by run --simulate and bench-sim."""
+    parser.add_argument(
+        "--sim-resolution",
+        type=parse_resolution,
+        default="1920x1080",
+        metavar="WxH",
+        help="Size of the simulated game window (default: 1920x1080)"
+    )
+    parser.add_argument(
+        "--sim-dpi",
+        type=float,
+        default=1.0,
+        metavar="SCALE",
+        help="Size of the simulated buttons relative to the template assets (default: 1.0)"
+    )
+    parser.add_argument(
+        "--sim-battle",
+        type=float,
+        default=5.0,
+        metavar="SECONDS",
+        help="Mean length of a simulated battle (default: 5)"
+    )
+    parser.add_argument(
+        "--sim-win-rate",
+        type=float,
+        default=0.5,
+        metavar="RATE",
+        help="Probability of winning a simulated battle (default: 0.5)"
+    )
+    parser.add_argument("--sim-seed", type=int, help="Seed of the simulated battle outcomes")
+
+
+def _simulator_options(args: argparse.Namespace) -> dict:
+    """GameSimulator keyword arguments from the --sim-* options."""
+    return {
+        "language": args.lang,
+        "resolution": args.sim_resolution,
+        "dpi_scale": args.sim_dpi,
+        "battle_seconds": args.sim_battle,
+        "win_rate": args.sim_win_rate,
+        "seed": args.sim_seed,
+    }
+
+
+def run_simulation(args: argparse.Namespace) -> int:
+    """Play the --mode against the game simulator and print a throughput summary."""
+    from automation.flows import get_flow
+    from automation.simulator import GameSimulator, run_simulated
+    
+    simulator = GameSimulator(get_flow(args.mode), **_simulator_options(args))
+    result = run_simulated(simulator, max_rounds=args.rounds, max_runtime=args.max_runtime)
+    flush_logging()
+    print(result.summary())
+    return _exit_code(result.reason)
+
+
+def run_simulator_benchmark(args: argparse.Namespace) -> int:
+    """Play modes against the game simulator and print their throughput."""
+    from automation.game_automation import stop_automation
+    from automation.simulator import benchmark_flows, format_benchmark
+    
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_automation())
+    rows = benchmark_flows(args.mode or MODES, args.rounds, **_simulator_options(args))
+    print(format_benchmark(rows))
+    if args.min_rate is not None:
+        slow = [row["mode"] for row in rows if row["battles_per_hour"] < args.min_rate]
+        if slow:
+            print(f"Below {args.min_rate:.1f} battles/h: {', '.join(slow)}")
+            return 1
+    return 0
+
+
+def run_replay(args: argparse.Namespace) -> int:
+    """Replay a flight recorder dump and print a timing report."""
+    from automation.replay import compare_descriptor_modes, format_descriptor_comparison, format_report, replay_dump
+    
+    if args.compare_descriptors:
+        print(format_descriptor_comparison(compare_descriptor_modes(args.dump, template=args.template)))
+        return 0
+    
+    results = replay_dump(args.dump, repeat=args.repeat, template=args.template)
+    print(format_report(results))
+    return 0
+
+
+def run_verify_benchmark(args: argparse.Namespace) -> int:
+    """Time the verification estimators and print a table."""
+    from automation.verification import benchmark_estimators, format_benchmark
+    
+    print(format_benchmark(benchmark_estimators(repeat=args.repeat)))
+    return 0
+
+
+# =============================================================================
+# Startup Benchmark
+# =============================================================================
+
+# Milestones a probe process reports, in order
+PROBE_IMPORTS = "imports"    # main.py's own imports done
+PROBE_GUI = "gui"            # window shown and idle
+PROBE_WARM = "warm"          # modules and template features ready
+
+
+def _probe_report(milestone: str) -> None:
+    """Tell the benchmarking parent that a milestone was reached."""
+    print(f"probe {milestone} {time.perf_counter() - _MAIN_STARTED:.6f}", flush=True)
+
+
+def run_startup_probe(mode: str, language: str) -> int:
+    """Child side of bench-startup: start the way a user would and report each milestone."""
+    _probe_report(PROBE_IMPORTS)
+    warmup = None
+    
+    if mode == "gui":
+        def on_ready(root: "Tk") -> None:
+            nonlocal warmup
+            root.update_idletasks()
+            _probe_report(PROBE_GUI)
+            warmup = start_warmup(language)
+            poll_warmup(root)
+        
+        def poll_warmup(root: "Tk") -> None:
+            if warmup.done:
+                root.destroy()
+            else:
+                root.after(10, poll_warmup, root)
+        
+        create_gui(on_ready)
+    else:
+        warmup = start_warmup(language)
+        warmup.wait()
+    
+    _probe_report(PROBE_WARM)
+    for stage, seconds in warmup.timings.items():
+        print(f"stage {stage} {seconds:.6f}", flush=True)
+    return 1 if warmup.error is not None else 0
+
+
+def _probe_command(mode: str) -> List[str]:
+    """Command line that starts this program as a startup probe (source or frozen build)."""
+    probe_args = ["--startup-probe", mode]
+    if getattr(sys, "frozen", False):
+        return [sys.executable] + probe_args
+    return [sys.executable, os.path.abspath(__file__)] + probe_args
+
+
+def run_startup_benchmark(args: argparse.Namespace) -> int:
+    """Start fresh processes and report how long each startup milestone takes."""
+    mode = "headless" if args.headless else "gui"
+    command = _probe_command(mode)
+    # The probe reads its language from the environment, keeping its command line minimal
+    env = dict(os.environ, AFK_PROBE_LANG=args.lang)
+    wall: Dict[str, List[float]] = {}
+    stages: Dict[str, List[float]] = {}
+    
+    for _ in range(max(1, args.repeat)):
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   text=True, env=env)
+        for line in process.stdout:
+            kind, name, _ = (line.split() + ["", "", ""])[:3]
+            if kind == "probe":
+                # Wall time from launch includes interpreter (or bootloader) startup
+                wall.setdefault(name, []).append(time.perf_counter() - start)
+            elif kind == "stage":
+                stages.setdefault(name, []).append(float(line.split()[2]))
+        if process.wait() != 0:
+            print(f"Probe process failed with exit code {process.returncode}")
+            return 1
+    
+    build = "frozen build" if getattr(sys, "frozen", False) else f"source build (Python {sys.version.split()[0]})"
+    print(f"Startup of the {build}, {mode}, {len(wall.get(PROBE_WARM, []))} runs")
+    print(f"{'milestone':<24}{'median':>10}{'min':>10}{'max':>10}")
+    rows = [(f"to {name}", wall[name]) for name in (PROBE_IMPORTS, PROBE_GUI, PROBE_WARM) if name in wall]
+    rows += [(f"  warm-up {name}", values) for name, values in stages.items()]
+    for label, values in rows:
+        print(f"{label:<24}{statistics.median(values):>9.3f}s{min(values):>9.3f}s{max(values):>9.3f}s")
+    return 0
+
+
+def parse_duration(text: str) -> float:
+    """Parse a duration such as ``45s``, ``90m``, ``2h`` or ``1h30m`` into seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "": 1}
+    parts = re.findall(r"(\d+(?:\.\d+)?)([hms]?)", text.strip().lower())
+    if not parts or "".join(n + u for n, u in parts) != text.strip().lower():
+        raise argparse.ArgumentTypeError(f"invalid duration: {text!r}")
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def parse_resolution(text: str) -> Tuple[int, int]:
+    """Parse a resolution such as ``1920x1080`` into (width, height)."""
+    match = re.fullmatch(r"(\d+)[xX](\d+)", text.strip())
+    if not match or not all(int(v) > 0 for v in match.groups()):
+        raise argparse.ArgumentTypeError(f"invalid resolution: {text!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+# Exit codes of the headless runner
+EXIT_OK = 0            # round limit or maximum runtime reached
+EXIT_MAX_FAILS = 1     # stopped by the mode's fail limit
+EXIT_STOPPED = 130     # interrupted (Ctrl+C)
+
+
+def _exit_code(reason: str) -> int:
+    """Map how a run ended to the headless runner's exit code."""
+    from automation.flows import EndReasons
+    
+    if reason == EndReasons.MAX_FAILS:
+        return EXIT_MAX_FAILS
+    if reason == EndReasons.STOPPED:
+        return EXIT_STOPPED
+    return EXIT_OK
+
+
+def run_headless(args: argparse.Namespace) -> int:
+    """Run one automation mode without the GUI and print a throughput summary."""
+    from automation.game_automation import set_stop_flag, stop_automation
+    
+    if not is_admin() and not args.simulate:
+        _log.warning("Not running with administrator privileges; clicks may not reach the game")
+    
+    # Ctrl+C stops between steps instead of killing a capture or click half-way; the
+    # default game window has no session, so it watches the global stop flag
+    set_stop_flag(stop_flag)
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_automation())
+    
+    if not args.matcher_processes:
+        return _run_headless_modes(args)
+    
+    from automation.matcher_service import MatcherService, set_matcher_service
+    
+    service = MatcherService(args.matcher_processes)
+    set_matcher_service(service)
+    try:
+        return _run_headless_modes(args)
+    finally:
+        set_matcher_service(None)
+        service.shutdown()
+
+
+def _run_headless_modes(args: argparse.Namespace) -> int:
+    """Run the --mode on the default game window or on every --window session."""
+    from automation.click_simulation import set_language
+    
+    if args.simulate:
+        return run_simulation(args)
+    if args.asyncio:
+        return run_sessions_async(args)
+    if args.window:
+        return run_sessions(args)
+    
+    set_language(args.lang)
+    result = get_mode(args.mode)(max_rounds=args.rounds, max_runtime=args.max_runtime)
+    # The summary goes after the run's last log lines, not in the middle of them
+    flush_logging()
+    print(result.summary())
+    return _exit_code(result.reason)
+
+
+def _window_sessions(args: argparse.Namespace) -> list:
+    """One session per window matching the --window titles."""
+    from automation.session import AutomationSession, find_game_windows
+    
+    sessions = []
+    for title in args.window:
+        handles = find_game_windows(title, class_name=None)
+        if not handles:
+            _log.warning("No window titled %r", title)
+        for handle in handles:
+            sessions.append(AutomationSession(f"{title}#{handle}", title, handle, language=args.lang))
+    return sessions
+
+
+def run_sessions(args: argparse.Namespace) -> int:
+    """Drive every window matching the --window titles concurrently, one thread per session."""
+    from automation.scheduler import SessionScheduler
+    
+    scheduler = SessionScheduler(args.matcher_threads)
+    for session in _window_sessions(args):
+        scheduler.add(session, args.mode, args.rounds, args.max_runtime)
+    
+    scheduler.start()
+    # Join in short slices so Ctrl+C is handled promptly
+    while scheduler.running:
+        scheduler.join(timeout=0.5)
+    return _report_sessions(scheduler.join())
+
+
+def run_sessions_async(args: argparse.Namespace) -> int:
+    """Drive the --window sessions (or the default game window) as coroutines on one event loop."""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from automation.async_flows import run_sessions_async as run_all
+    from automation.image_matching import set_matcher_pool
+    from automation.session import AutomationSession
+    
+    if args.window:
+        sessions = _window_sessions(args)
+    else:
+        sessions = [AutomationSession("default", language=args.lang)]
+    
+    pool = ThreadPoolExecutor(max_workers=args.matcher_threads or os.cpu_count(), thread_name_prefix="matcher")
+    set_matcher_pool(pool)
+    try:
+        results = asyncio.run(run_all([(session, args.mode) for session in sessions],
+                                      args.rounds, args.max_runtime))
+    finally:
+        set_matcher_pool(None)
+        pool.shutdown(wait=False)
+    return _report_sessions(results)
+
+
+def _report_sessions(results: dict) -> int:
+    """Print each session's summary and return the most severe exit code."""
+    if not results:
+        return EXIT_MAX_FAILS
+    flush_logging()
+    codes = []
+    for name, result in results.items():
+        if result is None:
+            print(f"{name}: failed")
+            codes.append(EXIT_MAX_FAILS)
+        else:
+            print(f"{name}: {result.summary()}")
+            codes.append(_exit_code(result.reason))
+    # Report the most severe outcome: interrupted, then failed, then success
+    return max(codes)
+
+
+def run_report(args: argparse.Namespace) -> int:
+    """Print a throughput report from the run statistics database."""
+    from automation.stats import RunStatsStore, format_report
+    
+    if not os.path.exists(args.stats):
+        print(f"No run statistics at {args.stats}")
+        return 1
+    
+    since = time.time() - args.since * 3600 if args.since is not None else None
+    store = RunStatsStore(args.stats)
+    try:
+        print(format_report(store.summarize(mode=args.mode, since=since)))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    # Matcher processes are spawned; in the frozen executable they start here
+    multiprocessing.freeze_support()
+    parser = build_parser()
     args = parser.parse_args()
+    simulated = args.command == "bench-sim" or (args.command == "run" and args.simulate)
+    if args.command == "run" and args.simulate and (args.window or args.asyncio):
+        parser.error("--simulate plays one simulated client; it cannot be combined with --window or --asyncio")
+    if args.keypoint_target is not None and args.keypoint_target <= 0:
+        parser.error("--keypoint-target must be positive")
     
-    # Set debug mode from CLI argument
+    # Configure logging (and debug mode) from CLI arguments
+    configure_logging(debug=args.debug, log_file=args.log_file)
     if args.debug:
-        set_debug_mode(True)
-        print("Debug mode enabled via command line")
+        _log.info("Debug mode enabled via command line")
     
-    # Request administrator privileges if not already elevated
-    # This is needed to interact with games that run as admin
-    request_admin()
+    if args.command == "replay":
+        sys.exit(run_replay(args))
+    if args.command == "report":
+        sys.exit(run_report(args))
+    if args.command == "bench-startup":
+        sys.exit(run_startup_benchmark(args))
+    if args.command == "bench-verify":
+        sys.exit(run_verify_benchmark(args))
+    if args.startup_probe:
+        sys.exit(run_startup_probe(args.startup_probe, os.environ.get("AFK_PROBE_LANG", "EN")))
     
-    # Show admin status
-    if is_admin():
-        print("✓ Running with administrator privileges")
-    else:
-        print("⚠ Running without administrator privileges")
-        print("  If automation doesn't work, try 'Run as administrator'")
+    metrics_exporter = start_metrics(args.metrics, args.metrics_interval) if args.metrics else None
+    
+    memory_guard = None
+    if args.memory_limit or args.memory_profile:
+        from automation.memory import start_memory_guard
+        memory_guard = start_memory_guard(args.memory_interval, args.memory_limit,
+                                          trace=bool(args.memory_profile), report_path=args.memory_profile)
+    
+    if args.flight_recorder:
+        enable_flight_recorder(args.flight_recorder, args.recorder_frames, args.latency_budget)
+        _log.info("Flight recorder enabled, dumps go to %s", args.flight_recorder)
+    
+    # Simulated rounds would skew the real game's statistics
+    if not args.no_stats and not simulated:
+        enable_run_stats(args.stats)
+    
+    if args.estimator:
+        # Only imported when asked for, as it loads OpenCV
+        from automation.verification import set_verification_estimator
+        set_verification_estimator(args.estimator)
+    
+    if args.no_layout_mask:
+        from automation.layout import set_layout_enabled
+        set_layout_enabled(False)
+    
+    if args.no_incremental:
+        from automation.incremental import set_incremental_enabled
+        set_incremental_enabled(False)
+    
+    if args.no_keypoint_budget:
+        from automation.keypoint_budget import set_budget_enabled
+        set_budget_enabled(False)
+    elif args.keypoint_target is not None:
+        from automation.keypoint_budget import set_budget_target
+        set_budget_target(args.keypoint_target / 1000)
+    
+    if args.descriptors:
+        from automation.descriptors import DescriptorModes, set_descriptor_mode
+        set_descriptor_mode(args.descriptors)
+        if args.descriptors == DescriptorModes.PCA and args.command in ("run", "bench-sim"):
+            # Fit the PCA basis before the first lookup; the GUI's warm-up does this in the background
+            from automation.templates import get_template_registry
+            from automation.warmup import template_names
+            get_template_registry().warm(args.lang, template_names(args.lang), fit_pca=True)
+    
+    exit_code = 0
+    try:
+        if args.command == "run":
+            # No elevation here: relaunching elevated would lose the exit code
+            exit_code = run_headless(args)
+        elif args.command == "bench-sim":
+            exit_code = run_simulator_benchmark(args)
+        else:
+            # Request administrator privileges if not already elevated
+            # This is needed to interact with games that run as admin
+            request_admin()
+            
+            # Show admin status
+            if is_admin():
+                _log.info("✓ Running with administrator privileges")
+            else:
+                _log.info("⚠ Running without administrator privileges")
+                _log.info("  If automation doesn't work, try 'Run as administrator'")
+            
+            # Load OpenCV and the templates while the user picks a mode
+            create_gui(on_ready=lambda root: start_warmup(selected_language))
+    finally:
+        if metrics_exporter:
+            metrics_exporter.stop()
+        if memory_guard:
+            memory_guard.stop()
     
-    create_gui()
\ No newline at end of file
+    sys.exit(exit_code)